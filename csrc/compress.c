@@ -44,6 +44,10 @@ static PyObject* compress(PyObject* self, PyObject* args)
   source = buffer.buf;
   len_source = buffer.len;
 
+  // No Python objects are touched until the result is built, so let other
+  // threads run while compressing.
+  Py_BEGIN_ALLOW_THREADS
+
   for(i=0;i<2;i++){
     // i=0: use 0x07FF for the range, 0xF800 for the max copy length
     // i=1: use 0x0FFF for the range, 0xF000 for the max copy length
@@ -191,7 +195,9 @@ static PyObject* compress(PyObject* self, PyObject* args)
   else{
     ret_choice = 1;
   }
-  
+
+  Py_END_ALLOW_THREADS
+
   result = Py_BuildValue("y#",
 			 &compressed_data[ret_choice][0],
 			 compressed_lengths[ret_choice]);
@@ -201,8 +207,244 @@ static PyObject* compress(PyObject* self, PyObject* args)
 
 
 
+// Error codes for the decompression routines.  They run without the GIL, so
+// the Python exception is set after the GIL is reacquired.
+#define DECOMPRESS_OK 0
+#define DECOMPRESS_SRC_RANGE 1
+#define DECOMPRESS_OUT_RANGE 2
+#define DECOMPRESS_BAD_ADDENDUM 3
+
+#define DECOMPRESS_BUF_SIZE 0x10000
+
+static int get_word(const unsigned char* src, Py_ssize_t len_src,
+		    Py_ssize_t pos, Py_ssize_t* value)
+{
+  if (pos < 0 || pos + 2 > len_src)
+    return DECOMPRESS_SRC_RANGE;
+
+  *value = src[pos] | (src[pos+1] << 8);
+  return DECOMPRESS_OK;
+}
+
+static void set_decompress_error(int err, Py_ssize_t pos)
+{
+  switch(err){
+  case DECOMPRESS_SRC_RANGE:
+    PyErr_Format(PyExc_IndexError,
+		 "compressed data out of range at 0x%06zX", pos);
+    break;
+  case DECOMPRESS_OUT_RANGE:
+    PyErr_SetString(PyExc_ValueError,
+		    "decompressed data exceeds 0x10000 bytes");
+    break;
+  case DECOMPRESS_BAD_ADDENDUM:
+    PyErr_Format(PyExc_ValueError,
+		 "addendum chain does not end at 0x%06zX", pos);
+    break;
+  }
+}
+
+// Mirrors ctdecompress.decompress.  Writes to out (DECOMPRESS_BUF_SIZE bytes)
+// and sets *out_len.  On error, *err_pos is the offending source position.
+static int decompress_impl(const unsigned char* src, Py_ssize_t len_src,
+			   Py_ssize_t start, unsigned char* out,
+			   Py_ssize_t* out_len, Py_ssize_t* err_pos)
+{
+  Py_ssize_t main_len, src_pos, end_pos, out_pos = 0;
+  Py_ssize_t copy_stream, copy_size, copy_off, new_end;
+  int header, bit, err;
+  bool small_width;
+
+  *err_pos = start;
+  err = get_word(src, len_src, start, &main_len);
+  if (err != DECOMPRESS_OK)
+    return err;
+
+  src_pos = start + 2;
+  end_pos = src_pos + main_len;
+
+  *err_pos = end_pos;
+  if (end_pos >= len_src)
+    return DECOMPRESS_SRC_RANGE;
+
+  small_width = (src[end_pos] & 0xC0) != 0;
+
+  while (true){
+    // Past the main body (or an addendum), check for another addendum.
+    if (src_pos == end_pos){
+      *err_pos = src_pos;
+      if (src_pos >= len_src)
+	return DECOMPRESS_SRC_RANGE;
+
+      if ((src[src_pos] & 0x3F) == 0){
+	*out_len = out_pos;
+	return DECOMPRESS_OK;
+      }
+
+      err = get_word(src, len_src, src_pos+1, &new_end);
+      if (err != DECOMPRESS_OK)
+	return err;
+
+      end_pos = start + new_end;
+      src_pos += 3;
+    }
+
+    *err_pos = src_pos;
+    if (src_pos >= len_src)
+      return DECOMPRESS_SRC_RANGE;
+
+    header = src[src_pos];
+    src_pos += 1;
+
+    for (bit = 0; bit < 8; bit++){
+      if (src_pos == end_pos)
+	break;
+
+      *err_pos = src_pos;
+      if ((header & (1 << bit)) == 0){
+	// Uncompressed, copy the next byte.
+	if (src_pos >= len_src)
+	  return DECOMPRESS_SRC_RANGE;
+	if (out_pos >= DECOMPRESS_BUF_SIZE)
+	  return DECOMPRESS_OUT_RANGE;
+
+	out[out_pos++] = src[src_pos++];
+      }
+      else{
+	// Compressed, copy from earlier output.
+	err = get_word(src, len_src, src_pos, &copy_stream);
+	if (err != DECOMPRESS_OK)
+	  return err;
+
+	if (small_width){
+	  copy_size = (copy_stream >> 11) + 3;
+	  copy_off = copy_stream & 0x07FF;
+	}
+	else{
+	  copy_size = (copy_stream >> 12) + 3;
+	  copy_off = copy_stream & 0x0FFF;
+	}
+
+	if (out_pos + copy_size > DECOMPRESS_BUF_SIZE)
+	  return DECOMPRESS_OUT_RANGE;
+
+	// Copy byte by byte since the ranges may overlap.  The python version
+	// reads negative indices from the end of its 0x10000 byte buffer.
+	for (Py_ssize_t j = 0; j < copy_size; j++){
+	  out[out_pos + j] = \
+	    out[(out_pos - copy_off + j + DECOMPRESS_BUF_SIZE) % \
+		DECOMPRESS_BUF_SIZE];
+	}
+
+	out_pos += copy_size;
+	src_pos += 2;
+      }
+    }
+  }
+}
+
+static PyObject* decompress(PyObject* self, PyObject* args)
+{
+  Py_buffer buffer;
+  Py_ssize_t start, out_len = 0, err_pos = 0;
+  unsigned char* out;
+  int err;
+  PyObject* result;
+
+  if (!PyArg_ParseTuple(args, "y*n", &buffer, &start))
+    return NULL;
+
+  // Zeroed so that lookback before the start of output reads zeros like the
+  // python version.
+  out = PyMem_Calloc(DECOMPRESS_BUF_SIZE, 1);
+  if (out == NULL){
+    PyBuffer_Release(&buffer);
+    return PyErr_NoMemory();
+  }
+
+  Py_BEGIN_ALLOW_THREADS
+  err = decompress_impl(buffer.buf, buffer.len, start, out,
+			&out_len, &err_pos);
+  Py_END_ALLOW_THREADS
+
+  PyBuffer_Release(&buffer);
+
+  if (err != DECOMPRESS_OK){
+    PyMem_Free(out);
+    set_decompress_error(err, err_pos);
+    return NULL;
+  }
+
+  result = PyByteArray_FromStringAndSize((const char*) out, out_len);
+  PyMem_Free(out);
+  return result;
+}
+
+static PyObject* get_compressed_length(PyObject* self, PyObject* args)
+{
+  Py_buffer buffer;
+  Py_ssize_t addr, main_len, compr_len, add_byte_addr;
+  const unsigned char* src;
+  int err = DECOMPRESS_OK;
+  long num_addenda = 0;
+
+  if (!PyArg_ParseTuple(args, "y*n", &buffer, &addr))
+    return NULL;
+
+  src = buffer.buf;
+
+  err = get_word(src, buffer.len, addr, &main_len);
+  if (err != DECOMPRESS_OK){
+    PyBuffer_Release(&buffer);
+    set_decompress_error(err, addr);
+    return NULL;
+  }
+
+  // len main body + main body + addendum byte
+  compr_len = 2 + main_len + 1;
+  add_byte_addr = addr + compr_len - 1;
+
+  while (true){
+    if (add_byte_addr < 0 || add_byte_addr >= buffer.len){
+      err = DECOMPRESS_SRC_RANGE;
+      break;
+    }
+
+    if ((src[add_byte_addr] & 0x3F) == 0)
+      break;
+
+    // Each addendum moves the end forward, so a chain longer than the
+    // maximum packet size must loop.
+    if (++num_addenda > DECOMPRESS_BUF_SIZE){
+      err = DECOMPRESS_BAD_ADDENDUM;
+      break;
+    }
+
+    err = get_word(src, buffer.len, add_byte_addr+1, &compr_len);
+    if (err != DECOMPRESS_OK)
+      break;
+
+    add_byte_addr = addr + compr_len;
+  }
+
+  PyBuffer_Release(&buffer);
+
+  if (err != DECOMPRESS_OK){
+    set_decompress_error(err, add_byte_addr);
+    return NULL;
+  }
+
+  return PyLong_FromSsize_t(compr_len + 1);
+}
+
 static PyMethodDef CompressMethods[] = {
     {"compress", compress, METH_VARARGS, "compress an event."},
+    {"decompress", decompress, METH_VARARGS,
+     "decompress(buffer, offset) -> bytearray\n"
+     "Decompress the packet starting at offset."},
+    {"get_compressed_length", get_compressed_length, METH_VARARGS,
+     "get_compressed_length(buffer, offset) -> int\n"
+     "Get the length of the compressed packet starting at offset."},
     {NULL, NULL, 0, NULL}
 };
 
@@ -10,6 +10,7 @@ import ctenums
 import ctstrings
 import ctoptions
 import randosettings as rset
+import scriptindex
 from randosettings import GameFlags as GF, GameMode as GM, \
     CosmeticFlags as CF
 
@@ -451,6 +452,60 @@ def add_generation_options(parser: argparse.ArgumentParser):
         action="store_true"
     )
 
+    gen_group.add_argument(
+        "--script-index",
+        default=scriptindex.DEFAULT_INDEX_PATH,
+        help="prebuilt script index (see scriptindex.py) to read unchanged "
+        "scripts from.  Scripts are read from the rom if it is missing or "
+        "out of date.  (default %(default)s)"
+    )
+
+    gen_group.add_argument(
+        "--profile",
+        help="write per-stage timing and memory use as json next to the "
+        "randomized rom.",
+        action="store_true"
+    )
+
+    add_batch_options(parser)
+
+
+def add_batch_options(parser: argparse.ArgumentParser):
+
+    batch_group = parser.add_argument_group(
+        "Batch options",
+        "Generate many seeds with the same settings in parallel.  A json "
+        "summary of timings and failures is written to the output path."
+    )
+
+    batch_group.add_argument(
+        "--batch",
+        help="generate a batch of seeds instead of a single seed",
+        action="store_true"
+    )
+
+    batch_group.add_argument(
+        "--batch-seeds",
+        help="file with one seed per line to generate"
+    )
+
+    batch_group.add_argument(
+        "--batch-count",
+        help="number of random seeds to generate (if no seed file)",
+        type=int, default=10
+    )
+
+    batch_group.add_argument(
+        "--batch-settings",
+        help="json settings file to use instead of the command line flags"
+    )
+
+    batch_group.add_argument(
+        "--batch-workers",
+        help="number of worker processes (default cpu count)",
+        type=int
+    )
+
 
 def get_parser():
     parser = argparse.ArgumentParser(formatter_class=SmartFormatter)
@@ -0,0 +1,238 @@
+'''
+Caches for the parts of generation which do not depend on the seed.
+
+Every seed starts by applying the same basic patches (base_patch.ips and
+friends) to a copy of the vanilla rom and then reading the base config from
+it.  The results only depend on the input rom and on the patch files, so we
+hash those and keep the patched rom (with its free space map) and the base
+config objects.  The patched rom is kept as a sharedrom.SharedRomImage so
+that each seed's copy only uses memory for the pages it changes.
+
+Entries are kept in memory and, if a cache directory is given, pickled to
+disk so that other processes can reuse them.  An entry whose hashes do not
+match is rebuilt automatically.
+'''
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import threading
+from typing import Any, Callable, Optional, Tuple
+
+import ctrom
+import picklefile
+import sharedrom
+
+# Bump this when the code which applies the cached patches changes in a way
+# that the patch file hashes can not detect (e.g. basepatch.py hacks).
+_CACHE_VERSION = 1
+
+DEFAULT_CACHE_DIR = './cache'
+DEFAULT_PATCH_DIR = './patches'
+
+
+def get_rom_digest(rom: bytes) -> str:
+    '''Get the md5 hex digest of a rom.'''
+    return hashlib.md5(rom).hexdigest()
+
+
+# abspath of a patch directory -> its digest.  Hashing every patch file for
+# each key is slow, so a directory is only hashed once per process.
+_patch_digests: dict[str, str] = {}
+
+
+def get_patch_digest(patch_dir: str = DEFAULT_PATCH_DIR) -> str:
+    '''
+    Get a digest which changes whenever any file under patch_dir changes.
+    The digest is computed once per process (see clear_patch_digests).
+    '''
+    abs_dir = os.path.abspath(patch_dir)
+    digest = _patch_digests.get(abs_dir, None)
+    if digest is None:
+        digest = _compute_patch_digest(patch_dir)
+        _patch_digests[abs_dir] = digest
+
+    return digest
+
+
+def clear_patch_digests():
+    '''Forget the patch digests, e.g. after editing the patch files.'''
+    _patch_digests.clear()
+
+
+def _compute_patch_digest(patch_dir: str) -> str:
+    hasher = hashlib.sha256()
+
+    for root, dirs, files in os.walk(patch_dir):
+        dirs.sort()
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            rel_path = os.path.relpath(path, patch_dir).replace(os.sep, '/')
+
+            with open(path, 'rb') as infile:
+                file_hash = hashlib.sha256(infile.read()).hexdigest()
+
+            hasher.update(f'{rel_path}:{file_hash}\n'.encode('ascii'))
+
+    return hasher.hexdigest()
+
+
+# (rom bytes, FreeSpace.first_free, FreeSpace.markers)
+_PatchedRomState = Tuple[bytes, bool, Tuple[int, ...]]
+
+
+class BaseCache:
+    '''
+    Holds patched base roms keyed on the input rom and patch file hashes.
+
+    Basic usage:
+        cache = BaseCache('./cache')
+        ct_rom = cache.get_patched_ctrom(rom_bytes, patch_func, 'basic')
+        # ct_rom is a fresh CTRom which can be modified freely.
+
+        config = cache.get_object(rom_bytes, build_func, 'config-std')
+        # config is an independent copy of what build_func() returned.
+
+    The tag given with patch_func/build_func names the routine.  Two calls
+    with the same tag must use routines which produce the same output.
+    '''
+    def __init__(self, cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                 patch_dir: str = DEFAULT_PATCH_DIR):
+        '''
+        If cache_dir is None, entries are only kept in memory.
+        '''
+        self.cache_dir = cache_dir
+        self.patch_dir = patch_dir
+        self._rom_dict: dict[str, sharedrom.SharedRomImage] = {}
+        self._obj_dict: dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def get_key(self, rom: bytes, tag: str) -> str:
+        '''Get the cache key for patching rom with the routine named tag.'''
+        hasher = hashlib.sha256()
+        hasher.update(f'{_CACHE_VERSION}:{tag}:'.encode('ascii'))
+        hasher.update(get_rom_digest(rom).encode('ascii'))
+        hasher.update(get_patch_digest(self.patch_dir).encode('ascii'))
+        return hasher.hexdigest()
+
+    def clear(self):
+        '''
+        Drop all in-memory entries and patch digests.  Files on disk are left
+        alone.
+        '''
+        clear_patch_digests()
+        with self._lock:
+            self._rom_dict = {}
+            self._obj_dict = {}
+
+    def _get_path(self, prefix: str, key: str) -> Optional[str]:
+        if self.cache_dir is None:
+            return None
+        return os.path.join(self.cache_dir, f'{prefix}.{key[:32]}.pickle')
+
+    def _load(self, prefix: str, key: str):
+        '''Read a pickled entry from disk.  Returns None on any mismatch.'''
+        path = self._get_path(prefix, key)
+        if path is None or not os.path.isfile(path):
+            return None
+
+        try:
+            with open(path, 'rb') as infile:
+                stored_key, value = pickle.load(infile)
+        except Exception:
+            # Corrupt or written by an incompatible version.  Rebuild.
+            return None
+
+        if stored_key != key:
+            return None
+
+        return value
+
+    def _store(self, prefix: str, key: str, value):
+        '''Atomically pickle an entry to disk and remove stale entries.'''
+        path = self._get_path(prefix, key)
+        if path is None:
+            return
+
+        if not picklefile.write_pickle(path, (key, value)):
+            return
+
+        for filename in os.listdir(self.cache_dir):
+            stale_path = os.path.join(self.cache_dir, filename)
+            if filename.startswith(prefix+'.') and stale_path != path:
+                try:
+                    os.remove(stale_path)
+                except OSError:
+                    pass
+
+    def get_patched_ctrom(self, rom: bytes,
+                          patch_func: Callable[[ctrom.CTRom], None],
+                          tag: str) -> ctrom.CTRom:
+        '''
+        Get a new CTRom equal to CTRom(rom, True) after patch_func is
+        applied to it.  The free space markers are restored as well.
+
+        The CTRom's data is a copy-on-write view of the cached rom (see
+        sharedrom), so getting many of them is cheap.
+        '''
+        key = self.get_key(rom, tag)
+
+        with self._lock:
+            image = self._rom_dict.get(key, None)
+
+        if image is None:
+            state: Optional[_PatchedRomState] = self._load('rom-'+tag, key)
+
+            if state is None:
+                ct_rom = ctrom.CTRom(rom, True)
+                patch_func(ct_rom)
+                space_man = ct_rom.rom_data.space_manager
+                state = (ct_rom.rom_data.getvalue(),
+                         space_man.first_free,
+                         tuple(space_man.markers))
+                self._store('rom-'+tag, key, state)
+
+            # Another thread may have made the image in the meantime.  Only
+            # make one if it did not, since each holds a copy of the rom.
+            with self._lock:
+                image = self._rom_dict.get(key, None)
+                if image is None:
+                    image = sharedrom.SharedRomImage(*state)
+                    self._rom_dict[key] = image
+
+        return ctrom.CTRom(image, True)
+
+    def get_object(self, rom: bytes, build_func: Callable[[], Any],
+                   tag: str) -> Any:
+        '''
+        Get a copy of the object returned by build_func().  The object is
+        pickled once, and each call unpickles a new independent copy.
+        '''
+        key = self.get_key(rom, tag)
+
+        with self._lock:
+            data = self._obj_dict.get(key, None)
+
+        if data is None:
+            data = self._load('obj-'+tag, key)
+
+            if data is None:
+                data = pickle.dumps(build_func(),
+                                    protocol=pickle.HIGHEST_PROTOCOL)
+                self._store('obj-'+tag, key, data)
+
+            with self._lock:
+                self._obj_dict[key] = data
+
+        return pickle.loads(data)
+
+
+# The cache used by the randomizer unless told otherwise.
+default_cache = BaseCache()
+
+
+def set_default_cache(cache: BaseCache):
+    '''Replace the cache used by the randomizer.'''
+    global default_cache
+    default_cache = cache
@@ -0,0 +1,187 @@
+'''
+Generate many seeds with the same settings using a process pool.
+
+The vanilla rom and the base caches (see basecache) are prepared once in the
+parent process.  On platforms which fork, the workers inherit them for free.
+Otherwise each worker reads the cache files written by the parent.
+'''
+from __future__ import annotations
+
+import copy
+import dataclasses
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from typing import Optional
+
+import randomizer
+import sharedrom
+import randosettings as rset
+
+
+@dataclasses.dataclass
+class SeedResult:
+    '''Outcome of generating a single seed in a batch.'''
+    seed: str
+    success: bool = False
+    seconds: float = 0.0
+    rom_path: Optional[str] = None
+    spoiler_path: Optional[str] = None
+    json_spoiler_path: Optional[str] = None
+    error: Optional[str] = None
+
+
+@dataclasses.dataclass
+class BatchJob:
+    '''Everything a worker needs to know besides the rom.'''
+    settings: rset.Settings
+    base_name: str
+    output_path: str
+    spoilers: bool = False
+    json_spoilers: bool = False
+
+
+# The rom shared by all workers.  It is set in the parent before the pool is
+# made so that forked workers do not need to receive a copy, and it is a
+# SharedRomImage so that seeds in the same process do not copy it either.
+_worker_rom: Optional[sharedrom.SharedRomImage] = None
+
+
+def _init_worker(rom: Optional[bytes]):
+    global _worker_rom
+    if rom is not None:
+        _worker_rom = sharedrom.SharedRomImage(rom)
+
+
+def _generate_seed(job: BatchJob) -> SeedResult:
+    '''Generate one seed in a worker.  Never raises.'''
+    result = SeedResult(seed=job.settings.seed)
+    start = time.perf_counter()
+
+    try:
+        if _worker_rom is None:
+            raise randomizer.GenerationFailedException('No rom in worker.')
+
+        rando = randomizer.Randomizer(_worker_rom, is_vanilla=False,
+                                      settings=job.settings, config=None)
+        rando.set_random_config()
+
+        writer = randomizer.RandomizerWriter(rando, job.base_name)
+        writer.write_output_rom(job.output_path)
+        result.rom_path = writer.full_output_path
+
+        if job.spoilers:
+            writer.write_spoiler_log(job.output_path)
+            result.spoiler_path = writer.spoiler_path
+
+        if job.json_spoilers:
+            writer.write_json_spoiler_log(job.output_path)
+            result.json_spoiler_path = writer.json_spoiler_path
+
+        result.success = True
+    except Exception:
+        result.error = traceback.format_exc()
+
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def _warm_caches(rom: bytes, settings: rset.Settings):
+    '''
+    Build the cached base rom and config before any workers start so that
+    they are shared instead of rebuilt in each worker.
+    '''
+    warm_settings = copy.deepcopy(settings)
+    warm_settings.fix_flag_conflicts()
+    randomizer.Randomizer.warm_base_caches(rom, warm_settings)
+
+
+def _get_context():
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+def generate_batch(rom: bytes,
+                   settings: rset.Settings,
+                   seeds: list[str],
+                   output_path: str,
+                   base_name: str,
+                   num_workers: Optional[int] = None,
+                   spoilers: bool = False,
+                   json_spoilers: bool = False) -> list[SeedResult]:
+    '''
+    Generate a rom for each seed in seeds with the given settings.
+
+    Results are returned in the same order as seeds.  A failed seed does not
+    stop the batch; its SeedResult has success=False and the traceback.
+    '''
+    global _worker_rom
+
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    num_workers = max(1, min(num_workers, len(seeds)))
+
+    jobs = []
+    for seed in seeds:
+        job_settings = copy.deepcopy(settings)
+        job_settings.seed = seed
+        jobs.append(BatchJob(job_settings, base_name, output_path,
+                             spoilers, json_spoilers))
+
+    if not jobs:
+        return []
+
+    # Mystery settings are rolled per seed, so only warm when the base
+    # config's mode/difficulty are known ahead of time.
+    if rset.GameFlags.MYSTERY not in settings.gameflags:
+        try:
+            _warm_caches(rom, settings)
+        except Exception:
+            # The workers will report the real error per seed.
+            pass
+
+    _worker_rom = sharedrom.SharedRomImage(rom)
+
+    if num_workers == 1:
+        return [_generate_seed(job) for job in jobs]
+
+    context = _get_context()
+    # Forked workers already have _worker_rom.  Spawned ones need a copy.
+    init_rom = None if context.get_start_method() == 'fork' else rom
+
+    with context.Pool(num_workers, initializer=_init_worker,
+                      initargs=(init_rom,)) as pool:
+        return pool.map(_generate_seed, jobs, chunksize=1)
+
+
+def write_summary(results: list[SeedResult], outfile_path: str,
+                  total_seconds: Optional[float] = None):
+    '''Write a json summary of per-seed timing and failures.'''
+    times = [result.seconds for result in results if result.success]
+    summary = {
+        'num_seeds': len(results),
+        'num_succeeded': len(times),
+        'num_failed': len(results) - len(times),
+        'total_seconds': total_seconds,
+        'mean_seed_seconds': sum(times)/len(times) if times else None,
+        'max_seed_seconds': max(times) if times else None,
+        'seeds': [dataclasses.asdict(result) for result in results]
+    }
+
+    with open(outfile_path, 'w', encoding='utf-8') as outfile:
+        json.dump(summary, outfile, indent=2)
+
+
+def read_seed_file(filename: str) -> list[str]:
+    '''Read one seed per line, ignoring blank lines.'''
+    with open(filename, 'r', encoding='utf-8') as infile:
+        return [line.strip() for line in infile if line.strip()]
+
+
+def read_settings_file(filename: str) -> rset.Settings:
+    '''Read settings from json with the same shape as Settings._jot_json.'''
+    with open(filename, 'r', encoding='utf-8') as infile:
+        return rset.Settings.from_jot_json(json.load(infile))
@@ -0,0 +1,11 @@
+'''
+Benchmarks for seed generation and the subsystems it spends time in.
+
+Run from the sourcefiles directory:
+    python -m benchmarks                       # run everything and report
+    python -m benchmarks --save-baseline       # store results as baseline
+    python -m benchmarks -k compress -r 10     # only matching benchmarks
+
+End-to-end generation benchmarks need a vanilla rom.  Set the environment
+variable CT_ROM_PATH to its location; otherwise they are skipped.
+'''
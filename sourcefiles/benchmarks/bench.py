@@ -0,0 +1,246 @@
+'''
+Harness for registering, running and comparing benchmarks.
+
+A benchmark is a function which is timed, plus an optional setup function
+which is run (untimed) before each timed repeat.  The setup's return value
+is passed to the benchmark.  A setup may raise SkipBenchmark, e.g. when a
+rom is needed but not available.
+
+Results are compared against a stored baseline.  A benchmark whose median
+time grows by more than the threshold fraction is reported as a regression
+and makes the run exit with a nonzero status.
+'''
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import typing
+from typing import Any, Callable, Optional
+
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(__file__),
+                                     'baseline.json')
+DEFAULT_THRESHOLD = 0.25
+
+
+class SkipBenchmark(Exception):
+    '''Raised by a benchmark's setup when it can not run here.'''
+
+
+@dataclasses.dataclass
+class Benchmark:
+    name: str
+    func: Callable[[Any], Any]
+    setup: Optional[Callable[[], Any]] = None
+    number: int = 1
+    repeat: int = 5
+
+
+@dataclasses.dataclass
+class BenchmarkResult:
+    '''Per-call times in seconds for each repeat of a benchmark.'''
+    name: str
+    times: list[float] = dataclasses.field(default_factory=list)
+    skipped: Optional[str] = None
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.times)
+
+    @property
+    def best(self) -> float:
+        return min(self.times)
+
+    def _jot_json(self):
+        if self.skipped is not None:
+            return {'skipped': self.skipped}
+        return {'median': self.median, 'min': self.best,
+                'repeat': len(self.times)}
+
+
+_registry: dict[str, Benchmark] = {}
+
+
+def register(name: str, setup: Optional[Callable[[], Any]] = None,
+             number: int = 1, repeat: int = 5):
+    '''
+    Decorator which registers a benchmark under name.
+
+    The decorated function is called number times per repeat with the value
+    returned by setup (or None if there is no setup).
+    '''
+    def decorator(func: Callable[[Any], Any]):
+        if name in _registry:
+            raise ValueError(f'Duplicate benchmark name: {name}')
+        _registry[name] = Benchmark(name, func, setup, number, repeat)
+        return func
+
+    return decorator
+
+
+def get_benchmarks(pattern: Optional[str] = None) -> list[Benchmark]:
+    '''Get the registered benchmarks whose names contain pattern.'''
+    # Importing the modules registers their benchmarks.
+    from benchmarks import micro, generation  # noqa: F401
+
+    return [bench for name, bench in _registry.items()
+            if pattern is None or pattern in name]
+
+
+def run_benchmark(bench: Benchmark,
+                  repeat: Optional[int] = None) -> BenchmarkResult:
+    '''Time a single benchmark.'''
+    result = BenchmarkResult(bench.name)
+    if repeat is None:
+        repeat = bench.repeat
+
+    for _ in range(repeat):
+        try:
+            state = None if bench.setup is None else bench.setup()
+        except SkipBenchmark as exc:
+            result.skipped = str(exc)
+            return result
+
+        start = time.perf_counter()
+        for _ in range(bench.number):
+            bench.func(state)
+        elapsed = time.perf_counter() - start
+
+        result.times.append(elapsed/bench.number)
+
+    return result
+
+
+def load_baseline(path: str) -> dict[str, dict]:
+    if not os.path.isfile(path):
+        return {}
+
+    with open(path, 'r', encoding='utf-8') as infile:
+        return json.load(infile).get('results', {})
+
+
+def save_baseline(results: list[BenchmarkResult], path: str):
+    '''Store results, keeping baseline entries for benchmarks not run.'''
+    baseline = load_baseline(path)
+    for result in results:
+        if result.skipped is None:
+            baseline[result.name] = result._jot_json()
+
+    with open(path, 'w', encoding='utf-8') as outfile:
+        json.dump(
+            {'python': platform.python_version(),
+             'platform': platform.platform(),
+             'results': baseline},
+            outfile, indent=2, sort_keys=True
+        )
+
+
+def _format_time(seconds: float) -> str:
+    if seconds >= 1:
+        return f'{seconds:.3f}s'
+    if seconds >= 1e-3:
+        return f'{seconds*1e3:.3f}ms'
+    return f'{seconds*1e6:.1f}us'
+
+
+def write_report(results: list[BenchmarkResult],
+                 baseline: dict[str, dict],
+                 threshold: float,
+                 outfile: typing.TextIO = sys.stdout) -> list[str]:
+    '''
+    Print a comparison of results with the baseline.  Returns the names of
+    the benchmarks which regressed by more than threshold.
+    '''
+    regressions = []
+    name_width = max((len(result.name) for result in results), default=4)
+
+    for result in results:
+        name = result.name.ljust(name_width)
+        if result.skipped is not None:
+            outfile.write(f'{name}  skipped ({result.skipped})\n')
+            continue
+
+        line = f'{name}  median {_format_time(result.median):>10}' \
+            f'  min {_format_time(result.best):>10}'
+
+        base = baseline.get(result.name, None)
+        if base is None or 'median' not in base:
+            line += '  (no baseline)'
+        else:
+            ratio = result.median/base['median']
+            line += f'  {ratio:6.2f}x baseline'
+            if ratio > 1 + threshold:
+                line += '  REGRESSION'
+                regressions.append(result.name)
+            elif ratio < 1 - threshold:
+                line += '  improved'
+
+        outfile.write(line + '\n')
+
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='Run the benchmarks.')
+    parser.add_argument(
+        '-k', dest='pattern',
+        help='only run benchmarks whose names contain this text'
+    )
+    parser.add_argument(
+        '-r', '--repeat', type=int,
+        help='number of timed repeats (default per benchmark)'
+    )
+    parser.add_argument(
+        '--baseline', default=DEFAULT_BASELINE_PATH,
+        help='baseline json file to compare against and save to'
+    )
+    parser.add_argument(
+        '--save-baseline', action='store_true',
+        help='store these results in the baseline file'
+    )
+    parser.add_argument(
+        '--threshold', type=float, default=DEFAULT_THRESHOLD,
+        help='fractional slowdown reported as a regression (default 0.25)'
+    )
+    parser.add_argument(
+        '--json',
+        help='also write the results to this json file'
+    )
+    parser.add_argument(
+        '--list', action='store_true',
+        help='list the benchmarks and exit'
+    )
+    args = parser.parse_args(argv)
+
+    benches = get_benchmarks(args.pattern)
+    if args.list:
+        for bench in benches:
+            print(bench.name)
+        return
+
+    results = []
+    for bench in benches:
+        results.append(run_benchmark(bench, args.repeat))
+
+    baseline = load_baseline(args.baseline)
+    regressions = write_report(results, baseline, args.threshold)
+
+    if args.json is not None:
+        with open(args.json, 'w', encoding='utf-8') as outfile:
+            json.dump({result.name: result._jot_json()
+                       for result in results}, outfile, indent=2)
+
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        print(f'Saved baseline to {args.baseline}')
+    elif regressions:
+        print(f'{len(regressions)} benchmark(s) regressed by more than '
+              f'{args.threshold:.0%}: {", ".join(regressions)}')
+        sys.exit(1)
@@ -0,0 +1,66 @@
+'''
+End-to-end generation benchmarks for the preset settings.
+
+These need a vanilla rom given by the CT_ROM_PATH environment variable and
+are skipped without one.  The first repeat of each preset also fills the
+base caches, so look at min as well as median.
+'''
+from __future__ import annotations
+
+import functools
+import os
+from typing import Callable
+
+import randomizer
+import randosettings as rset
+
+from benchmarks.bench import register, SkipBenchmark
+
+ROM_ENV_VAR = 'CT_ROM_PATH'
+
+
+@functools.lru_cache(maxsize=1)
+def _read_rom(path: str) -> bytes:
+    with open(path, 'rb') as infile:
+        return infile.read()
+
+
+def get_rom() -> bytes:
+    '''Get the rom named by CT_ROM_PATH or raise SkipBenchmark.'''
+    path = os.environ.get(ROM_ENV_VAR, None)
+    if path is None:
+        raise SkipBenchmark(f'{ROM_ENV_VAR} not set')
+    if not os.path.isfile(path):
+        raise SkipBenchmark(f'{ROM_ENV_VAR} is not a file')
+
+    return _read_rom(path)
+
+
+def _make_setup(get_settings: Callable[[], rset.Settings]):
+    def setup():
+        settings = get_settings()
+        settings.seed = 'BenchmarkSeed'
+        return get_rom(), settings
+
+    return setup
+
+
+def _generate(state):
+    rom, settings = state
+    rando = randomizer.Randomizer(rom, is_vanilla=False, settings=settings)
+    rando.set_random_config()
+    rando.generate_rom()
+
+
+_presets: dict[str, Callable[[], rset.Settings]] = {
+    'race': rset.Settings.get_race_presets,
+    'new_player': rset.Settings.get_new_player_presets,
+    'lost_worlds': rset.Settings.get_lost_worlds_presets,
+    'hard': rset.Settings.get_hard_presets,
+    'tourney_early': rset.Settings.get_tourney_early_preset,
+    'tourney_top8': rset.Settings.get_tourney_top8_preset,
+}
+
+for _name, _get_settings in _presets.items():
+    register(f'generate.{_name}', setup=_make_setup(_get_settings),
+             repeat=3)(_generate)
@@ -0,0 +1,160 @@
+'''
+Benchmarks of the subsystems generation spends most of its time in.  None of
+these need a rom.
+'''
+from __future__ import annotations
+
+import copy
+import random
+
+import ctdecompress
+import ctevent
+import ctstrings
+import freespace
+import logicfactory
+import logicwriters
+import randoconfig as cfg
+import randomizer
+import randosettings as rset
+import rng
+
+from benchmarks.bench import register
+
+
+_FLUX_FILES = (
+    './flux/VR_0E6_RSeries.Flux',
+    './flux/VR_10C_Geno_Dome_Mainframe.Flux',
+    './flux/jot_trading_post.Flux',
+    './flux/cr_telepod_exhibit.flux',
+)
+
+
+def _get_script_payload() -> bytes:
+    '''Uncompressed event scripts, which is what generation compresses.'''
+    payload = bytearray()
+    for filename in _FLUX_FILES:
+        payload.extend(ctevent.Event.from_flux(filename).get_bytearray())
+    return bytes(payload)
+
+
+# Compression ###############################################################
+
+@register('ctdecompress.compress', setup=_get_script_payload, number=5)
+def bench_compress(payload: bytes):
+    ctdecompress.compress(payload)
+
+
+def _get_compressed_payload() -> bytes:
+    return bytes(ctdecompress.compress(_get_script_payload()))
+
+
+@register('ctdecompress.decompress', setup=_get_compressed_payload, number=5)
+def bench_decompress(compressed: bytes):
+    ctdecompress.decompress(compressed, 0)
+
+
+@register('ctdecompress.get_compressed_length',
+          setup=_get_compressed_payload, number=20)
+def bench_compressed_length(compressed: bytes):
+    ctdecompress.get_compressed_length(compressed, 0)
+
+
+# Free space ################################################################
+
+def _get_alloc_pattern() -> list[tuple[int, int]]:
+    '''A fixed pattern of (start, size) blocks spread through a 4MB rom.'''
+    gen = random.Random('freespace')
+    return [(gen.randrange(0, 0x3F0000), gen.randrange(0x10, 0x800))
+            for _ in range(2000)]
+
+
+@register('FreeSpace.mark_block', setup=_get_alloc_pattern)
+def bench_mark_block(blocks: list[tuple[int, int]]):
+    space = freespace.FreeSpace(0x400000, True)
+    for start, size in blocks:
+        space.mark_block((start, start+size), freespace.FSWriteType.MARK_USED)
+
+
+def _get_fragmented_space() -> freespace.FreeSpace:
+    space = freespace.FreeSpace(0x400000, False)
+    gen = random.Random('fragmented')
+    for _ in range(2000):
+        start = gen.randrange(0, 0x3F0000)
+        space.mark_block((start, start+gen.randrange(0x10, 0x400)),
+                         freespace.FSWriteType.MARK_FREE)
+    return space
+
+
+@register('FreeSpace.get_free_addr', setup=_get_fragmented_space)
+def bench_get_free_addr(space: freespace.FreeSpace):
+    for size in range(0x10, 0x410, 0x10):
+        space.get_free_addr(size)
+
+
+# Events ####################################################################
+
+def _get_event() -> ctevent.Event:
+    return ctevent.Event.from_flux('./flux/VR_0E6_RSeries.Flux')
+
+
+@register('Event.insert_commands', setup=_get_event)
+def bench_insert_commands(event: ctevent.Event):
+    cmd = ctevent.EC.set_bit(0x7F01E0, 0x01).to_bytearray()
+    start = event.get_function_start(1, 0)
+    for _ in range(50):
+        event.insert_commands(cmd, start)
+
+
+# Strings ###################################################################
+
+def _get_strings() -> list[ctstrings.CTString]:
+    text = (
+        'The bucket is full of water.{line break}'
+        'Crono received the Moonstone!{null}',
+        'Would you like to rest here?{line break}'
+        '   Yes{line break}   No{null}',
+        'I am Spekkio, the Master of War.  Tell me, what is it you '
+        'seek?{null}',
+    )
+    return [ctstrings.CTString.from_str(string) for string in text]*20
+
+
+@register('CTHuffmanTree.compress', setup=_get_strings)
+def bench_huffman_compress(strings: list[ctstrings.CTString]):
+    tree = ctstrings.CTString.huffman_tree
+    for string in strings:
+        tree.compress(string)
+
+
+# Logic #####################################################################
+
+def _make_logic_setup(settings: rset.Settings):
+    def setup():
+        config = cfg.RandoConfig()
+        randomizer.Randomizer.fill_default_config_entries(config)
+        return copy.deepcopy(settings), config
+
+    return setup
+
+
+def _fill_key_items(state):
+    settings, config = state
+    with rng.use_rng(random.Random('logic')):
+        game_config = logicfactory.getGameConfig(settings, config)
+        logicwriters.getFiller(settings).fill_key_item_locations(game_config)
+
+
+def _get_chronosanity_settings() -> rset.Settings:
+    settings = rset.Settings.get_race_presets()
+    settings.gameflags |= rset.GameFlags.CHRONOSANITY
+    return settings
+
+
+register('logic.fill_standard',
+         setup=_make_logic_setup(rset.Settings.get_race_presets()))(
+    _fill_key_items
+)
+register('logic.fill_chronosanity',
+         setup=_make_logic_setup(_get_chronosanity_settings()))(
+    _fill_key_items
+)
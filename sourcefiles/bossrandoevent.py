@@ -1,5 +1,5 @@
 from __future__ import annotations
-import random
+import rng
 import typing
 from typing import Optional
 
@@ -170,7 +170,7 @@ def set_twin_boss_data_in_config(one_spot_boss: bt.BossID,
 
     # Special case scaling in ai scripts
     if base_id == EnemyID.RUST_TYRANO:
-        elem = random.choice(list(Element))
+        elem = rng.choice(list(Element))
         set_rust_tyrano_element(EnemyID.TWIN_BOSS, elem,
                                 config)
         set_rust_tyrano_script_mag(EnemyID.TWIN_BOSS, config)
@@ -186,7 +186,7 @@ def get_random_assignment(
     if len(spots) > len(bosses):
         raise InsufficientSpotsException
 
-    random.shuffle(bosses)
+    rng.shuffle(bosses)
 
     # Zip only goes through the smaller of the two.
     return dict(zip(spots, bosses))
@@ -281,7 +281,7 @@ def write_assignment_to_config(settings: rset.Settings,
             num_extra_bosses = len(available_bosses)-len(available_spots)
             unforced_bosses = [boss_id for boss_id in available_bosses if
                                boss_id not in forced_bosses]
-            removed_bosses = random.sample(unforced_bosses, k=num_extra_bosses)
+            removed_bosses = rng.sample(unforced_bosses, k=num_extra_bosses)
             for boss_id in removed_bosses:
                 available_bosses.remove(boss_id)
 
@@ -300,7 +300,7 @@ def write_assignment_to_config(settings: rset.Settings,
             boss_id for boss_id in available_bosses
             if boss_id in all_one_part_bosses
         ]
-        twin_choice = random.choice(available_one_part_bosses)
+        twin_choice = rng.choice(available_one_part_bosses)
         # set_twin_boss_data_in_config(twin_choice, settings, config)
         # default assignment already has twin boss assigned to ocean palace.
         # Just make sure nothing new is done with this spot.
@@ -463,7 +463,7 @@ def make_weak_obstacle_copies(config: cfg.RandoConfig):
         new_obstacle = atk_db.get_tech(0x58)
         # Choose a status that doesn't incapacitate the team.
         # But also no point choosing poison because mega has shadow slay
-        new_status = random.choice(
+        new_status = rng.choice(
             (StatusEffect.LOCK, StatusEffect.SLOW)
         )
         new_obstacle.effect.status_effect = new_status  # type: ignore
@@ -849,34 +849,34 @@ def randomize_midbosses(settings: rset.Settings, config: cfg.RandoConfig):
     if settings.game_mode != rset.GameMode.VANILLA_RANDO:
         # Random hp from 10k to 15k
         magus_stats = config.enemy_dict[EnemyID.MAGUS]
-        magus_stats.hp = random.randrange(10000, 15001, 1000)
+        magus_stats.hp = rng.randrange(10000, 15001, 1000)
 
     if settings.game_mode == rset.GameMode.LEGACY_OF_CYRUS:
         magus_char = config.char_assign_dict[RecruitID.PROTO_DOME].held_char
     else:
-        magus_char = random.choice(list(CharID))
+        magus_char = rng.choice(list(CharID))
 
     set_magus_character(magus_char, config)
 
     if settings.game_mode != rset.GameMode.VANILLA_RANDO:
         config.enemy_dict[EnemyID.BLACKTYRANO].hp = \
-            random.randrange(8000, 13001, 1000)
+            rng.randrange(8000, 13001, 1000)
 
-    tyrano_element = random.choice(list(Element))
+    tyrano_element = rng.choice(list(Element))
     set_black_tyrano_element(tyrano_element, config)
     set_rust_tyrano_element(EnemyID.RUST_TYRANO, tyrano_element, config)
 
     # We're going to jam obstacle randomization here
     SE = StatusEffect
-    rand_num = random.randrange(0, 10, 1)
+    rand_num = rng.randrange(0, 10, 1)
 
     #  if rand_num < 2:
-    #      status_effect = rand.choice(1,0x40) #Blind, Poison
+    #      status_effect = rng.choice(1,0x40) #Blind, Poison
     if rand_num < 8:
-        status_effect = random.choice(
+        status_effect = rng.choice(
             [SE.SLEEP, SE.LOCK, SE.SLOW])
     else:
-        status_effect = random.choice([SE.CHAOS, SE.STOP])     # Chaos, Stop
+        status_effect = rng.choice([SE.CHAOS, SE.STOP])     # Chaos, Stop
 
     obstacle = config.enemy_atk_db.get_tech(0x58)
     obstacle.effect.status_effect = status_effect  # type: ignore
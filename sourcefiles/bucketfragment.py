@@ -1,4 +1,4 @@
-import random
+import rng
 
 from ctrom import CTRom
 import ctenums
@@ -155,7 +155,7 @@ def write_fragments_to_config(
     #     print(x.getName())
 
     # print('****')
-    fragment_locs = random.sample(avail_locs, num_fragments)
+    fragment_locs = rng.sample(avail_locs, num_fragments)
 
     for x in fragment_locs:
         # print(f'Putting fragment in {x.getName()}')
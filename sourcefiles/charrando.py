@@ -1,5 +1,5 @@
 import copy
-import random
+import rng
 
 from itertools import permutations
 
@@ -29,7 +29,7 @@ def write_pcs_to_config(settings: rset.Settings, config: cfg.RandoConfig):
     recruit_spots = config.char_assign_dict.keys()
 
     chars = [CharID(i) for i in range(7)]
-    random.shuffle(chars)
+    rng.shuffle(chars)
 
     loc_assign_dict = dict(zip(recruit_spots, chars))
 
@@ -70,11 +70,11 @@ def write_pcs_to_config(settings: rset.Settings, config: cfg.RandoConfig):
         if rset.GameFlags.DUPLICATE_CHARS in settings.gameflags:
             for pc_id in CharID:
                 avail_choices = settings.char_choices[int(pc_id)]
-                choices[pc_id] = random.choice(avail_choices)
+                choices[pc_id] = rng.choice(avail_choices)
         # unique chars (default for char rando)
         else:
             all_choices = [p for p in permutations(range(0, 7), r=7)]
-            shuffle = random.sample(all_choices, k=len(all_choices))
+            shuffle = rng.sample(all_choices, k=len(all_choices))
             try:
                 permutation = next(
                     p for p in shuffle
@@ -0,0 +1,359 @@
+'''
+Index of command boundaries in an event script.
+
+Searching a script (Event.find_command and friends) means decoding every
+command from the start of object 0.  A CommandIndex decodes the script once
+and keeps the offset and opcode of every command, plus a sorted list of
+offsets for each opcode, so that searches become bisects.
+
+The index also keeps the positions of the jump commands.  A jump's argument
+is one byte, so a jump never spans more than about 0x100 bytes.  The jumps
+which can span a given edit are found by bisecting into a small window
+around it, and fixing up jumps after an edit only costs time for the jumps
+near the edit rather than a scan of every jump in the script.
+
+Event.data is a public bytearray which many modules edit directly.  Its
+edits are counted in Event.generation, and the index remembers the
+generation it was built for.  An index whose generation no longer matches
+the script is thrown away and rebuilt.  Edits which are known not to move any
+command boundary (e.g. changing a jump's argument) can call sync to keep the
+index, and Event's own insertions and deletions update it in place.
+
+The positions after an edit move by the edit's length.  Instead of rewriting
+every later position, each list of positions keeps one pending shift and
+only brings the positions between the previous edit and this one up to date,
+so a run of nearby edits costs time for the nearby commands only.
+'''
+from __future__ import annotations
+
+import bisect
+from typing import ByteString, Iterable, Optional
+
+from eventcommand import EventCommand as EC, event_commands, \
+    get_command_length
+
+_FWD_JUMP_COMMANDS = frozenset(EC.fwd_jump_commands)
+_BACK_JUMP_COMMANDS = frozenset(EC.back_jump_commands)
+
+_MAX_JUMP_LEN = max(len(event_commands[cmd_id])
+                    for cmd_id in _FWD_JUMP_COMMANDS | _BACK_JUMP_COMMANDS)
+
+# Bound on (end - start) of the bytes covered by any jump.  See
+# Event.__shift_jumps for how a jump's span is defined.
+MAX_JUMP_SPAN = _MAX_JUMP_LEN + 0xFF
+
+
+class _PositionList:
+    '''
+    A sorted list of positions with a lazily applied shift.
+
+    The stored values at index _pending_ind and after are missing
+    _pending_shift.  Reads add it back, and a new shift only updates the
+    values between the pending index and the new one.
+    '''
+    def __init__(self, values: Optional[list[int]] = None):
+        self._values = [] if values is None else values
+        self._pending_ind = 0
+        self._pending_shift = 0
+
+    def __len__(self):
+        return len(self._values)
+
+    def __get(self, ind: int) -> int:
+        if ind >= self._pending_ind:
+            return self._values[ind] + self._pending_shift
+        return self._values[ind]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self.__get(ind)
+                    for ind in range(*key.indices(len(self._values)))]
+
+        if key < 0:
+            key += len(self._values)
+        if not 0 <= key < len(self._values):
+            raise IndexError('Position index out of range.')
+        return self.__get(key)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __eq__(self, other):
+        return self[:] == list(other)
+
+    def __repr__(self):
+        return f'_PositionList({self[:]})'
+
+    def bisect_left(self, value: int, lo: int = 0) -> int:
+        ind, shift = self._pending_ind, self._pending_shift
+        if lo < ind and self._values[ind-1] >= value:
+            return bisect.bisect_left(self._values, value, lo, ind)
+        return bisect.bisect_left(self._values, value - shift, max(lo, ind))
+
+    def bisect_right(self, value: int, lo: int = 0) -> int:
+        ind, shift = self._pending_ind, self._pending_shift
+        if lo < ind and self._values[ind-1] > value:
+            return bisect.bisect_right(self._values, value, lo, ind)
+        return bisect.bisect_right(self._values, value - shift,
+                                   max(lo, ind))
+
+    def shift(self, ind: int, shift: int):
+        '''Add shift to the values at index ind and after.'''
+        values = self._values
+        pending_ind, pending_shift = self._pending_ind, self._pending_shift
+
+        # Move the pending shift to ind.
+        if ind > pending_ind:
+            for val_ind in range(pending_ind, ind):
+                values[val_ind] += pending_shift
+        elif ind < pending_ind:
+            for val_ind in range(ind, pending_ind):
+                values[val_ind] -= pending_shift
+
+        self._pending_ind = ind
+        self._pending_shift = pending_shift + shift
+
+    def insert(self, ind: int, new_values: list[int]):
+        '''Insert sorted new_values before index ind.'''
+        if ind >= self._pending_ind:
+            new_values = [value - self._pending_shift
+                          for value in new_values]
+        else:
+            self._pending_ind += len(new_values)
+
+        self._values[ind:ind] = new_values
+
+    def delete(self, lo: int, hi: int):
+        '''Delete the values at indices [lo, hi).'''
+        del self._values[lo:hi]
+        if self._pending_ind >= hi:
+            self._pending_ind -= hi - lo
+        elif self._pending_ind > lo:
+            self._pending_ind = lo
+
+    def insort(self, value: int):
+        self.insert(self.bisect_left(value), [value])
+
+    def index(self, value: int) -> int:
+        ind = self.bisect_left(value)
+        if ind == len(self._values) or self.__get(ind) != value:
+            raise ValueError(f'{value} is not in the list.')
+        return ind
+
+    def remove(self, value: int):
+        ind = self.index(value)
+        self.delete(ind, ind+1)
+
+
+class CommandIndex:
+    '''Offsets and opcodes of the commands in data[start:].'''
+
+    def __init__(self, data: ByteString, start: int, generation: int):
+        '''
+        generation is the Event.generation of data.  If data[start:] does
+        not decode to a sequence of whole commands, the index is made with
+        valid set to False and should not be searched.  It is still kept so
+        that the script is not decoded again until it changes.
+        '''
+        self.start = start
+        self.length = len(data)
+        self.generation = generation
+        self.opcodes: list[int] = []
+        self.valid = True
+
+        positions: list[int] = []
+        try:
+            self._scan(data, start, len(data), positions, self.opcodes)
+        except Exception:
+            self.valid = False
+            positions, self.opcodes = [], []
+
+        opcode_positions: dict[int, list[int]] = {}
+        fwd_jumps: list[int] = []
+        back_jumps: list[int] = []
+        for pos, opcode in zip(positions, self.opcodes):
+            opcode_positions.setdefault(opcode, []).append(pos)
+            if opcode in _FWD_JUMP_COMMANDS:
+                fwd_jumps.append(pos)
+            elif opcode in _BACK_JUMP_COMMANDS:
+                back_jumps.append(pos)
+
+        self.positions = _PositionList(positions)
+        self.opcode_positions: dict[int, _PositionList] = {
+            opcode: _PositionList(cmd_positions)
+            for opcode, cmd_positions in opcode_positions.items()
+        }
+        self.fwd_jumps = _PositionList(fwd_jumps)
+        self.back_jumps = _PositionList(back_jumps)
+
+    def __get_jump_list(self, opcode: int) -> _PositionList:
+        '''The jump list an opcode belongs in (a throwaway one if none).'''
+        if opcode in _FWD_JUMP_COMMANDS:
+            return self.fwd_jumps
+        if opcode in _BACK_JUMP_COMMANDS:
+            return self.back_jumps
+        return _PositionList()
+
+    @staticmethod
+    def _scan(data: ByteString, pos: int, end: int,
+              positions: list[int], opcodes: list[int]):
+        while pos < end:
+            positions.append(pos)
+            opcodes.append(data[pos])
+            pos += get_command_length(data, pos)
+
+        if pos != end:
+            raise ValueError('Last command runs past the end of the data.')
+
+    def is_current(self, generation: int) -> bool:
+        '''Whether the index was built for (or synced to) generation.'''
+        return generation == self.generation
+
+    def sync(self, generation: int):
+        '''
+        Accept edits which did not move any command boundary or change any
+        opcode.  generation is the script's generation after the edits.
+        '''
+        self.generation = generation
+
+    def is_boundary(self, pos: int) -> bool:
+        '''Whether a command starts at pos (or pos is the end of data).'''
+        if not self.valid or pos < self.start:
+            return False
+
+        if pos == self.length:
+            return True
+
+        ind = self.positions.bisect_left(pos)
+        return ind < len(self.positions) and self.positions[ind] == pos
+
+    def get_positions(self, cmd_ids: Iterable[int],
+                      start: int, end: int) -> list[int]:
+        '''
+        Get the sorted positions in [start, end) of commands with an opcode
+        in cmd_ids.
+        '''
+        ret = []
+        for cmd_id in set(cmd_ids):
+            cmd_positions = self.opcode_positions.get(cmd_id, None)
+            if cmd_positions is None:
+                continue
+
+            lo = cmd_positions.bisect_left(start)
+            hi = cmd_positions.bisect_left(end, lo)
+            ret.extend(cmd_positions[lo:hi])
+
+        ret.sort()
+        return ret
+
+    def find_first(self, cmd_ids: Iterable[int],
+                   start: int, end: int) -> Optional[int]:
+        '''
+        Get the first position in [start, end) of a command with an opcode in
+        cmd_ids.  Returns None if there is none.
+        '''
+        best = None
+        for cmd_id in set(cmd_ids):
+            cmd_positions = self.opcode_positions.get(cmd_id, None)
+            if cmd_positions is None:
+                continue
+
+            ind = cmd_positions.bisect_left(start)
+            if ind < len(cmd_positions):
+                pos = cmd_positions[ind]
+                if pos < end and (best is None or pos < best):
+                    best = pos
+
+        return best
+
+    def get_jump_candidates(self, before_pos: int,
+                            after_pos: int) -> list[int]:
+        '''
+        Get the sorted positions of the jumps which might cover an edit of
+        [before_pos, after_pos).  Only these can need their arguments
+        shifted.
+        '''
+        # A forward jump's span starts at the command.
+        lo = self.fwd_jumps.bisect_left(before_pos - MAX_JUMP_SPAN)
+        hi = self.fwd_jumps.bisect_left(before_pos, lo)
+        candidates = self.fwd_jumps[lo:hi]
+
+        # A backward jump's span ends just after the command.
+        lo = self.back_jumps.bisect_left(after_pos - _MAX_JUMP_LEN)
+        hi = self.back_jumps.bisect_left(before_pos + MAX_JUMP_SPAN, lo)
+        if hi > lo:
+            candidates.extend(self.back_jumps[lo:hi])
+            candidates.sort()
+
+        return candidates
+
+    def _shift(self, pos: int, shift: int):
+        '''Shift every command at or after pos by shift.'''
+        self.length += shift
+        for cmd_positions in (self.positions,
+                              *self.opcode_positions.values(),
+                              self.fwd_jumps, self.back_jumps):
+            cmd_positions.shift(cmd_positions.bisect_left(pos), shift)
+
+    def insert(self, pos: int, new_commands: ByteString,
+               generation: int) -> bool:
+        '''
+        Record that new_commands were inserted at pos.  generation is the
+        script's generation after the insertion.  Returns False (and the
+        index should be dropped) if this can not be done incrementally.
+        '''
+        if not self.is_boundary(pos):
+            return False
+
+        new_positions: list[int] = []
+        new_opcodes: list[int] = []
+        try:
+            self._scan(new_commands, 0, len(new_commands),
+                       new_positions, new_opcodes)
+        except Exception:
+            return False
+
+        self._shift(pos, len(new_commands))
+
+        ind = self.positions.bisect_left(pos)
+        self.positions.insert(ind, [x + pos for x in new_positions])
+        self.opcodes[ind:ind] = new_opcodes
+
+        for new_pos, opcode in zip(new_positions, new_opcodes):
+            cmd_positions = self.opcode_positions.get(opcode, None)
+            if cmd_positions is None:
+                cmd_positions = _PositionList()
+                self.opcode_positions[opcode] = cmd_positions
+            cmd_positions.insort(new_pos + pos)
+            self.__get_jump_list(opcode).insort(new_pos + pos)
+
+        self.sync(generation)
+        return True
+
+    def delete(self, pos: int, length: int, generation: int) -> bool:
+        '''
+        Record that the commands in [pos, pos+length) were deleted.
+        generation is the script's generation after the deletion.  Returns
+        False (and the index should be dropped) if this can not be done
+        incrementally.
+        '''
+        end = pos + length
+        if not self.is_boundary(pos) or not self.is_boundary(end):
+            return False
+
+        lo = self.positions.bisect_left(pos)
+        hi = self.positions.bisect_left(end, lo)
+        for del_pos, opcode in zip(self.positions[lo:hi],
+                                   self.opcodes[lo:hi]):
+            self.opcode_positions[opcode].remove(del_pos)
+            if opcode in _FWD_JUMP_COMMANDS:
+                self.fwd_jumps.remove(del_pos)
+            elif opcode in _BACK_JUMP_COMMANDS:
+                self.back_jumps.remove(del_pos)
+
+        self.positions.delete(lo, hi)
+        del self.opcodes[lo:hi]
+
+        self._shift(end, -length)
+        self.sync(generation)
+        return True
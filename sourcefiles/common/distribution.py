@@ -8,7 +8,7 @@ the weights, then return a random element of the pair's value_list.
 
 from __future__ import annotations
 
-import random
+import rng
 import typing
 
 
@@ -52,7 +52,7 @@ class Distribution(typing.Generic[T]):
             weight_object_pairs: typing.Sequence[typing.Tuple[int, ObjType]]
     ) -> list[typing.Tuple[int, ObjType]]:
         '''
-        Replace non-sequences with a one element list so that random.choice()
+        Replace non-sequences with a one element list so that rng.choice()
         can be used.
         '''
         new_pairs = list(weight_object_pairs)
@@ -81,14 +81,14 @@ class Distribution(typing.Generic[T]):
         First choose a weight-object pair based on weights.  Then (uniformly)
         choose an element of that object.
         '''
-        target = random.randrange(0, self.__total_weight)
+        target = rng.randrange(0, self.__total_weight)
 
         cum_weight = 0
         for weight, obj in self.weight_object_pairs:
             cum_weight += weight
 
             if cum_weight > target:
-                return random.choice(obj)
+                return rng.choice(obj)
 
         raise ValueError('No choice made.')
 
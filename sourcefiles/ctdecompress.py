@@ -7,14 +7,48 @@ from typing import ByteString
 try:
     from ctcompress import compress
     # print('Using C compression implementation.')
+    HAS_C_COMPRESS = True
 except ImportError:
     # print('C compression module not found.  Falling back to python.')
     def compress(source: bytearray) -> bytearray:
         return compress_py_2(source)
 
+    HAS_C_COMPRESS = False
 
-def decompress(rom, start):
-    out_buffer = bytearray([0 for i in range(0, 0x10000)])
+# Older builds of ctcompress only have compress.
+try:
+    from ctcompress import decompress as _decompress_c, \
+        get_compressed_length as _get_compressed_length_c
+except ImportError:
+    _decompress_c = None
+    _get_compressed_length_c = None
+
+
+def decompress(rom: ByteString, start: int) -> bytearray:
+    '''Decompress the packet starting at rom[start].'''
+    if _decompress_c is not None:
+        try:
+            return _decompress_c(rom, start)
+        except TypeError:
+            # rom does not support the buffer protocol.
+            pass
+
+    return decompress_py(rom, start)
+
+
+def get_compressed_length(rom: ByteString, addr: int) -> int:
+    '''Find the length of the compressed packet starting at rom[addr].'''
+    if _get_compressed_length_c is not None:
+        try:
+            return _get_compressed_length_c(rom, addr)
+        except TypeError:
+            pass
+
+    return get_compressed_length_py(rom, addr)
+
+
+def decompress_py(rom, start):
+    out_buffer = bytearray(0x10000)
 
     # First two bytes are little endian size of compressed packet
     main_len = get_value_from_bytes(rom[start:start+2])
@@ -95,7 +129,7 @@ def decompress(rom, start):
 
 
 # Find the length of a compressed packet
-def get_compressed_length(rom: ByteString, addr: int):
+def get_compressed_length_py(rom: ByteString, addr: int):
 
     # First two bytes determine length of main body
     main_length = get_value_from_bytes(rom[addr:addr+2])
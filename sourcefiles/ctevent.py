@@ -1,16 +1,29 @@
 from __future__ import annotations
+import bisect
+import concurrent.futures
+from dataclasses import dataclass
 import enum
-from typing import ByteString, Optional, Tuple
+import os
+import threading
+from typing import ByteString, Optional, Tuple, TYPE_CHECKING
 
-from ctdecompress import compress, decompress, get_compressed_length, \
-    get_compressed_packet
+from ctdecompress import decompress, get_compressed_length, \
+    get_compressed_packet, HAS_C_COMPRESS
 from ctenums import LocID
 from byteops import get_value_from_bytes, to_little_endian, to_file_ptr, \
     to_rom_ptr
+from commandindex import CommandIndex, MAX_JUMP_SPAN
 import ctstrings
-from eventcommand import EventCommand as EC, get_command
+import fluxcache
+import scriptcache
+import spaceledger
+from eventcommand import EventCommand as EC, CommandView, get_command, \
+    get_command_length
 from eventfunction import EventFunction as EF
-from freespace import FSRom, FSWriteType
+from freespace import FSRom, FSWriteType, FreeSpaceError
+
+if TYPE_CHECKING:
+    from scriptindex import ScriptIndex
 
 
 class FunctionID(enum.IntEnum):
@@ -97,22 +110,106 @@ def get_location_script(rom, loc_id):
     return get_compressed_script(rom, loc_script_ind)
 
 
+class ScriptData(bytearray):
+    '''
+    An event's script bytes.  A bytearray which counts the edits made to it,
+    so that Event.generation also changes when data is edited directly.
+    Slices are plain bytearrays.
+    '''
+    edit_count = 0
+
+    def __setitem__(self, key, value):
+        self.edit_count += 1
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self.edit_count += 1
+        super().__delitem__(key)
+
+    def __iadd__(self, other):
+        self.edit_count += 1
+        return super().__iadd__(other)
+
+    def __imul__(self, other):
+        self.edit_count += 1
+        return super().__imul__(other)
+
+    def append(self, item):
+        self.edit_count += 1
+        super().append(item)
+
+    def extend(self, iterable):
+        self.edit_count += 1
+        super().extend(iterable)
+
+    def insert(self, index, item):
+        self.edit_count += 1
+        super().insert(index, item)
+
+    def pop(self, index=-1):
+        self.edit_count += 1
+        return super().pop(index)
+
+    def remove(self, value):
+        self.edit_count += 1
+        super().remove(value)
+
+    def clear(self):
+        self.edit_count += 1
+        super().clear()
+
+    def reverse(self):
+        self.edit_count += 1
+        super().reverse()
+
+
 # The strategy is to handle the event very similarly to how the game does.
 # The event is just one big list of commands with pointers giving the starts
 # of relevant entities (objects, functions).
 class Event:
 
     def __init__(self):
+        # See the generation property.
+        self._generation = 0
+        self._data = ScriptData()
+
         self.num_objects = 0
 
         # self.extra_ptr_st = 0
         # self.script_st = 0
 
-        self.data = bytearray()
-
         self.modified_strings = False
         self.strings = []
 
+        # Built on the first search.  See commandindex.
+        self._command_index: Optional[CommandIndex] = None
+
+    @property
+    def data(self) -> ScriptData:
+        return self._data
+
+    @data.setter
+    def data(self, value: ByteString):
+        generation = self.generation
+        if not isinstance(value, ScriptData):
+            value = ScriptData(value)
+
+        self._data = value
+        self.generation = generation + 1
+
+    @property
+    def generation(self) -> int:
+        '''
+        Changes whenever the script's data changes, whether through the
+        Event's methods or by editing data directly.  Direct edits to
+        strings do not change it.
+        '''
+        return self._generation + self._data.edit_count
+
+    @generation.setter
+    def generation(self, value: int):
+        self._generation = value - self._data.edit_count
+
     def get_bytearray(self) -> bytearray:
         return bytearray([self.num_objects]) + self.data
 
@@ -123,12 +220,29 @@ class Event:
         ptr = get_loc_event_ptr(rom, loc_id)
         return Event.from_rom(rom, ptr)
 
+    def copy(self) -> Event:
+        '''Get a copy of the event which shares no mutable state with it.'''
+        ret = Event()
+        ret.num_objects = self.num_objects
+        ret.data = ScriptData(self.data)
+        ret.strings = [type(string)(string) for string in self.strings]
+        ret.modified_strings = self.modified_strings
+
+        return ret
+
     @staticmethod
     def from_flux(filename: str):
-        '''Reads a .flux file and loads it into an Event'''
+        '''
+        Reads a .flux file and loads it into an Event.  Files are only
+        parsed once per process (see fluxcache).
+        '''
+        return fluxcache.default_cache.get_event(filename,
+                                                 Event.from_flux_bytes)
 
-        with open(filename, 'rb') as infile:
-            flux = bytearray(infile.read())
+    @staticmethod
+    def from_flux_bytes(flux: ByteString) -> Event:
+        '''Loads the contents of a .flux file into an Event'''
+        flux = bytearray(flux)
 
         # These first bytes are used internally by TF, but they don't seem
         # to matter for our purposes.  If we want to write flux files we'll
@@ -206,6 +320,15 @@ class Event:
 
     @classmethod
     def from_rom(cls, rom: ByteString, ptr: int) -> Event:
+        return cls.from_rom_with_string_addrs(rom, ptr)[0]
+
+    @classmethod
+    def from_rom_with_string_addrs(
+            cls, rom: ByteString, ptr: int) -> Tuple[Event, list[int]]:
+        '''
+        Read an event and also return the rom address of each of its strings.
+        The addresses let a caller check later whether the strings changed.
+        '''
         ret_event = Event()
 
         event = decompress(rom, ptr)
@@ -224,9 +347,9 @@ class Event:
         # ret_event.script_st = get_value_from_bytes(event[0:2])
 
         # Build the strings up.
-        ret_event.__init_strings(rom)
+        string_addrs = ret_event.__init_strings(rom)
 
-        return ret_event
+        return ret_event, string_addrs
 
     def print_fn_starts(self):
         for i in range(self.num_objects):
@@ -243,6 +366,7 @@ class Event:
         return self.add_string(ct_str)
 
     def add_string(self, new_string: bytearray) -> int:
+        self.generation += 1
         self.strings.append(new_string)
         self.modified_strings = True
         return len(self.strings) - 1
@@ -282,7 +406,7 @@ class Event:
         pos = start
         found = False
         while pos < end:
-            cmd = get_command(self.data, pos)
+            cmd = CommandView(self.data, pos)
 
             if cmd.command == 0xB8:
                 string_index = cmd.args[0]
@@ -314,7 +438,8 @@ class Event:
 
     # This is only called during initialization of a script
     # We need access to the whole rom to look up the strings used by the script
-    def __init_strings(self, rom: ByteString):
+    # Returns the rom address of each string in self.strings.
+    def __init_strings(self, rom: ByteString) -> list[int]:
 
         # First find the location where string pointers are stored by finding
         # the "string index" command in the script.
@@ -322,7 +447,7 @@ class Event:
 
         str_pos = None
         while pos < len(self.data):
-            cmd = get_command(self.data, pos)
+            cmd = CommandView(self.data, pos)
 
             if cmd.command == 0xB8:
                 str_pos = cmd.args[0]
@@ -343,7 +468,7 @@ class Event:
 
         pos = self.get_object_start(0)
         while pos < len(self.data):
-            cmd = get_command(self.data, pos)
+            cmd = CommandView(self.data, pos)
 
             if cmd.command in EC.str_commands:
                 # string index argument is 0th arg
@@ -355,6 +480,7 @@ class Event:
         # turn str_indices into a sorted list
         str_indices_list = sorted(list(str_indices))
         self.strings = []
+        string_addrs = []
 
         if str_indices:
             if str_pos is None:
@@ -369,6 +495,7 @@ class Event:
                 str_st = get_value_from_bytes(rom[ptr_st:ptr_st+2])+bank
 
                 self.strings.append(Event.__get_ct_string(rom, str_st))
+                string_addrs.append(str_st)
 
                 # print(' '.join(f"{x:02X}" for x in self.strings[-1]))
                 # input()
@@ -384,6 +511,8 @@ class Event:
 
         # end if there are any strings
 
+        return string_addrs
+
     def get_object_start(self, obj_id: int) -> int:
         return get_value_from_bytes(self.data[32*obj_id: 32*obj_id+2])
 
@@ -434,6 +563,7 @@ class Event:
     # to routines in the deleted object.
     def remove_object(self, obj_id: int, remove_calls: bool = True):
 
+        self.generation += 1
         if remove_calls:
             self.__remove_shift_object_calls(obj_id)
 
@@ -548,6 +678,7 @@ class Event:
     # This will break if the object has references to other objects' fns
     def append_copy_object(self, obj_id: int):
 
+        self.generation += 1
         if self.num_objects == 0x40:
             raise IndexError("No room for additional objects.")
 
@@ -575,6 +706,7 @@ class Event:
 
     def append_empty_object(self) -> int:
         '''Makes space for new object.  Returns new object id.'''
+        self.generation += 1
 
         if self.num_objects == 0x40:
             raise IndexError("No room for additional objects.")
@@ -601,6 +733,7 @@ class Event:
         Insert a copy of object copy_id into spot ins_id.
         Will break if the object calls other object functions.
         '''
+        self.generation += 1
 
         orig_obj_st = self.get_function_start(copy_id, 0)
         orig_obj_ptrs = [
@@ -689,6 +822,7 @@ class Event:
         return true_end
 
     def _set_function_start(self, obj_id, func_id, new_start):
+        self.generation += 1
         ptr_st = obj_id*32 + func_id*2
         self.data[ptr_st:ptr_st+2] = int.to_bytes(new_start, 2, 'little')
 
@@ -701,6 +835,7 @@ class Event:
         '''
         Version of set_function that tries to handle linked functions.
         '''
+        self.generation += 1
 
         # for i in range(0x10):
         #     is_linked = self._function_is_linked(obj_id, i)
@@ -780,6 +915,7 @@ class Event:
     def set_function_old(self, obj_id: int, func_id: int,
                          ev_func: EF):
         '''Sets the given EventFunction in the script.'''
+        self.generation += 1
 
         # The main difficulty is figuring out where the function should
         # actually begin.  The default behavior of CT scripts is that
@@ -866,6 +1002,7 @@ class Event:
     # object (call obj function, visibility, etc) and shifts all other calls
     # to objects past the removed one by 1.
     def delete_object(self, obj_id: int):
+        self.generation += 1
         # print(f"delete obj {obj_id:02X}")
         # We're going to assume that the init functions (function 0) always
         # have real start locations.  It would be crazy if this were not so.
@@ -903,6 +1040,7 @@ class Event:
 
     def set_string_index(self, rom_ptr: int):
 
+        self.generation += 1
         start = self.get_function_start(0, 0)
         end = self.get_function_end(0, 0)
 
@@ -942,14 +1080,19 @@ class Event:
 
         # print(f"{start_pos:04X}, {end_pos:04X}")
 
+        index = self.__get_command_index()
+        if index.is_boundary(start_pos):
+            pos = index.find_first(cmd_ids, start_pos, end_pos)
+            if pos is None:
+                return (None, EC.get_blank_command(1))
+            return (pos, get_command(self.data, pos))
+
         pos = start_pos
         while pos < end_pos:
-            cmd = get_command(self.data, pos)
-
-            if cmd.command in cmd_ids:
-                return (pos, cmd)
+            if self.data[pos] in cmd_ids:
+                return (pos, get_command(self.data, pos))
 
-            pos += len(cmd)
+            pos += get_command_length(self.data, pos)
 
         # returning colorcrash so mypy doesn't want Optional[Event]
         return (None, EC.get_blank_command(1))
@@ -988,23 +1131,57 @@ class Event:
 
         jump_cmds = EC.fwd_jump_commands + EC.back_jump_commands
 
-        pos = start_pos
-        while pos < end_pos:
-            cmd = get_command(self.data, pos)
+        # Both ways of matching need the same command id.
+        for pos in self.__find_command_positions([find_cmd.command],
+                                                 start_pos, end_pos):
+            cmd = CommandView(self.data, pos)
 
-            if cmd == find_cmd:
+            if cmd.args == find_cmd.args:
                 return pos
             if (
                     cmd.command in jump_cmds and
-                    cmd.command == find_cmd.command and
                     cmd.args[0:-1] == find_cmd.args[0:-1]
             ):
                 return pos
 
-            pos += len(cmd)
-
         return None
 
+    def __get_command_index(self) -> CommandIndex:
+        '''Get the command index, rebuilding it if the data changed.'''
+        index = self._command_index
+        if index is None or not index.is_current(self.generation):
+            index = CommandIndex(self.data, self.get_object_start(0),
+                                 self.generation)
+            self._command_index = index
+
+        return index
+
+    def __sync_command_index(self):
+        '''
+        Keep the command index after edits which changed only arguments
+        that don't affect command lengths.
+        '''
+        if self._command_index is not None:
+            self._command_index.sync(self.generation)
+
+    def __find_command_positions(self, cmd_ids: list[int],
+                                 start_pos: int, end_pos: int) -> list[int]:
+        '''Get the positions of all commands in cmd_ids in the range.'''
+        index = self.__get_command_index()
+        if index.is_boundary(start_pos):
+            return index.get_positions(cmd_ids, start_pos, end_pos)
+
+        # start_pos is not a known command boundary.  Decode from it like
+        # the game would.
+        positions = []
+        pos = start_pos
+        while pos < end_pos:
+            if self.data[pos] in cmd_ids:
+                positions.append(pos)
+            pos += get_command_length(self.data, pos)
+
+        return positions
+
     def find_exact_command(
             self, find_cmd: EC,
             start_pos: Optional[int] = None,
@@ -1037,16 +1214,18 @@ class Event:
                       after_pos: int,
                       shift: int):
 
-        pos: Optional[int] = self.get_object_start(0)
-
-        jmp_cmds = EC.fwd_jump_commands + EC.back_jump_commands
+        index = self.__get_command_index()
+        if index.valid:
+            # Only the jumps near the edit can span it.
+            jmp_positions = index.get_jump_candidates(before_pos, after_pos)
+        else:
+            jmp_positions = self.__find_command_positions(
+                EC.fwd_jump_commands + EC.back_jump_commands,
+                self.get_object_start(0), len(self.data)
+            )
 
-        while True:
-            # Find the next jump command
-            (pos, cmd) = self.find_command_opt(jmp_cmds, pos)
-
-            if pos is None:
-                break
+        for pos in jmp_positions:
+            cmd = CommandView(self.data, pos)
 
             jump_mult = 2*(cmd.command in EC.fwd_jump_commands)-1
             jump_target = pos + len(cmd) + cmd.args[-1]*jump_mult - 1
@@ -1079,7 +1258,8 @@ class Event:
                 # print('not shifting')
                 # input()
 
-            pos += len(cmd)
+        # Jump commands have a fixed length, so no boundaries moved.
+        self.__sync_command_index()
 
     # Helper method for dealing with insertions and deletions.
     # All function starts strictly exceeding start_thresh will be shifted
@@ -1094,43 +1274,46 @@ class Event:
     #       the pointer block expanded/contracted.  Use start_thresh <=0 and
     #       shift will be +/- a multiple of 32.
     def __shift_starts(self, start_thresh: int, shift: int):
-        for ptr in range(32*self.num_objects-2, -2, -2):
-            ptr_loc = get_value_from_bytes(self.data[ptr:ptr+2])
+        # The pointers are edited in a copy and written back at once, so the
+        # script's data only counts one edit.
+        ptr_block = self.data[0:32*self.num_objects]
+        for ptr in range(len(ptr_block)-2, -2, -2):
+            ptr_loc = get_value_from_bytes(ptr_block[ptr:ptr+2])
 
             if ptr_loc > start_thresh:
-                self.data[ptr:ptr+2] = to_little_endian(ptr_loc+shift, 2)
+                ptr_block[ptr:ptr+2] = to_little_endian(ptr_loc+shift, 2)
+
+        self.data[0:len(ptr_block)] = ptr_block
 
     def __shift_calls_back(self, deleted_obj: int):
-        pos: Optional[int] = self.get_function_start(0, 0)
-        end = len(self.data)
-        while True:
-            (pos, cmd) = self.find_command_opt([2, 3, 4],
-                                               pos, end)
-            if pos is None:
-                break
+        call_positions = self.__find_command_positions(
+            [2, 3, 4], self.get_function_start(0, 0), len(self.data)
+        )
+
+        for pos in call_positions:
+            cmd = CommandView(self.data, pos)
 
             if cmd.args[0] > 2*deleted_obj:
                 # print(f"shifted [{pos:04X}] " + str(cmd))
                 # input()
                 self.data[pos+1] -= 2
 
-            pos += len(cmd)
+        self.__sync_command_index()
 
     def __shift_calls_forward(self, inserted_obj: int):
-        pos: Optional[int] = self.get_function_start(0, 0)
-        end = len(self.data)
-        while True:
-            (pos, cmd) = self.find_command_opt([2, 3, 4],
-                                               pos, end)
-            if pos is None:
-                break
+        call_positions = self.__find_command_positions(
+            [2, 3, 4], self.get_function_start(0, 0), len(self.data)
+        )
+
+        for pos in call_positions:
+            cmd = CommandView(self.data, pos)
 
             if cmd.args[0] > 2*inserted_obj:
                 # print(f"shifted [{pos:04X}] " + str(cmd))
                 # input()
                 self.data[pos+1] += 2
 
-            pos += len(cmd)
+        self.__sync_command_index()
 
     def replace_command(self, from_cmd: EC, to_cmd: EC,
                         start: Optional[int] = None,
@@ -1164,9 +1347,9 @@ class Event:
                 print("Error: Deleting out of script's range.")
                 raise ValueError
 
-            cmd = get_command(self.data, pos)
-            cmd_len += len(cmd)
-            pos += len(cmd)
+            length = get_command_length(self.data, pos)
+            cmd_len += length
+            pos += length
 
         pos = del_pos
 
@@ -1179,6 +1362,13 @@ class Event:
 
         del self.data[del_pos:del_pos+cmd_len]
 
+        # Only bumped now so that __shift_jumps could use the command index.
+        self.generation += 1
+        index = self._command_index
+        if index is not None and \
+           not index.delete(del_pos, cmd_len, self.generation):
+            self._command_index = None
+
     def delete_commands_range(self, del_start_pos: int, del_end_pos: int):
 
         if del_start_pos > del_end_pos:
@@ -1187,10 +1377,9 @@ class Event:
         pos = del_start_pos
         length_to_delete = del_end_pos - del_start_pos
         deleted_length = 0
-        while deleted_length < length_to_delete:
-            cmd = get_command(self.data, pos)
-            self.delete_commands(pos)
-            deleted_length += len(cmd)
+        with self.edit() as tx:
+            while deleted_length < length_to_delete:
+                deleted_length += tx.delete(pos + deleted_length)
 
         if deleted_length != length_to_delete:
             print('Warning: Last deleted command exceeded del_end_pos')
@@ -1244,6 +1433,135 @@ class Event:
 
         return pos
 
+    def edit(self) -> EventTransaction:
+        '''
+        Start a batch of edits.  Positions given to the transaction are
+        offsets into the script as it is now, and the edits are applied
+        together when the with block ends:
+
+            with script.edit() as tx:
+                tx.replace(pos, new_cmd.to_bytearray())
+                tx.delete(other_pos, 2)
+
+        The result is the same as calling insert_commands and
+        delete_commands in the same order (with positions adjusted for the
+        earlier edits), but the script is only spliced and its jumps and
+        function starts only fixed up once.
+        '''
+        return EventTransaction(self)
+
+    def _apply_edits(self, edits: list[_ScriptEdit]):
+        '''
+        Apply the edits queued by an EventTransaction.
+
+        Except for edits at the same position, the result does not depend on
+        the order the edits were queued in.  The edits are sorted once and
+        treated as if they were made in order of position.  Then each jump
+        only needs to be followed through the edits within a jump's span of
+        it, and each function start only needs the total shift of the edits
+        before it.
+        '''
+        self.generation += 1
+
+        # Stable, so edits at the same position keep the order they were
+        # made in.
+        edits = sorted(edits, key=lambda edit: edit.pos)
+        edit_starts = [edit.pos for edit in edits]
+
+        # shifts[i] is the change in length from edits[:i].
+        # edit_positions[i] is where edits[i] lands in the script as it is
+        # when the edit is made.  Earlier edits at the same position only
+        # move it by what they inserted.
+        # del_ends[i] is the furthest end of a deletion in edits[:i+1].
+        shifts = [0]
+        edit_positions = []
+        del_ends = []
+        group_shift, same_pos_ins = 0, 0
+        for ind, edit in enumerate(edits):
+            if ind > 0 and edits[ind-1].pos == edit.pos:
+                same_pos_ins += len(edits[ind-1].insert)
+            else:
+                group_shift, same_pos_ins = shifts[ind], 0
+
+            edit_positions.append(edit.pos + group_shift + same_pos_ins)
+            shifts.append(shifts[ind] + len(edit.insert) - edit.del_len)
+            del_ends.append(max(edit.pos + edit.del_len,
+                                del_ends[-1] if del_ends else 0))
+
+        new_data = self.data[:]
+
+        # Follow each jump through the edits using the same rules as
+        # __shift_jumps.
+        jmp_cmds = EC.fwd_jump_commands + EC.back_jump_commands
+        jmp_positions = self.__find_command_positions(
+            jmp_cmds, self.get_object_start(0), len(self.data)
+        )
+
+        for pos in jmp_positions:
+            # Edits further away than a jump's span only move the jump.
+            lo = bisect.bisect_left(edit_starts, pos - MAX_JUMP_SPAN)
+            hi = bisect.bisect_right(edit_starts, pos + MAX_JUMP_SPAN, lo)
+            if lo > 0 and del_ends[lo-1] > pos:
+                # The jump is inside an earlier deletion.
+                continue
+
+            cmd = CommandView(self.data, pos)
+            cmd_len = len(cmd)
+            jump_mult = 2*(cmd.command in EC.fwd_jump_commands)-1
+            jump_bytes = cmd.args[-1]
+
+            cur_pos = pos + shifts[lo]
+            for ind in range(lo, hi):
+                edit, edit_pos = edits[ind], edit_positions[ind]
+                jump_target = cur_pos + cmd_len + jump_bytes*jump_mult - 1
+                cmd_bound = cur_pos
+                if jump_mult == -1:
+                    cmd_bound += cmd_len
+
+                start = min(cmd_bound, jump_target)
+                end = max(cmd_bound, jump_target)
+
+                if edit.del_len == 0:
+                    shift = len(edit.insert)
+                    can_shift_aft = end > edit_pos
+                else:
+                    shift = -edit.del_len
+                    can_shift_aft = end >= edit_pos + edit.del_len
+
+                if can_shift_aft and start < edit_pos:
+                    jump_bytes += shift
+
+                if cur_pos >= edit_pos + edit.del_len:
+                    cur_pos += shift
+                elif cur_pos >= edit_pos:
+                    # The jump itself is deleted.
+                    break
+            else:
+                arg_offset = cmd_len - cmd.arg_lens[-1]
+                new_data[pos+arg_offset] = jump_bytes
+
+        # A function start moves with the edits strictly before it, as in
+        # __shift_starts.
+        for ptr in range(0, 32*self.num_objects, 2):
+            orig_start = get_value_from_bytes(self.data[ptr:ptr+2])
+            shift = shifts[bisect.bisect_left(edit_starts, orig_start)]
+
+            if shift != 0:
+                new_data[ptr:ptr+2] = to_little_endian(orig_start + shift, 2)
+
+        # Splice in one pass.
+        spliced = bytearray()
+        src_pos = 0
+        for edit in edits:
+            if edit.pos > src_pos:
+                spliced.extend(new_data[src_pos:edit.pos])
+                src_pos = edit.pos
+            spliced.extend(edit.insert)
+            src_pos += edit.del_len
+        spliced.extend(new_data[src_pos:])
+
+        self.data[:] = spliced
+
     # This is for short additions.  In particular no string additions are
     # allowed here.
     def insert_commands(self, new_commands: bytearray, ins_position: int):
@@ -1260,6 +1578,119 @@ class Event:
 
         self.data[ins_position:ins_position] = new_commands
 
+        # Only bumped now so that __shift_jumps could use the command index.
+        self.generation += 1
+        index = self._command_index
+        if index is not None and \
+           not index.insert(ins_position, new_commands, self.generation):
+            self._command_index = None
+
+
+@dataclass
+class _ScriptEdit:
+    '''An insertion (del_len == 0) or deletion queued in a transaction.'''
+    pos: int
+    insert: bytes = b''
+    del_len: int = 0
+
+
+class EventTransaction:
+    '''
+    Queues edits to an Event and applies them together.  See Event.edit.
+
+    All positions are offsets into the script as it was when the
+    transaction began.  Deleted ranges may not overlap each other, and
+    nothing may be inserted strictly inside a deleted range.  Inserted
+    commands are not adjusted for the other edits, so jumps in them must
+    stay inside the inserted block.
+    '''
+    def __init__(self, event: Event):
+        self.event = event
+        self._orig_data = bytes(event.data)
+        self._edits: list[_ScriptEdit] = []
+        # Sorted, for checking new edits against the queued ones.
+        self._deleted: list[Tuple[int, int]] = []
+        self._insert_positions: list[int] = []
+
+    def __enter__(self) -> EventTransaction:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self._edits = []
+
+    def __check_pos(self, pos: int):
+        if not 0 <= pos <= len(self._orig_data):
+            raise ValueError(f'Position {pos:04X} out of script range.')
+
+    def __inside_deleted(self, pos: int) -> bool:
+        # The deletions are sorted and do not overlap, so only the last one
+        # starting before pos can contain it.
+        ind = bisect.bisect_left(self._deleted, (pos,))
+        return ind > 0 and self._deleted[ind-1][1] > pos
+
+    def insert(self, pos: int, new_commands: ByteString):
+        '''Insert new_commands before the command at pos.'''
+        self.__check_pos(pos)
+        if self.__inside_deleted(pos):
+            raise ValueError(f'Insertion at {pos:04X} is inside a deletion.')
+
+        self._edits.append(_ScriptEdit(pos, bytes(new_commands)))
+        bisect.insort(self._insert_positions, pos)
+
+    def delete(self, pos: int, num_commands: int = 1) -> int:
+        '''
+        Delete num_commands commands starting at pos.  Returns the number of
+        bytes which will be deleted.
+        '''
+        self.__check_pos(pos)
+
+        end = pos
+        for _ in range(num_commands):
+            if end >= len(self._orig_data):
+                raise ValueError("Deleting out of script's range.")
+            end += get_command_length(self._orig_data, end)
+
+        ind = bisect.bisect_left(self._deleted, (pos,))
+        if (ind > 0 and self._deleted[ind-1][1] > pos) or \
+           (ind < len(self._deleted) and self._deleted[ind][0] < end):
+            raise ValueError(
+                f'Deletion [{pos:04X}, {end:04X}) overlaps an earlier '
+                'deletion.'
+            )
+
+        ind = bisect.bisect_right(self._insert_positions, pos)
+        if ind < len(self._insert_positions) and \
+           self._insert_positions[ind] < end:
+            raise ValueError(
+                f'Deletion [{pos:04X}, {end:04X}) contains an insertion.'
+            )
+
+        bisect.insort(self._deleted, (pos, end))
+        self._edits.append(_ScriptEdit(pos, del_len=end-pos))
+        return end - pos
+
+    def replace(self, pos: int, new_commands: ByteString,
+                num_commands: int = 1):
+        '''Replace num_commands commands starting at pos with new_commands.'''
+        self.insert(pos, new_commands)
+        self.delete(pos, num_commands)
+
+    def commit(self):
+        '''Apply the queued edits.  Called at the end of the with block.'''
+        if self.event.data != self._orig_data:
+            raise ValueError('Script changed during the transaction.')
+
+        if self._edits:
+            self.event._apply_edits(self._edits)
+
+        self._edits = []
+        self._deleted = []
+        self._insert_positions = []
+        self._orig_data = bytes(self.event.data)
+
 
 # Find the length of a location's event script
 def get_compressed_event_length(rom: ByteString, loc_id: int) -> int:
@@ -1267,6 +1698,45 @@ def get_compressed_event_length(rom: ByteString, loc_id: int) -> int:
     return get_compressed_length(rom, ptr)
 
 
+class ScriptPlacement(enum.Enum):
+    '''Where write_script_to_rom put a script's packet.'''
+    IN_PLACE = enum.auto()   # Where the old packet was
+    SAME_BANK = enum.auto()  # Elsewhere in the old packet's bank
+    FIRST_FIT = enum.auto()  # The first free block anywhere
+
+
+# The thread pool compress_scripts uses, made on first use and kept.
+# Starting a pool's threads on every call cost about as much as compressing
+# the few scripts a call usually has.  A forked child does not have its
+# parent's threads, so the pool is keyed by the process it was made in as
+# well as its size.
+_compress_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_compress_pool_key: Optional[tuple[int, Optional[int]]] = None
+_compress_pool_lock = threading.Lock()
+
+
+def _get_compress_pool(
+        num_workers: Optional[int]
+) -> concurrent.futures.ThreadPoolExecutor:
+    '''Get the shared compression pool with num_workers threads.'''
+    global _compress_pool, _compress_pool_key
+
+    key = (os.getpid(), num_workers)
+    with _compress_pool_lock:
+        if _compress_pool is None or _compress_pool_key != key:
+            # Work already queued on an old pool still finishes.
+            if _compress_pool is not None and \
+               _compress_pool_key is not None and \
+               _compress_pool_key[0] == key[0]:
+                _compress_pool.shutdown(wait=False)
+
+            _compress_pool = \
+                concurrent.futures.ThreadPoolExecutor(num_workers)
+            _compress_pool_key = key
+
+        return _compress_pool
+
+
 # Class for reading scripts from an FSRom and writing them back out.
 # The main job of this class is to avoid reading the same script many times
 # when changing a location's key items, sealed chests, bosses, etc.
@@ -1276,21 +1746,105 @@ class ScriptManager:
     def __init__(self, fsrom: FSRom,
                  location_list: list[LocID],
                  loc_data_ptr=0x360000,
-                 event_data_ptr=0x3CF9F0):
+                 event_data_ptr=0x3CF9F0,
+                 script_index: Optional[ScriptIndex] = None):
+        '''
+        If script_index is given, scripts which are unchanged from the
+        indexed rom are read from the index instead of being decompressed.
+        '''
         self.fsrom = fsrom
+        self.script_index = script_index
 
         self.script_dict: dict[LocID, Event] = {}
         self.orig_len_dict: dict[LocID, int] = {}
 
+        # loc_id -> (script, generation, bytes, strings) of each script as it
+        # was last read from or written to the rom.  See is_dirty.
+        self._clean_states: dict[
+            LocID, tuple[Event, int, bytes, list[bytes]]
+        ] = {}
+
+        # String blocks written by write_strings.  Scripts written in the
+        # same call may share a block, so a block is only freed once none of
+        # its scripts use it.  Strings which came with the rom are never
+        # freed since vanilla scripts can share them.
+        self._string_blocks: dict[LocID, tuple[int, int]] = {}
+        self._string_block_users: dict[tuple[int, int], set[LocID]] = {}
+
+        # How often write_script_to_rom used each placement.
+        self.placement_counts: dict[ScriptPlacement, int] = {
+            placement: 0 for placement in ScriptPlacement
+        }
+
         # TODO: Just read the ptr from the rom since we have it.
         self.loc_data_ptr = loc_data_ptr
         self.event_data_ptr = event_data_ptr
 
         for loc_id in location_list:
-            self.script_dict[loc_id] = \
-                Event.from_rom_location(self.fsrom.getbuffer(), loc_id)
-            self.orig_len_dict[loc_id] = \
-                get_compressed_event_length(self.fsrom.getbuffer(), loc_id)
+            self.__read_script(loc_id)
+
+    def __read_script(self, loc_id: LocID):
+        '''Read loc_id's script and compressed length from the rom.'''
+        rom = self.fsrom.getbuffer()
+
+        if self.script_index is not None:
+            result = self.script_index.get_event(rom, loc_id)
+            if result is not None:
+                self.script_dict[loc_id], self.orig_len_dict[loc_id] = result
+                self.__mark_clean(loc_id)
+                return
+
+        self.script_dict[loc_id] = Event.from_rom_location(rom, loc_id)
+        self.orig_len_dict[loc_id] = get_compressed_event_length(rom, loc_id)
+        self.__mark_clean(loc_id)
+
+    def __mark_clean(self, loc_id: LocID):
+        '''Record that loc_id's script matches what is on the rom.'''
+        script = self.script_dict[loc_id]
+        self._clean_states[loc_id] = (
+            script, script.generation, bytes(script.get_bytearray()),
+            [bytes(string) for string in script.strings]
+        )
+
+    def is_dirty(self, loc_id: LocID) -> bool:
+        '''
+        Whether loc_id's script needs writing, i.e. it was set or has changed
+        since it was last read from or written to the rom.
+        '''
+        script = self.script_dict.get(loc_id, None)
+        state = self._clean_states.get(loc_id, None)
+        if script is None:
+            return False
+        if state is None or script.modified_strings:
+            return True
+
+        clean_script, generation, payload, strings = state
+        if script is not clean_script or script.num_objects != payload[0]:
+            return True
+
+        # Edits which were undone leave the script clean, so a new
+        # generation only means that the data has to be compared.
+        if script.generation != generation and \
+           script.data != memoryview(payload)[1:]:
+            return True
+
+        # Direct edits to strings do not change the generation.
+        return (
+            len(script.strings) != len(strings) or
+            any(string != clean_string
+                for string, clean_string in zip(script.strings, strings))
+        )
+
+    def clear(self):
+        '''Forget every script read or set so far.'''
+        self.script_dict = {}
+        self.orig_len_dict = {}
+        self._clean_states = {}
+
+    def get_dirty_scripts(self) -> list[LocID]:
+        '''Get the locations whose scripts need writing (see is_dirty).'''
+        return [loc_id for loc_id in self.script_dict
+                if self.is_dirty(loc_id)]
 
     # A note:  If a script obtained by get_script is edited it will edit
     # the copy in the manager.  This is how I think it should be since
@@ -1298,10 +1852,7 @@ class ScriptManager:
     # clunky.
     def get_script(self, loc_id: LocID) -> Event:
         if loc_id not in self.script_dict:
-            self.script_dict[loc_id] = \
-                Event.from_rom_location(self.fsrom.getbuffer(), loc_id)
-            self.orig_len_dict[loc_id] = \
-                get_compressed_event_length(self.fsrom.getbuffer(), loc_id)
+            self.__read_script(loc_id)
 
         return self.script_dict[loc_id]
 
@@ -1312,6 +1863,157 @@ class ScriptManager:
 
         self.script_dict[loc_id] = script
 
+    def __place_script(self, size: int, old_ptr: Optional[int]) -> int:
+        '''
+        Find room for a packet of size bytes.  Prefer the old packet's spot,
+        then the old packet's bank, then anywhere.
+        '''
+        spaceman = self.fsrom.space_manager
+
+        if old_ptr is not None:
+            bank_st = old_ptr & 0xFF0000
+            ranges = (
+                (ScriptPlacement.IN_PLACE, old_ptr, old_ptr + size),
+                (ScriptPlacement.SAME_BANK, bank_st, bank_st + 0x10000)
+            )
+            for placement, start, end in ranges:
+                try:
+                    ptr = spaceman.get_free_addr_in_range(size, start, end)
+                except FreeSpaceError:
+                    continue
+
+                self.placement_counts[placement] += 1
+                return ptr
+
+        ptr = spaceman.get_free_addr(size)
+        self.placement_counts[ScriptPlacement.FIRST_FIT] += 1
+        return ptr
+
+    def __release_strings(self, loc_id: LocID):
+        '''Stop loc_id using its string block and free the block if unused.'''
+        block = self._string_blocks.pop(loc_id, None)
+        if block is None:
+            return
+
+        users = self._string_block_users[block]
+        users.discard(loc_id)
+        if not users:
+            del self._string_block_users[block]
+            self.fsrom.space_manager.mark_block(block, FSWriteType.MARK_FREE)
+
+    def write_strings(self, loc_ids: list[LocID],
+                      max_block_size: int = 0x1000):
+        '''
+        Write the strings of the scripts of loc_ids which have modified
+        strings and point the scripts at them.
+
+        Scripts are grouped into blocks of up to about max_block_size bytes.
+        Each block holds every script's string pointers and one copy of each
+        distinct string used by the scripts in the block.
+        '''
+        for group in self.__group_strings(loc_ids, max_block_size):
+            self.__write_string_block(group)
+
+    def __group_strings(self, loc_ids: list[LocID],
+                        max_block_size: int = 0x1000) -> list[list[LocID]]:
+        '''
+        Release the old strings of the scripts of loc_ids which have modified
+        strings and split the scripts into the blocks of write_strings.
+        '''
+        groups: list[list[LocID]] = []
+        group: list[LocID] = []
+        group_strings: set[bytes] = set()
+        group_size = 0
+
+        for loc_id in loc_ids:
+            script = self.get_script(loc_id)
+            if not script.modified_strings:
+                continue
+
+            self.__release_strings(loc_id)
+
+            if not script.strings:
+                script.modified_strings = False
+                continue
+
+            strings = set(bytes(string) for string in script.strings)
+            size = 2*len(script.strings) + \
+                sum(len(string) for string in strings - group_strings)
+
+            if group and group_size + size > max_block_size:
+                groups.append(group)
+                group, group_strings, group_size = [], set(), 0
+                size = 2*len(script.strings) + \
+                    sum(len(string) for string in strings)
+
+            group.append(loc_id)
+            group_strings.update(strings)
+            group_size += size
+
+        if group:
+            groups.append(group)
+
+        return groups
+
+    def __write_string_block(self, loc_ids: list[LocID]):
+        '''Write one block of write_strings.'''
+        scripts = [self.script_dict[loc_id] for loc_id in loc_ids]
+
+        # The pointer tables come first, then the distinct strings.
+        table_offsets = []
+        offset = 0
+        for script in scripts:
+            table_offsets.append(offset)
+            offset += 2*len(script.strings)
+
+        string_offsets: dict[bytes, int] = {}
+        string_data = bytearray()
+        for script in scripts:
+            for string in script.strings:
+                key = bytes(string)
+                if key not in string_offsets:
+                    string_offsets[key] = offset + len(string_data)
+                    string_data.extend(string)
+
+        total_len = offset + len(string_data)
+
+        # Note: fsrom doesn't let the block cross bank boundaries
+        try:
+            block_st = self.fsrom.space_manager.get_free_addr(total_len)
+        except FreeSpaceError:
+            if len(loc_ids) == 1:
+                raise
+
+            # Smaller blocks are easier to place.
+            half = len(loc_ids)//2
+            self.__write_string_block(loc_ids[:half])
+            self.__write_string_block(loc_ids[half:])
+            return
+
+        # String pointers are local to the bank.
+        bank_offset = block_st % 0x10000
+        block_data = bytearray()
+        for script in scripts:
+            for string in script.strings:
+                block_data.extend(
+                    to_little_endian(bank_offset+string_offsets[bytes(string)],
+                                     2)
+                )
+        block_data.extend(string_data)
+
+        text = 'strings ' + ', '.join(str(loc_id) for loc_id in loc_ids)
+        with spaceledger.detail(self.fsrom.ledger, text):
+            self.fsrom.seek(block_st)
+            self.fsrom.write(block_data, FSWriteType.MARK_USED)
+
+        block = (block_st, block_st + total_len)
+        self._string_block_users[block] = set(loc_ids)
+        for loc_id, script, table_offset in \
+                zip(loc_ids, scripts, table_offsets):
+            self._string_blocks[loc_id] = block
+            script.set_string_index(to_rom_ptr(block_st + table_offset))
+            script.modified_strings = False
+
     def free_script(self, loc_id: LocID):
         script = self.get_script(loc_id)
         script_ptr = get_loc_event_ptr(self.fsrom.getbuffer(), loc_id)
@@ -1320,73 +2022,145 @@ class ScriptManager:
         spaceman = self.fsrom.space_manager
 
         if script.modified_strings:
-            # Do something to free the strings.
-            # This will take some more sophistication to do correctly.
-            pass
+            # The strings will be written again.  Free the old ones if the
+            # manager wrote them.
+            self.__release_strings(loc_id)
 
         spaceman.mark_block((script_ptr, script_ptr+script_compr_len),
                             FSWriteType.MARK_FREE)
 
+    def compress_scripts(
+            self, loc_ids: list[LocID],
+            num_workers: Optional[int] = None
+    ) -> dict[LocID, bytes]:
+        '''
+        Compress the scripts of loc_ids at the same time in a thread pool
+        which is shared by every call.  The results can be passed to
+        write_script_to_rom.
+
+        Scripts with modified strings are skipped because writing them
+        changes their string index.  Nothing is compressed without the C
+        compressor, since the python one would hold the GIL anyway.
+        '''
+        if not HAS_C_COMPRESS or num_workers == 1:
+            return {}
+
+        loc_ids = [loc_id for loc_id in loc_ids
+                   if not self.get_script(loc_id).modified_strings]
+        payloads = [bytes(self.script_dict[loc_id].get_bytearray())
+                    for loc_id in loc_ids]
+
+        cache = scriptcache.default_cache
+        pool = _get_compress_pool(num_workers)
+        compressed = list(pool.map(cache.compress, payloads))
+
+        return dict(zip(loc_ids, compressed))
+
+    def write_scripts(self, loc_ids: list[LocID],
+                      compressed: Optional[dict[LocID, bytes]] = None,
+                      share_strings: bool = False):
+        '''
+        Write the scripts of loc_ids as write_script_to_rom does.  compressed
+        may hold already compressed scripts (see compress_scripts).
+
+        share_strings is opt-in since it changes where scripts are placed.
+        If it is set, the scripts with new strings are written in the blocks
+        of write_strings.  The old packets of a block's scripts are
+        freed before the block is placed and the scripts are written right
+        after it.  So, as when writing the scripts one at a time, the new
+        strings can use the space of the old packets.
+        '''
+        if compressed is None:
+            compressed = {}
+
+        groups = []
+        if share_strings:
+            groups = self.__group_strings(loc_ids)
+        loc_groups = {loc_id: group for group in groups for loc_id in group}
+
+        for loc_id in loc_ids:
+            group = loc_groups.get(loc_id, None)
+            if group is None:
+                self.write_script_to_rom(
+                    loc_id, compressed=compressed.get(loc_id, None)
+                )
+            elif loc_id == group[0]:
+                old_ptrs = {}
+                for group_loc_id in group:
+                    old_ptrs[group_loc_id] = \
+                        get_loc_event_ptr(self.fsrom.getbuffer(),
+                                          group_loc_id)
+                    self.free_script(group_loc_id)
+
+                self.__write_string_block(group)
+                for group_loc_id in group:
+                    self.__write_packet(group_loc_id, old_ptrs[group_loc_id])
+
     # writes the script to the specified locations
-    def write_script_to_rom(self, loc_id: LocID, free_old: bool = True):
+    def write_script_to_rom(self, loc_id: LocID, free_old: bool = True,
+                            compressed: Optional[bytes] = None):
+        '''
+        Write loc_id's script to free space and point the location at it.
+        compressed may be the already compressed script (see
+        compress_scripts).  It is ignored if the script's strings need to
+        be written.
+        '''
         # print('calling wstr', loc_id)
 
-        spaceman = self.fsrom.space_manager
-
+        # Only try to reuse the old packet's spot if it was freed.
+        old_ptr = None
         if free_old:
+            old_ptr = get_loc_event_ptr(self.fsrom.getbuffer(), loc_id)
             self.free_script(loc_id)
 
         script = self.get_script(loc_id)
 
         if script.modified_strings:
-            # We need to find space for the new strings
-            strings_len = sum(len(x) for x in script.strings)
-            ptrs_len = 2*len(script.strings)
-            total_len = strings_len + ptrs_len
-
-            # Note: fsrom doesn't let the block cross bank boundaries
-            string_index = spaceman.get_free_addr(total_len)
+            compressed = None
+            self.write_strings([loc_id])
 
-            # str_pos tracks where the pointer needs to point
-            str_pos = string_index % 0x10000 + ptrs_len
-            self.fsrom.seek(string_index)
+        self.__write_packet(loc_id, old_ptr, compressed)
 
-            # Write the pointers
-            for i in range(len(script.strings)):
-                self.fsrom.write(to_little_endian(str_pos, 2),
-                                 FSWriteType.MARK_USED)
-                str_pos += len(script.strings[i])
-
-            # Write the strings immediately afterwards
-            for x in script.strings:
-                self.fsrom.write(x, FSWriteType.MARK_USED)
-
-            script.set_string_index(to_rom_ptr(string_index))
+    def __write_packet(self, loc_id: LocID, old_ptr: Optional[int],
+                       compressed: Optional[bytes] = None):
+        '''
+        Write loc_id's script, whose strings are already written, and point
+        the location at it.  old_ptr is the freed old packet, if any.
+        '''
+        script = self.get_script(loc_id)
 
-        # The rest is mostly straightforward
-        compr_event = compress(script.get_bytearray())
-        script_ptr = spaceman.get_free_addr(len(compr_event))
+        # The rest is mostly straightforward.  Many scripts are the same
+        # every seed, so the compressed packet is often already cached.
+        if compressed is not None:
+            compr_event = compressed
+        else:
+            compr_event = \
+                scriptcache.default_cache.compress(script.get_bytearray())
+        script_ptr = self.__place_script(len(compr_event), old_ptr)
 
-        self.fsrom.seek(script_ptr)
-        self.fsrom.write(compr_event, FSWriteType.MARK_USED)
+        with spaceledger.detail(self.fsrom.ledger, f'script {loc_id}'):
+            self.fsrom.seek(script_ptr)
+            self.fsrom.write(compr_event, FSWriteType.MARK_USED)
 
-        # Now write the location's pointer
-        event_ind_st = self.loc_data_ptr + 14*loc_id + 8
+        # Now write the location's pointer (unless it has not moved)
+        if script_ptr != old_ptr:
+            event_ind_st = self.loc_data_ptr + 14*loc_id + 8
 
-        loc_script_ind = \
-            get_value_from_bytes(
-                self.fsrom.getbuffer()[event_ind_st:event_ind_st+2])
+            loc_script_ind = \
+                get_value_from_bytes(
+                    self.fsrom.getbuffer()[event_ind_st:event_ind_st+2])
 
-        # Each event pointer is an absolute, 3 byte pointer
-        loc_ptr = self.event_data_ptr + 3*loc_script_ind
+            # Each event pointer is an absolute, 3 byte pointer
+            loc_ptr = self.event_data_ptr + 3*loc_script_ind
 
-        self.fsrom.seek(loc_ptr)
-        self.fsrom.write(to_little_endian(to_rom_ptr(script_ptr), 3))
+            self.fsrom.seek(loc_ptr)
+            self.fsrom.write(to_little_endian(to_rom_ptr(script_ptr), 3))
 
         # When the script is written, update the orig len and modified_strings.
         # Just in case we end up modifying and writing again.
         script.modified_strings = False
         self.orig_len_dict[loc_id] = len(compr_event)
+        self.__mark_clean(loc_id)
     # End of write_script_to_rom
 # End class ScriptManager
 
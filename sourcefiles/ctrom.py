@@ -1,7 +1,10 @@
 import hashlib
+from typing import Optional, Union
 
 import ctevent
 import freespace
+import scriptindex
+import sharedrom
 
 
 class InvalidRomException(Exception):
@@ -20,14 +23,32 @@ class RomFormatException(Exception):
 # and mechanisms for manipulating scripts.
 class CTRom():
 
-    def __init__(self, rom: bytes, ignore_checksum=False):
+    def __init__(self, rom: Union[bytes, sharedrom.SharedRomImage],
+                 ignore_checksum=False,
+                 allocation_policy: Optional[
+                     freespace.AllocationPolicy] = None):
         # ignore_checksum is so that I can load already-randomized roms
         # if need be.
-        if not ignore_checksum and not CTRom.validate_ct_rom_bytes(rom):
+        # allocation_policy decides where free space is handed out.  See
+        # freespace.AllocationPolicy.
+        # If rom is a SharedRomImage, the rom data is a copy-on-write view
+        # of the image (with the image's free space) instead of a copy.
+        if isinstance(rom, sharedrom.SharedRomImage):
+            rom_bytes = rom.view
+        else:
+            rom_bytes = rom
+
+        if not ignore_checksum and \
+           not CTRom.validate_ct_rom_bytes(rom_bytes):
             raise InvalidRomException('Bad checksum.')
 
-        self.rom_data = freespace.FSRom(rom, False)
-        self.script_manager = ctevent.ScriptManager(self.rom_data, [])
+        if isinstance(rom, sharedrom.SharedRomImage):
+            self.rom_data: freespace.FSRom = rom.open(allocation_policy)
+        else:
+            self.rom_data = freespace.FSRom(rom, False, allocation_policy)
+        self.script_manager = ctevent.ScriptManager(
+            self.rom_data, [], script_index=scriptindex.default_index
+        )
 
     @classmethod
     def from_file(cls, filename: str, ignore_checksum=False):
@@ -36,14 +57,34 @@ class CTRom():
 
         return cls(rom_bytes, ignore_checksum)
 
-    def write_all_scripts_to_rom(self, clear_scripts: bool = True):
-        script_dict = self.script_manager.script_dict
-        for loc_id in script_dict:
-            self.script_manager.write_script_to_rom(loc_id)
+    def write_all_scripts_to_rom(self, clear_scripts: bool = True,
+                                 num_workers: Optional[int] = None,
+                                 share_strings: bool = False):
+        '''
+        Write every script in the script manager which has changed since it
+        was read (see ScriptManager.is_dirty) to the rom.  Unchanged scripts
+        stay where they are.
+
+        The scripts are compressed in parallel (num_workers threads, default
+        chosen by concurrent.futures) and then written one at a time in
+        LocID order.  Unless share_strings is set, the rom is the same as
+        writing them serially with write_script_to_rom in that order.
+
+        If share_strings is set, the new strings of the scripts are written
+        in blocks with identical strings stored once (see
+        ScriptManager.write_scripts).  This changes where scripts are
+        placed.
+        '''
+        script_manager = self.script_manager
+        dirty_loc_ids = sorted(script_manager.get_dirty_scripts())
+
+        compressed = script_manager.compress_scripts(dirty_loc_ids,
+                                                     num_workers)
+        script_manager.write_scripts(dirty_loc_ids, compressed,
+                                     share_strings)
 
         if clear_scripts:
-            self.script_manager.script_dict = {}
-            self.script_manager.orig_len_dict = {}
+            script_manager.clear()
 
     @staticmethod
     def validate_ct_rom_file(filename: str) -> bool:
@@ -1,6 +1,6 @@
 from __future__ import annotations
 from enum import Enum, auto
-import random
+import rng
 import typing
 from typing import Optional
 
@@ -327,7 +327,7 @@ def set_enemy_charm_drop(stats: enemystats.EnemyStats,
     else:
         charm = charm_dist.get_random_item()
 
-    if random.random() > drop_rate:
+    if rng.random() > drop_rate:
         drop = ItemID.NONE
 
     stats.drop_item = drop
@@ -350,7 +350,7 @@ def write_enemy_rewards_to_config(settings: rset.Settings,
             else:
                 charm = charm_dist.get_random_item()
 
-            if random.random() > drop_rate:
+            if rng.random() > drop_rate:
                 drop = ItemID.NONE
 
             config.enemy_dict[enemy].drop_item = drop
@@ -373,7 +373,7 @@ def write_enemy_rewards_to_config(settings: rset.Settings,
     tp_enemies = [EnemyID.CROAKER, EnemyID.AMPHIBITE, EnemyID.RAIN_FROG,
                   EnemyID.ION, EnemyID.ANION]
 
-    random.shuffle(tp_drops)
+    rng.shuffle(tp_drops)
     tp_drops.append(tp_drops[0])  # Copy a frog drop for the slimes
 
     for ind, enemy in enumerate(tp_enemies):
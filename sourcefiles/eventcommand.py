@@ -1,6 +1,6 @@
 from __future__ import annotations
 import math
-from typing import Tuple
+from typing import Optional, Tuple
 
 from byteops import to_little_endian, get_value_from_bytes
 from enum import Enum, IntEnum, auto
@@ -2538,69 +2538,144 @@ event_commands[0xFF] = \
                  'Mode 7 Scene.')
 
 
-def get_command(buf: bytes, offset: int = 0) -> EventCommand:
+# Commands whose arg_lens depend on their arguments.  See _get_arg_lens.
+_VARIABLE_LENGTH_COMMANDS = (0x2E, 0x4E, 0x88, 0xF1, 0xFF)
 
-    command_id = buf[offset]
-    command = event_commands[command_id].copy()
+# The length of each fixed size command, or 0 for the variable ones.
+_command_lengths = [
+    0 if cmd_id in _VARIABLE_LENGTH_COMMANDS else len(event_commands[cmd_id])
+    for cmd_id in range(len(event_commands))
+]
 
-    # print(command)
-    # input()
+
+def _get_arg_lens(buf: bytes, offset: int) -> list[int]:
+    '''
+    Get the arg_lens of the command at buf[offset].  For fixed size commands
+    this is the prototype's list, which must not be modified.
+    '''
+    command_id = buf[offset]
 
     if command_id == 0x2E:
         mode = buf[offset+1] >> 4
         if mode in [4, 5]:
-            command.arg_lens = [1, 1, 1, 1, 1]
+            return [1, 1, 1, 1, 1]
         elif mode == 8:
-            command.arg_lens = [1, 1, 2]
+            return [1, 1, 2]
         else:
             print(f"{command_id:02X}: Error, Unknown Mode")
     elif command_id == 0x4E:
         # Data to copy follows command.  Shove data in last arg.
         data_len = get_value_from_bytes(buf[offset+4:offset+6]) - 2
-        command.arg_lens = [2, 1, 2, data_len]
+        return [2, 1, 2, data_len]
     elif command_id == 0x88:
         mode = buf[offset+1] >> 4
         if mode == 0:
-            command.arg_lens = [1]
+            return [1]
         elif mode in [2, 3]:
-            command.arg_lens = [1, 1, 1]
+            return [1, 1, 1]
         elif mode in [4, 5]:
-            command.arg_lens = [1, 1, 1, 1]
+            return [1, 1, 1, 1]
         elif mode == 8:
             # bytes to copy follow command
             copy_len = buf[offset+2] - 2
-            command.arg_lens = [1, 1, 1, copy_len]
+            return [1, 1, 1, copy_len]
         else:
             print(f"{command_id:02X}: Error, Unknown Mode")
     elif command_id == 0xF1:
         color = buf[offset+1]
         if color == 0:
-            command.arg_lens = [1]
+            return [1]
         else:
-            command.arg_lens = [1, 1]
+            return [1, 1]
     elif command_id == 0xFF:  # Mode7 scenes can be weird
         scene = buf[offset+1]
         if scene == 0x90:
-            command.arg_lens = [1, 1, 1, 1]
+            return [1, 1, 1, 1]
         if scene == 0x97:
-            command.arg_lens = [1, 1, 1]
+            return [1, 1, 1]
 
-    # Now we can use arg_lens to extract the args
+    return event_commands[command_id].arg_lens
+
+
+def _decode_args(buf: bytes, offset: int, command_id: int,
+                 arg_lens: list[int]) -> list:
     pos = offset + 1
-    command.args = []
+    args = []
 
-    if command.command == 0x4E:
-        for i in command.arg_lens[0:-1]:
-            command.args.append(get_value_from_bytes(buf[pos:pos+i]))
+    if command_id == 0x4E:
+        for i in arg_lens[0:-1]:
+            args.append(get_value_from_bytes(buf[pos:pos+i]))
             pos += i
 
-        command.args.append(
-            bytearray(buf[pos:pos+command.arg_lens[-1]])
+        args.append(
+            bytearray(buf[pos:pos+arg_lens[-1]])
         )
-        pos += command.arg_lens[-1]
+        pos += arg_lens[-1]
     else:
-        for i in command.arg_lens:
-            command.args.append(get_value_from_bytes(buf[pos:pos+i]))
+        for i in arg_lens:
+            args.append(get_value_from_bytes(buf[pos:pos+i]))
             pos += i
 
+    return args
+
+
+def get_command_length(buf: bytes, offset: int = 0) -> int:
+    '''
+    Get len(get_command(buf, offset)) without building the command.  Use
+    this when scanning through a script.
+    '''
+    length = _command_lengths[buf[offset]]
+    if length:
+        return length
+
+    return 1 + sum(_get_arg_lens(buf, offset))
+
+
+class CommandView:
+    '''
+    Read-only view of the command at buf[offset].  The args are only decoded
+    if asked for, and nothing is copied from event_commands.  The view
+    reads buf when args is first used, so don't change buf before then.
+    '''
+    __slots__ = ('buf', 'offset', 'command', 'length', '_args')
+
+    def __init__(self, buf: bytes, offset: int = 0):
+        self.buf = buf
+        self.offset = offset
+        self.command = buf[offset]
+        self.length = get_command_length(buf, offset)
+        self._args: Optional[list] = None
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def arg_lens(self) -> list[int]:
+        return list(_get_arg_lens(self.buf, self.offset))
+
+    @property
+    def args(self) -> list:
+        if self._args is None:
+            self._args = _decode_args(self.buf, self.offset, self.command,
+                                      _get_arg_lens(self.buf, self.offset))
+        return self._args
+
+    def to_event_command(self) -> EventCommand:
+        return get_command(self.buf, self.offset)
+
+
+def get_command(buf: bytes, offset: int = 0) -> EventCommand:
+
+    command_id = buf[offset]
+    command = event_commands[command_id].copy()
+
+    # print(command)
+    # input()
+
+    if command_id in _VARIABLE_LENGTH_COMMANDS:
+        command.arg_lens = list(_get_arg_lens(buf, offset))
+
+    # Now we can use arg_lens to extract the args
+    command.args = _decode_args(buf, offset, command_id, command.arg_lens)
+
     return command
@@ -0,0 +1,159 @@
+'''
+Cache of parsed .Flux event scripts.
+
+Reading a flux file means decoding its strings and Huffman compressing each
+of them, and the randomizer reads the same handful of flux files for every
+seed.  The cache keeps one parsed Event per file (keyed on a hash of the
+file's contents, so an edited file is parsed again) and hands out copies.
+
+If given a path, the cache can be loaded from and saved to disk so that later
+processes do not parse the files at all.  Precompile a directory with:
+    python fluxcache.py ./flux flux.cache
+'''
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import pickle
+import threading
+from typing import Callable, Optional, TYPE_CHECKING
+
+import picklefile
+
+if TYPE_CHECKING:
+    from ctevent import Event
+
+# Bump this when Event.from_flux_bytes changes its output so that stale
+# entries on disk are not reused.
+_CACHE_VERSION = 2
+
+
+class FluxCache:
+    '''
+    Parsed flux scripts keyed on file contents.
+
+    Basic usage:
+        cache = FluxCache()
+        event = cache.get_event(filename, Event.from_flux_bytes)
+    '''
+    def __init__(self, path: Optional[str] = None):
+        '''
+        If path is given and the file exists, entries are loaded from it.
+        '''
+        self.path = path
+
+        self._entries: dict[bytes, Event] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        if path is not None:
+            self.load(path)
+
+    @staticmethod
+    def get_key(flux: bytes) -> bytes:
+        return hashlib.blake2b(flux, digest_size=20).digest()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get_event(self, filename: str,
+                  parse: Callable[[bytes], Event]) -> Event:
+        '''
+        Get a new copy of the Event parsed from filename.  parse turns the
+        file's bytes into an Event and is only called on a miss.
+        '''
+        with open(filename, 'rb') as infile:
+            flux = infile.read()
+
+        key = self.get_key(flux)
+
+        with self._lock:
+            event = self._entries.get(key, None)
+            if event is not None:
+                self.hits += 1
+                return event.copy()
+            self.misses += 1
+
+        event = parse(flux)
+
+        with self._lock:
+            self._entries.setdefault(key, event.copy())
+
+        return event
+
+    def load(self, path: str):
+        '''
+        Add the entries saved in path.  A missing or unreadable file is
+        ignored.
+        '''
+        if not os.path.isfile(path):
+            return
+
+        try:
+            with open(path, 'rb') as infile:
+                version, entries = pickle.load(infile)
+        except Exception:
+            return
+
+        if version != _CACHE_VERSION:
+            return
+
+        with self._lock:
+            self._entries.update(entries)
+
+    def save(self, path: Optional[str] = None):
+        '''Atomically write the entries to path (default self.path).'''
+        if path is None:
+            path = self.path
+        if path is None:
+            raise ValueError('No path given to save the cache to.')
+
+        with self._lock:
+            entries = dict(self._entries)
+
+        picklefile.write_pickle(path, (_CACHE_VERSION, entries))
+
+
+# The cache used by Event.from_flux unless told otherwise.
+default_cache = FluxCache()
+
+
+def set_default_cache(cache: FluxCache):
+    '''Replace the cache used by Event.from_flux.'''
+    global default_cache
+    default_cache = cache
+
+
+def main():
+    # Imported here since ctevent itself uses this module.
+    from ctevent import Event
+
+    parser = argparse.ArgumentParser(
+        description='Precompile the flux files in a directory.'
+    )
+    parser.add_argument('flux_dir', help='directory of .Flux files')
+    parser.add_argument('output', help='where to write the cache')
+    args = parser.parse_args()
+
+    cache = FluxCache()
+    for dir_path, _, filenames in os.walk(args.flux_dir):
+        for filename in filenames:
+            if filename.lower().endswith('.flux'):
+                cache.get_event(os.path.join(dir_path, filename),
+                                Event.from_flux_bytes)
+
+    cache.save(args.output)
+    print(f'Cached {len(cache)} flux scripts.')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,15 @@
 from __future__ import annotations
+import bisect
+import contextlib
+import hashlib
+from dataclasses import dataclass, field
 from enum import Enum
 from io import BytesIO
-from typing import Tuple
+from typing import Any, ByteString, Callable, Iterable, Iterator, \
+    Optional, Tuple, Union
 
 import byteops
+import spaceledger
 
 class FreeSpaceError(Exception):
     pass
@@ -14,6 +20,121 @@ class FSWriteType(Enum):
     NO_MARK = 2
 
 
+@dataclass
+class FragmentationStats:
+    '''See FreeSpace.get_fragmentation.'''
+    free_bytes: int = 0
+    free_block_count: int = 0
+    # bank (address >> 16) -> length of its largest free piece
+    largest_free_by_bank: dict[int, int] = field(default_factory=dict)
+    # Free bytes in pieces too short to be of use
+    wasted_tail_bytes: int = 0
+
+
+class AllocationPolicy:
+    '''Decides where FreeSpace.get_free_addr puts a block.'''
+
+    def get_free_addr(self, space: FreeSpace, size: int, hint: int) -> int:
+        '''
+        Get the start of size free bytes in space, after hint and within one
+        bank.  Raises FreeSpaceError if there is no room.
+        '''
+        raise NotImplementedError
+
+    @staticmethod
+    def _no_room(size: int, hint: int) -> FreeSpaceError:
+        return FreeSpaceError(
+            f'Not Enough Free Space.  Size: {size:06X}, hint: {hint:06X}'
+        )
+
+
+class FirstFitPolicy(AllocationPolicy):
+    '''The lowest address with room (the default).'''
+
+    def get_free_addr(self, space: FreeSpace, size: int, hint: int) -> int:
+        return space.get_first_fit_addr(size, hint)
+
+
+class BestFitPolicy(AllocationPolicy):
+    '''
+    The smallest free piece with room, so that large blocks of free space
+    are kept for large requests.  Ties go to the lowest address.
+    '''
+
+    def get_free_addr(self, space: FreeSpace, size: int, hint: int) -> int:
+        best_start, best_len = None, None
+        for start, end in space.iter_free_pieces(hint):
+            length = end - start
+            if length >= size and (best_len is None or length < best_len):
+                best_start, best_len = start, length
+                if length == size:
+                    break
+
+        if best_start is None:
+            raise self._no_room(size, hint)
+
+        return best_start
+
+
+class BankAffinityPolicy(AllocationPolicy):
+    '''
+    Prefer one bank (given as address >> 16).  Requests which do not fit
+    there are handed to fallback (default first fit).
+    '''
+
+    def __init__(self, bank: int,
+                 fallback: Optional[AllocationPolicy] = None):
+        self.bank = bank
+        self.fallback = FirstFitPolicy() if fallback is None else fallback
+
+    def get_free_addr(self, space: FreeSpace, size: int, hint: int) -> int:
+        bank_st, bank_end = self.bank << 16, (self.bank + 1) << 16
+        if hint < bank_end:
+            try:
+                return space.get_free_addr_in_range(size,
+                                                    max(hint, bank_st),
+                                                    bank_end)
+            except FreeSpaceError:
+                pass
+
+        return self.fallback.get_free_addr(space, size, hint)
+
+
+class SizeClassPolicy(AllocationPolicy):
+    '''
+    Segregate requests by size.  Requests and free pieces are put into
+    classes by the class_sizes bounds.  A request goes to the lowest free
+    piece of its own class with room.  If there is none, it goes to the
+    smallest class above that has one.  Small requests then fill small holes
+    and leave the big ones alone.
+    '''
+
+    def __init__(self, class_sizes: Tuple[int, ...] = (0x40, 0x200, 0x1000)):
+        self.class_sizes = sorted(class_sizes)
+
+    def get_class(self, size: int) -> int:
+        return bisect.bisect_left(self.class_sizes, size)
+
+    def get_free_addr(self, space: FreeSpace, size: int, hint: int) -> int:
+        size_class = self.get_class(size)
+
+        # class -> lowest piece of that class with room
+        candidates: dict[int, int] = {}
+        for start, end in space.iter_free_pieces(hint):
+            if end - start < size:
+                continue
+
+            piece_class = self.get_class(end - start)
+            if piece_class == size_class:
+                return start
+            candidates.setdefault(piece_class, start)
+
+        if not candidates:
+            raise self._no_room(size, hint)
+
+        return candidates[min(candidates)]
+
+
 class FreeSpace():
     def __init__(self, num_bytes, is_free):
 
@@ -21,6 +142,120 @@ class FreeSpace():
         self.markers = [0, self.num_bytes]
         self.first_free = is_free
 
+        # While there are checkpoints, each change to the markers logs
+        # (index, old markers, number of new markers, old first_free) so it
+        # can be undone.  _checkpoints holds the log length at each one.
+        self._undo_log: list[tuple[int, list[int], int, bool]] = []
+        self._checkpoints: list[int] = []
+
+        # Ledger records made since the outermost checkpoint.  They are
+        # added to the ledger when it is committed and dropped if rolled
+        # back.  _ledger_checkpoints holds the number pending at each one.
+        self._pending_allocations: list[spaceledger.Allocation] = []
+        self._ledger_checkpoints: list[int] = []
+
+        # None means first fit.
+        self.policy: Optional[AllocationPolicy] = None
+
+        # If set, each change to the free space is recorded in it.
+        self.ledger: Optional[spaceledger.AllocationLedger] = None
+
+    def checkpoint(self):
+        '''
+        Start recording changes so that rollback can undo them.
+        Checkpoints nest.  Each must be ended by rollback or commit.
+        '''
+        self._checkpoints.append(len(self._undo_log))
+        self._ledger_checkpoints.append(len(self._pending_allocations))
+
+    def rollback(self):
+        '''Undo every change made since the last checkpoint and end it.'''
+        log_pos = self._checkpoints.pop()
+        del self._pending_allocations[self._ledger_checkpoints.pop():]
+
+        while len(self._undo_log) > log_pos:
+            ind, old_markers, num_new, first_free = self._undo_log.pop()
+            self.markers[ind:ind+num_new] = old_markers
+            if first_free != self.first_free:
+                self.first_free = first_free
+            self._restored_markers(ind, len(old_markers))
+
+    def commit(self):
+        '''Keep the changes made since the last checkpoint and end it.'''
+        self._checkpoints.pop()
+        self._ledger_checkpoints.pop()
+        if not self._checkpoints:
+            self._undo_log.clear()
+            if self.ledger is not None:
+                self.ledger.allocations.extend(self._pending_allocations)
+            self._pending_allocations.clear()
+
+    @contextlib.contextmanager
+    def dry_run(self):
+        '''
+        Context manager which undoes all marking done inside it.  Use it to
+        try out a layout:
+            with space.dry_run():
+                addr = space.get_free_addr(size)
+                space.mark_block((addr, addr+size), FSWriteType.MARK_USED)
+                ...
+        '''
+        self.checkpoint()
+        try:
+            yield self
+        finally:
+            self.rollback()
+
+    def _restored_markers(self, ind: int, num_markers: int):
+        '''Called after rollback restores markers[ind:ind+num_markers].'''
+
+    def __record_change(self, blocks: Iterable[Tuple[int, int]],
+                        is_free: bool):
+        '''
+        Record the parts of blocks whose type marking them as is_free will
+        change in the ledger.  While there are checkpoints, the records wait
+        until the outermost one is committed.
+        '''
+        ledger = self.ledger
+        if ledger is None:
+            return
+
+        if self._checkpoints:
+            add = self._pending_allocations.append
+        else:
+            add = ledger.allocations.append
+
+        markers = self.markers
+        for start, end in blocks:
+            ind = self._find_block(start)
+            while ind < len(markers)-1 and markers[ind] < end:
+                piece_st = max(markers[ind], start)
+                piece_end = min(markers[ind+1], end)
+                if piece_end > piece_st and self.__is_free(ind) != is_free:
+                    size = piece_end - piece_st
+                    add(ledger.new_allocation(piece_st,
+                                              -size if is_free else size))
+                ind += 1
+
+    def __log_change(self, start_ind: int, end_ind: int):
+        '''
+        Begin logging a change which only touches markers[start:end].
+        Returns what __end_change needs or None if not logging.
+        '''
+        if not self._checkpoints:
+            return None
+
+        return (start_ind, self.markers[start_ind:end_ind],
+                len(self.markers), self.first_free)
+
+    def __end_change(self, change):
+        if change is None:
+            return
+
+        start_ind, old_markers, old_len, first_free = change
+        num_new = len(old_markers) + len(self.markers) - old_len
+        self._undo_log.append((start_ind, old_markers, num_new, first_free))
+
     # Mark a block of the buffer as free/not free depending on is_free.
     # block is a half-open interval [block[0], block[1]) as is Python's way.
     def mark_block(self,
@@ -52,8 +287,13 @@ class FreeSpace():
                   % (block[0], block[1]))
             block = (0, block[1])
 
-        left_blk = self.__search(0, len(self.markers)-2, block[0])
-        right_blk = self.__search(0, len(self.markers)-2, block[1])
+        self.__record_change([block], is_free)
+
+        left_blk = self._find_block(block[0])
+        right_blk = self._find_block(block[1])
+
+        # Only markers in [left_blk, right_blk+2) are changed below.
+        change = self.__log_change(left_blk, right_blk+2)
 
         lc = (left_blk % 2 == 0)
         rc = (right_blk % 2 == 0)
@@ -101,14 +341,82 @@ class FreeSpace():
         # delete all markers between the start and the end (not inclusive)
         if end > start+1:
             del self.markers[start+1:end]
+
+        self.__end_change(change)
     # End of mark_block
 
+    def mark_blocks(self, blocks: list[Tuple[int, int]],
+                    mark_type: FSWriteType):
+        '''
+        Mark many blocks at once with the same result as calling mark_block
+        on each.  blocks must be sorted and must not overlap or touch.
+        The markers are rebuilt in one pass over the region the blocks span.
+        '''
+        if mark_type == FSWriteType.NO_MARK:
+            return
+
+        is_free = (mark_type == FSWriteType.MARK_FREE)
+        markers = self.markers
+        blocks = [(max(start, 0), min(end, markers[-1]))
+                  for start, end in blocks]
+        blocks = [block for block in blocks if block[1] > block[0]]
+        if not blocks:
+            return
+
+        self.__record_change(blocks, is_free)
+
+        # Rebuild the blocks from first_ind to last_ind.  The untouched
+        # block on either side keeps its type, so merging with it is
+        # handled below.
+        first_ind = max(self._find_block(blocks[0][0]) - 1, 0)
+        last_ind = min(self._find_block(blocks[-1][1]) + 1, len(markers)-2)
+
+        change = self.__log_change(first_ind, last_ind+1)
+
+        # [start, end, is_free] of the new blocks
+        new_blocks: list[list] = []
+
+        def push(start: int, end: int, free: bool):
+            if end <= start:
+                return
+            if new_blocks and new_blocks[-1][2] == free:
+                new_blocks[-1][1] = end
+            else:
+                new_blocks.append([start, end, free])
+
+        block_ind = 0
+        for ind in range(first_ind, last_ind+1):
+            pos, end = markers[ind], markers[ind+1]
+            old_free = self.__is_free(ind)
+
+            while pos < end:
+                while block_ind < len(blocks) and \
+                      blocks[block_ind][1] <= pos:
+                    block_ind += 1
+
+                if block_ind < len(blocks) and blocks[block_ind][0] < end:
+                    block_st, block_end = blocks[block_ind]
+                    if block_st > pos:
+                        push(pos, block_st, old_free)
+                        pos = block_st
+                    push(pos, min(block_end, end), is_free)
+                    pos = min(block_end, end)
+                else:
+                    push(pos, end, old_free)
+                    pos = end
+
+        if first_ind == 0:
+            self.first_free = new_blocks[0][2]
+
+        markers[first_ind:last_ind+1] = [block[0] for block in new_blocks]
+        self.__end_change(change)
+
     def is_block_free(self, block) -> bool:
         left = block[0]
         right = block[1]
 
-        left_ind = self.__search(0, len(self.markers)-2, left)
-        right_ind = self.__search(0, len(self.markers)-2, right)
+        left_ind = self._find_block(left)
+        right_ind = self._find_block(right)
 
         left_parity = left_ind % 2 == 0
         left_free = left_parity == (self.first_free is True)
@@ -116,6 +424,11 @@ class FreeSpace():
         return (left_ind == right_ind) and left_free
 
     def extend_end_marker(self, new_end, is_free):
+        change = self.__log_change(len(self.markers)-1, len(self.markers))
+        self._extend_end_marker(new_end, is_free)
+        self.__end_change(change)
+
+    def _extend_end_marker(self, new_end, is_free):
         last_free = self.__is_free(len(self.markers)-2)
 
         # print(f"{new_end:06X}, {is_free}")
@@ -127,10 +440,21 @@ class FreeSpace():
     def __is_free(self, ind):
         return ((ind % 2 == 0) == self.first_free)
 
-    # First fit.  Location must be after hint
     def get_free_addr(self, size, hint=0):
+        '''
+        Get the address of size free bytes after hint which do not cross a
+        bank boundary.  Where is up to self.policy (default first fit).
+        Raises FreeSpaceError if there is no room.
+        '''
+        if self.policy is None:
+            return self.get_first_fit_addr(size, hint)
+
+        return self.policy.get_free_addr(self, size, hint)
+
+    # First fit.  Location must be after hint
+    def get_first_fit_addr(self, size, hint=0):
         # block associated with its left marker, so search to len-2
-        ind = self.__search(0, len(self.markers)-2, hint)
+        ind = self._find_block(hint)
 
         # print(f"Searching for {size} free bytes.")
         if self.__is_free(ind) and (self.markers[ind+1]-hint > 0):
@@ -173,6 +497,65 @@ class FreeSpace():
 
             return ret
 
+    def iter_free_pieces(self, start: int = 0) -> Iterator[Tuple[int, int]]:
+        '''
+        Iterate over the free space at or after start as [begin, end) pieces
+        in address order.  Free blocks are split at bank boundaries.
+        '''
+        markers = self.markers
+        ind = self._find_block(start)
+        if not self.__is_free(ind):
+            ind += 1
+
+        for x in range(ind, len(markers)-1, 2):
+            block_st = max(markers[x], start)
+            block_end = markers[x+1]
+
+            while block_st < block_end:
+                piece_end = min(block_end, (block_st & ~0xFFFF) + 0x10000)
+                yield block_st, piece_end
+                block_st = piece_end
+
+    def get_fragmentation(self, min_useful: int = 0x10) -> FragmentationStats:
+        '''
+        Summarize how the free space is split up.  Free pieces (see
+        iter_free_pieces) shorter than min_useful bytes count as wasted.
+        '''
+        stats = FragmentationStats()
+        for start, end in self.iter_free_pieces():
+            length = end - start
+            bank = start >> 16
+
+            stats.free_bytes += length
+            stats.free_block_count += 1
+            stats.largest_free_by_bank[bank] = \
+                max(stats.largest_free_by_bank.get(bank, 0), length)
+            if length < min_useful:
+                stats.wasted_tail_bytes += length
+
+        return stats
+
+    def get_free_addr_in_range(self, size: int, start: int, end: int) -> int:
+        '''
+        First fit of size bytes inside [start, end).  The range should not
+        cross a bank boundary.  Raises FreeSpaceError if nothing fits.
+        '''
+        ind = max(bisect.bisect_right(self.markers, start) - 1, 0)
+
+        for x in range(ind, len(self.markers)-1):
+            block_st = max(self.markers[x], start)
+            if block_st >= end:
+                break
+
+            block_end = min(self.markers[x+1], end)
+            if self.__is_free(x) and block_end - block_st >= size:
+                return block_st
+
+        raise FreeSpaceError(
+            f'Not Enough Free Space.  Size: {size:06X}, '
+            f'range: [{start:06X}, {end:06X})'
+        )
+
     # Sometimes data needs the same bank, so
     def get_same_bank_free_addrs(self, sizes: list[int],
                                  hint: int = 0) -> list[int]:
@@ -190,41 +573,37 @@ class FreeSpace():
 
         start = hint
 
-        while True:
-            tries[0] = self.get_free_addr(sort_sizes[0], start)
-            self.mark_block((tries[0], tries[0]+sort_sizes[0]),
-                            FSWriteType.MARK_USED)
+        # Nothing marked while searching is kept.
+        with self.dry_run():
+            while True:
+                self.checkpoint()
+                tries[0] = self.get_free_addr(sort_sizes[0], start)
+                self.mark_block((tries[0], tries[0]+sort_sizes[0]),
+                                FSWriteType.MARK_USED)
 
-            first_bank = (tries[0] >> 16) << 16
+                first_bank = (tries[0] >> 16) << 16
 
-            success = True
+                success = True
 
-            for i in range(1, len(sort_sizes)):
-                tries[i] = self.get_free_addr(sort_sizes[i], first_bank)
-                this_bank = (tries[i] >> 16) << 16
+                for i in range(1, len(sort_sizes)):
+                    tries[i] = self.get_free_addr(sort_sizes[i], first_bank)
+                    this_bank = (tries[i] >> 16) << 16
 
-                if this_bank != first_bank:
-                    success = False
-                    start = this_bank
+                    if this_bank != first_bank:
+                        # Try again from the bank that had room.
+                        success = False
+                        start = this_bank
+                        break
 
-                    # undo previous markings
-                    for j in range(0, i):
-                        self.mark_block((tries[j], tries[j]+sort_sizes[j]),
-                                        FSWriteType.MARK_FREE)
-                else:
                     # Mark and proceed to next
                     self.mark_block((tries[i], tries[i]+sort_sizes[i]),
                                     FSWriteType.MARK_USED)
 
-            if success:
-                break
+                # Undo this attempt's markings.
+                self.rollback()
 
-        # Undo markings.  This is sort of ugly.  It would be nice to separate
-        # the buffer from the freespace checker so that we can copy the
-        # freespace checker and mess with that while finding addresses.
-        for i in range(len(tries)):
-            self.mark_block((tries[i], tries[i]+sort_sizes[i]),
-                            FSWriteType.MARK_FREE)
+                if success:
+                    break
 
         perm, tries_tuple = zip(*sorted(zip(perm, tries)))
 
@@ -320,6 +699,10 @@ class FreeSpace():
                   % (self.markers[x], self.markers[x+1],
                      (self.markers[x+1]-self.markers[x])))
 
+    def _find_block(self, addr: int) -> int:
+        '''Get the index of the (left marker of the) block holding addr.'''
+        return self.__search(0, len(self.markers)-2, addr)
+
     # Find the index of an address in the block map
     def __search(self, start_ind, end_ind, addr):
         search_ind = (start_ind+end_ind)//2
@@ -338,29 +721,223 @@ class FreeSpace():
             return self.__search(start_ind, search_ind-1, addr)
 
 
+class IndexedFreeSpace(FreeSpace):
+    '''
+    FreeSpace with faster lookups and allocation.
+
+    Blocks are found by bisecting the markers instead of the recursive
+    search.  For each bank, the size of the largest allocation that a free
+    block starting in that bank can satisfy is kept, so get_free_addr skips
+    whole banks instead of visiting every free block.  The results are
+    always the same as FreeSpace's.
+
+    This is not a full size-indexed structure.  The markers are still a
+    list, so mark_block is linear in the number of blocks, and within a
+    bank that has a large enough block the free blocks are still walked
+    in order.  FSRom only uses it when asked to (see FSRom's indexed).
+    '''
+    def __init__(self, num_bytes, is_free):
+        self._bank_max: Optional[list[int]] = None
+        super().__init__(num_bytes, is_free)
+
+    # markers and first_free are set directly when restoring a saved state
+    # (see basecache), so changing them drops the bank index.
+    @property
+    def markers(self) -> list[int]:
+        return self._markers
+
+    @markers.setter
+    def markers(self, markers: list[int]):
+        self._markers = markers
+        self._bank_max = None
+
+    @property
+    def first_free(self) -> bool:
+        return self._first_free
+
+    @first_free.setter
+    def first_free(self, first_free: bool):
+        self._first_free = first_free
+        self._bank_max = None
+
+    def _find_block(self, addr: int) -> int:
+        ind = bisect.bisect_right(self._markers, addr) - 1
+        return min(max(ind, 0), len(self._markers)-2)
+
+    def _is_free(self, ind: int) -> bool:
+        return (ind % 2 == 0) == self._first_free
+
+    def _get_capacity(self, ind: int) -> int:
+        '''
+        The largest size get_free_addr can place in free block ind.  This
+        is the part before the next bank or the part after it.
+        '''
+        block_st = self._markers[ind]
+        block_end = self._markers[ind+1]
+        next_bank = (block_st & 0xFF0000) + 0x010000
+        true_block_end = min(block_end, next_bank)
+
+        return max(true_block_end - block_st, block_end - true_block_end)
+
+    def _update_banks(self, first_bank: int, last_bank: int):
+        '''Recompute the index for banks first_bank to last_bank.'''
+        markers = self._markers
+        ind = bisect.bisect_left(markers, first_bank << 16)
+        end = bisect.bisect_left(markers, (last_bank+1) << 16)
+        if not self._is_free(ind):
+            ind += 1
+
+        for bank in range(first_bank, last_bank+1):
+            self._bank_max[bank] = 0
+
+        bank_max = self._bank_max
+        for x in range(ind, min(end, len(markers)-1), 2):
+            bank = markers[x] >> 16
+            bank_max[bank] = max(bank_max[bank], self._get_capacity(x))
+
+    def _get_bank_max(self) -> list[int]:
+        if self._bank_max is None:
+            self._bank_max = [0]*((self._markers[-1] >> 16) + 1)
+            self._update_banks(0, len(self._bank_max)-1)
+
+        return self._bank_max
+
+    def mark_block(self,
+                   block: Tuple[int, int],
+                   mark_type: FSWriteType):
+        super().mark_block(block, mark_type)
+
+        if self._bank_max is None or mark_type == FSWriteType.NO_MARK:
+            return
+
+        # Only free blocks starting between the start of the (possibly
+        # merged) block holding block[0] and block[1] can have changed.
+        start = max(block[0], 0)
+        end = min(block[1], self._markers[-1])
+        first_bank = self._markers[self._find_block(start)] >> 16
+        last_bank = min(end >> 16, len(self._bank_max)-1)
+        self._update_banks(first_bank, last_bank)
+
+    def mark_blocks(self, blocks: list[Tuple[int, int]],
+                    mark_type: FSWriteType):
+        super().mark_blocks(blocks, mark_type)
+
+        if self._bank_max is None or mark_type == FSWriteType.NO_MARK or \
+           not blocks:
+            return
+
+        start = max(blocks[0][0], 0)
+        end = min(blocks[-1][1], self._markers[-1])
+        first_bank = self._markers[self._find_block(start)] >> 16
+        last_bank = min(end >> 16, len(self._bank_max)-1)
+        self._update_banks(first_bank, last_bank)
+
+    def _extend_end_marker(self, new_end, is_free):
+        super()._extend_end_marker(new_end, is_free)
+        self._bank_max = None
+
+    def _restored_markers(self, ind: int, num_markers: int):
+        if self._bank_max is None:
+            return
+
+        markers = self._markers
+        if ind + num_markers >= len(markers):
+            # The end moved.  See _extend_end_marker.
+            self._bank_max = None
+            return
+
+        first_addr = markers[max(ind-1, 0)]
+        last_addr = markers[min(ind+num_markers, len(markers)-1)]
+        self._update_banks(first_addr >> 16,
+                           min(last_addr >> 16, len(self._bank_max)-1))
+
+    def get_first_fit_addr(self, size, hint=0):
+        markers = self._markers
+        bank_max = self._get_bank_max()
+
+        ind = self._find_block(hint)
+        if self._is_free(ind) and (markers[ind+1]-hint > 0):
+            return hint
+
+        if not self._is_free(ind):
+            ind += 1
+
+        while ind < len(markers)-1:
+            bank = markers[ind] >> 16
+            if bank_max[bank] < size:
+                # Nothing in this bank fits.  Go to the first free block of
+                # the next bank where something does.
+                bank += 1
+                while bank < len(bank_max) and bank_max[bank] < size:
+                    bank += 1
+                if bank == len(bank_max):
+                    break
+
+                ind = bisect.bisect_left(markers, bank << 16)
+                if not self._is_free(ind):
+                    ind += 1
+                continue
+
+            block_st = markers[ind]
+            block_end = markers[ind+1]
+            next_bank = (block_st & 0xFF0000) + 0x010000
+
+            true_block_end = min(block_end, next_bank)
+            if true_block_end - block_st >= size:
+                return block_st
+            if block_end - true_block_end >= size:
+                return true_block_end
+
+            ind += 2
+
+        raise FreeSpaceError(
+            f'Not Enough Free Space.  Size: {size:06X}, '
+            f'hint: {hint:06X}'
+        )
+
+
 class FSRom(BytesIO):
 
-    def __init__(self, rom: bytes, is_free=False):
+    def __init__(self, rom: bytes, is_free=False,
+                 policy: Optional[AllocationPolicy] = None,
+                 indexed: bool = False):
+        '''
+        policy decides where free space is handed out (default first fit).
+        It can be changed later through space_manager.policy.
+
+        If indexed is set, the space manager is an IndexedFreeSpace instead
+        of a FreeSpace.  Allocations are the same either way.
+        '''
         super().__init__(rom)
-        self.space_manager = FreeSpace(len(rom), is_free)
+        if indexed:
+            self.space_manager: FreeSpace = IndexedFreeSpace(len(rom),
+                                                             is_free)
+        else:
+            self.space_manager = FreeSpace(len(rom), is_free)
+        self.space_manager.policy = policy
+
+    @property
+    def ledger(self) -> Optional[spaceledger.AllocationLedger]:
+        '''
+        If set, the space used and released is recorded.  This is the space
+        manager's ledger, so marking through it directly is recorded too.
+        '''
+        return self.space_manager.ledger
+
+    @ledger.setter
+    def ledger(self, ledger: Optional[spaceledger.AllocationLedger]):
+        self.space_manager.ledger = ledger
 
     # Apply one of Anskiy's .txt patches and mark free space
-    # Code copied from patcher.py with few modifications.
     # I am assuming that all writes are using up free space.
     def patch_txt_file(self, filename):
         with open(filename, 'r') as patch_obj:
             self.patch_txt(patch_obj)
 
     def patch_txt(self, patch_obj):
-        for line in patch_obj:
-            line = line.split(":")
-            address = int(line[0], 0x10)
-            data = bytearray.fromhex(line[2])
-
-            # print(f"{address:06X}: ")
-            # print(' '.join(f"{x:02X}" for x in data))
-            self.seek(address)
-            self.write(data, FSWriteType.MARK_USED)
+        text = patch_obj if isinstance(patch_obj, str) \
+            else ''.join(patch_obj)
+        self.write_many(get_compiled_patch(text, compile_txt).iter_writes())
 
     # Apply an ips patch.  Most writes are considered used space, but long
     # rle blocks of 0s are considered free space.
@@ -369,46 +946,9 @@ class FSRom(BytesIO):
             self.patch_ips(patch_obj)
 
     def patch_ips(self, patch_obj):
-        p = patch_obj
-
-        p.seek(0, 2)
-        patch_size = p.tell()
-
-        p.seek(5)  # ignore the "PATCH" at the start
-
-        while p.tell() < patch_size - 5:
-
-            # Get the location of the payload
-            addr_bytes = p.read(3)
-            addr = byteops.get_value_from_bytes_be(addr_bytes)
-
-            # Get the size of the payload
-            size_bytes = p.read(2)
-            size = byteops.get_value_from_bytes_be(size_bytes)
-
-            mark_set = FSWriteType.MARK_USED
-
-            if size == 0:
-                # RLE block
-                rle_size_bytes = p.read(2)
-                rle_size = byteops.get_value_from_bytes_be(rle_size_bytes)
-
-                rle_byte = p.read(1)
-
-                # Runs of a single symbol are usually free space?
-                # IPS will write 0 blocks to extend the length of a file.
-                # We should mark these as free
-                if rle_byte[0] == 0 and rle_size >= 0x10:
-                    mark_set = FSWriteType.MARK_FREE
-
-                payload = bytearray([rle_byte[0]]*rle_size)
-            else:
-                # Normal block
-                payload = p.read(size)
-
-            self.seek(addr)
-            self.write(payload, mark_set)
-            # print(f'Wrote {len(payload):04X} bytes to {addr:06X}')
+        patch_obj.seek(0)
+        data = patch_obj.read()
+        self.write_many(get_compiled_patch(data, compile_ips).iter_writes())
 
     def mark(self, num_bytes: int, mark_type: FSWriteType):
         start = self.tell()
@@ -436,8 +976,84 @@ class FSRom(BytesIO):
         spaceman.mark_block((start, end), write_mark)
 
         self.seek(start)
+        return self._write_bytes(payload)
+
+    def _write_bytes(self, payload) -> int:
+        '''
+        Write payload at the current position without marking free space.
+        Subclasses which store the rom elsewhere override this.
+        '''
         return BytesIO.write(self, payload)
 
+    def write_many(self, writes: Iterable[Tuple[int, ByteString,
+                                                FSWriteType]]):
+        '''
+        Apply (address, payload, mark) writes in order.  The result is the
+        same as seeking to each address and calling write, but the free
+        space of each run of writes with the same mark is marked at once.
+        '''
+        writes = list(writes)
+        spaceman = self.space_manager
+
+        self.seek(0, 2)
+        buf_end = self.tell()
+        pos = buf_end
+
+        # Grow the buffer once.  The free space end is still moved write by
+        # write as in write.
+        max_end = max((addr + len(payload) for addr, payload, _ in writes),
+                      default=0)
+        if max_end > buf_end:
+            self._write_bytes(bytes(max_end - buf_end))
+
+        run_mark = FSWriteType.NO_MARK
+        run: list[Tuple[int, int]] = []
+        with self.getbuffer() as buf:
+            for addr, payload, mark in writes:
+                end = addr + len(payload)
+
+                if end > buf_end:
+                    if mark == FSWriteType.NO_MARK:
+                        print('Error: Write extended buffer with NO_MARK set')
+                        exit()
+
+                    self.__mark_run(run, run_mark)
+                    run, run_mark = [], FSWriteType.NO_MARK
+                    spaceman.extend_end_marker(end, mark)
+                    buf_end = end
+
+                buf[addr:end] = payload
+                pos = end
+
+                if mark == FSWriteType.NO_MARK or end <= addr:
+                    continue
+
+                if mark != run_mark:
+                    self.__mark_run(run, run_mark)
+                    run, run_mark = [], mark
+                run.append((addr, end))
+
+        self.__mark_run(run, run_mark)
+        self.seek(pos)
+
+    def __mark_run(self, blocks: list[Tuple[int, int]],
+                   mark: FSWriteType):
+        '''Mark blocks (in any order) as mark, merging touching blocks.'''
+        if not blocks:
+            return
+
+        blocks.sort()
+        merged = [list(blocks[0])]
+        for start, end in blocks[1:]:
+            if start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+
+        self.space_manager.mark_blocks(
+            [(start, end) for start, end in merged], mark
+        )
+
     # writes data to the buffer and marks the space as no longer free.
     # Errors out if there is insufficient space
     # returns the address where the data gets written
@@ -458,6 +1074,105 @@ class FSRom(BytesIO):
             return write_addr
 
 
+@dataclass
+class CompiledPatch:
+    '''
+    A patch as records of (address, length, payload offset, is_rle, mark)
+    into one payload buffer.  An RLE record repeats the single byte at its
+    payload offset.
+    '''
+    records: list[Tuple[int, int, int, bool, FSWriteType]]
+    payload: bytes
+
+    def iter_writes(self) -> Iterator[Tuple[int, ByteString, FSWriteType]]:
+        '''Get the (address, payload, mark) writes for FSRom.write_many.'''
+        payload = memoryview(self.payload)
+        for addr, length, offset, is_rle, mark in self.records:
+            if is_rle:
+                yield addr, bytes(payload[offset:offset+1])*length, mark
+            else:
+                yield addr, payload[offset:offset+length], mark
+
+
+def compile_ips(data: bytes) -> CompiledPatch:
+    '''Compile the contents of an ips file.'''
+    records = []
+    payload = bytearray()
+
+    pos = 5  # ignore the "PATCH" at the start
+    while pos < len(data) - 5:
+        addr = byteops.get_value_from_bytes_be(data[pos:pos+3])
+        size = byteops.get_value_from_bytes_be(data[pos+3:pos+5])
+        pos += 5
+
+        mark = FSWriteType.MARK_USED
+        if size == 0:
+            # RLE block
+            rle_size = byteops.get_value_from_bytes_be(data[pos:pos+2])
+            rle_byte = data[pos+2]
+            pos += 3
+
+            # Runs of a single symbol are usually free space?
+            # IPS will write 0 blocks to extend the length of a file.
+            # We should mark these as free
+            if rle_byte == 0 and rle_size >= 0x10:
+                mark = FSWriteType.MARK_FREE
+
+            records.append((addr, rle_size, len(payload), True, mark))
+            payload.append(rle_byte)
+        else:
+            # Normal block
+            block = data[pos:pos+size]
+            pos += size
+
+            records.append((addr, len(block), len(payload), False, mark))
+            payload.extend(block)
+
+    return CompiledPatch(records, bytes(payload))
+
+
+def compile_txt(text: str) -> CompiledPatch:
+    '''Compile one of Anskiy's .txt patches.'''
+    records = []
+    payload = bytearray()
+
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+
+        line = line.split(":")
+        address = int(line[0], 0x10)
+        data = bytearray.fromhex(line[2])
+
+        records.append((address, len(data), len(payload), False,
+                        FSWriteType.MARK_USED))
+        payload.extend(data)
+
+    return CompiledPatch(records, bytes(payload))
+
+
+# (compiler, digest of the patch) -> compiled patch
+_compiled_patches: dict[Tuple[Callable, bytes], CompiledPatch] = {}
+
+
+def get_compiled_patch(data: Union[bytes, str],
+                       compiler: Callable[[Any], CompiledPatch]
+                       ) -> CompiledPatch:
+    '''
+    Get compiler(data), reusing the result when the same patch is applied
+    again.
+    '''
+    raw = data.encode('utf-8') if isinstance(data, str) else bytes(data)
+    key = (compiler, hashlib.blake2b(raw, digest_size=20).digest())
+
+    patch = _compiled_patches.get(key, None)
+    if patch is None:
+        patch = compiler(data)
+        _compiled_patches[key] = patch
+
+    return patch
+
+
 def main():
     pass
 
@@ -0,0 +1,367 @@
+'''
+A local http server which generates seeds on request.
+
+The server reads the vanilla rom once and fills the base caches (see
+basecache) before starting its workers, so each request only does the
+per-seed work.  Requests are handed to a bounded pool of workers.  When the
+pool and its queue are full, new requests are refused with 503 so that a
+front end can retry later instead of piling up work.
+
+Endpoints:
+    POST /generate
+        Body is a json settings object with the same shape as the settings
+        in the json spoiler log (see Settings.from_jot_json).  If no seed is
+        given, one is chosen.  Add ?spoilers=0 to skip the spoiler logs.
+        Responds with json:
+            {"seed": str, "filename": str, "rom": base64 str,
+             "spoilers": str, "json_spoilers": object}
+    GET /status
+        Responds with json describing the pool's capacity and load.
+
+Basic usage:
+    python genserver.py -i ct.sfc --port 8080 --workers 4
+'''
+from __future__ import annotations
+
+import argparse
+import base64
+import concurrent.futures
+import io
+import json
+import multiprocessing
+import os
+import random
+import threading
+import traceback
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import urlparse, parse_qs
+
+import randomizer
+import sharedrom
+import randosettings as rset
+
+
+class ServerBusyException(Exception):
+    '''Raised when the pool and its queue are full.'''
+
+
+# The vanilla rom used by all workers.  Set before the pool is made so that
+# forked workers inherit it.  Each request's Randomizer maps it instead of
+# copying it.
+_worker_rom: Optional[sharedrom.SharedRomImage] = None
+
+
+def _init_worker(rom: Optional[bytes]):
+    global _worker_rom
+    if rom is not None:
+        _worker_rom = sharedrom.SharedRomImage(rom)
+
+
+def generate_seed(settings: rset.Settings, base_name: str,
+                  spoilers: bool = True) -> dict:
+    '''
+    Generate a seed from the worker rom and return the rom and spoilers in a
+    json-ready dict.
+    '''
+    if _worker_rom is None:
+        raise randomizer.GenerationFailedException('No rom in worker.')
+
+    rando = randomizer.Randomizer(_worker_rom, is_vanilla=False,
+                                  settings=settings, config=None)
+    rando.set_random_config()
+    rando.generate_rom()
+
+    writer = randomizer.RandomizerWriter(rando, base_name)
+    result = {
+        'seed': rando.settings.seed,
+        'filename': f'{writer.out_string}.sfc',
+        'rom': base64.b64encode(rando.get_generated_rom()).decode('ascii')
+    }
+
+    if spoilers:
+        spoiler_file = io.StringIO()
+        rando.write_spoiler_log(spoiler_file)
+        result['spoilers'] = spoiler_file.getvalue()
+
+        json_spoiler_file = io.StringIO()
+        rando.write_json_spoiler_log(json_spoiler_file)
+        result['json_spoilers'] = json.loads(json_spoiler_file.getvalue())
+
+    return result
+
+
+class GenerationPool:
+    '''
+    A pool of workers with a bounded queue.
+
+    At most num_workers seeds are generated at once and at most queue_size
+    more wait for a worker.  Submitting beyond that raises
+    ServerBusyException.
+    '''
+    def __init__(self, rom: bytes, num_workers: int = 1,
+                 queue_size: int = 8, use_threads: bool = False):
+        global _worker_rom
+
+        self.num_workers = num_workers
+        self.queue_size = queue_size
+        self.use_threads = use_threads
+
+        self._slots = threading.BoundedSemaphore(num_workers + queue_size)
+        self._lock = threading.Lock()
+        self._pending = 0
+
+        _worker_rom = sharedrom.SharedRomImage(rom)
+
+        if use_threads:
+            self._executor: concurrent.futures.Executor = \
+                concurrent.futures.ThreadPoolExecutor(num_workers)
+        else:
+            if 'fork' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('fork')
+                init_rom = None
+            else:
+                context = multiprocessing.get_context()
+                init_rom = rom
+
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                num_workers, mp_context=context,
+                initializer=_init_worker, initargs=(init_rom,)
+            )
+
+    @property
+    def pending(self) -> int:
+        '''Number of seeds being generated or waiting for a worker.'''
+        with self._lock:
+            return self._pending
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def submit(self, settings: rset.Settings, base_name: str,
+               spoilers: bool = True) -> concurrent.futures.Future:
+        '''Queue a seed for generation.  Does not block.'''
+        if not self._slots.acquire(blocking=False):
+            raise ServerBusyException
+
+        with self._lock:
+            self._pending += 1
+
+        try:
+            future = self._executor.submit(generate_seed, settings,
+                                           base_name, spoilers)
+        except Exception:
+            self._release(None)
+            raise
+
+        future.add_done_callback(self._release)
+        return future
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+class GenerationRequestHandler(BaseHTTPRequestHandler):
+    '''Handles requests for a GenerationServer.'''
+    server: GenerationServer
+
+    def _send_json(self, status: HTTPStatus, obj,
+                   headers: Optional[dict[str, str]] = None):
+        data = json.dumps(obj).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        if headers is not None:
+            for key, value in headers.items():
+                self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status: HTTPStatus, message: str,
+                    headers: Optional[dict[str, str]] = None):
+        self._send_json(status, {'error': message}, headers)
+
+    def do_GET(self):
+        if urlparse(self.path).path != '/status':
+            self._send_error(HTTPStatus.NOT_FOUND, 'Unknown path.')
+            return
+
+        pool = self.server.pool
+        self._send_json(HTTPStatus.OK, {
+            'workers': pool.num_workers,
+            'queue_size': pool.queue_size,
+            'pending': pool.pending
+        })
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/generate':
+            self._send_error(HTTPStatus.NOT_FOUND, 'Unknown path.')
+            return
+
+        query = parse_qs(url.query)
+        spoilers = query.get('spoilers', ['1'])[0] not in ('0', 'false')
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            if length < 0:
+                # rfile.read(-1) would wait for the client to close.
+                raise ValueError('Invalid Content-Length.')
+            if length > self.server.max_body_size:
+                raise ValueError('Request body too large.')
+            json_dict = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(json_dict, dict):
+                raise ValueError('Settings must be a json object.')
+            settings = rset.Settings.from_jot_json(json_dict)
+        except ValueError as exc:
+            # json.JSONDecodeError is a ValueError too.
+            self._send_error(HTTPStatus.BAD_REQUEST, str(exc))
+            return
+
+        if not settings.seed:
+            settings.seed = self.server.get_random_seed()
+
+        try:
+            future = self.server.pool.submit(settings,
+                                             self.server.base_name,
+                                             spoilers)
+        except ServerBusyException:
+            self._send_error(HTTPStatus.SERVICE_UNAVAILABLE,
+                             'Server is busy.  Try again later.',
+                             {'Retry-After': str(self.server.retry_after)})
+            return
+
+        try:
+            result = future.result()
+        except Exception as exc:
+            if self.server.verbose:
+                traceback.print_exception(type(exc), exc, exc.__traceback__)
+            self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR,
+                             f'Generation failed: {exc}')
+            return
+
+        self._send_json(HTTPStatus.OK, result)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class GenerationServer(ThreadingHTTPServer):
+    '''
+    ThreadingHTTPServer which hands generation off to a GenerationPool.
+
+    Each connection gets a thread, but the threads only parse requests and
+    wait on the pool, so the pool bounds the actual work.
+    '''
+    daemon_threads = True
+
+    def __init__(self, server_address, pool: GenerationPool,
+                 base_name: str = 'ct', retry_after: int = 5,
+                 max_body_size: int = 1 << 16, verbose: bool = False):
+        self.pool = pool
+        self.base_name = base_name
+        self.retry_after = retry_after
+        self.max_body_size = max_body_size
+        self.verbose = verbose
+
+        self._seed_rng = random.Random()
+        self._seed_lock = threading.Lock()
+        try:
+            self._names = randomizer.read_names()
+        except OSError:
+            self._names = ['Seed']
+
+        super().__init__(server_address, GenerationRequestHandler)
+
+    def get_random_seed(self) -> str:
+        '''Pick a seed name for requests which do not give one.'''
+        with self._seed_lock:
+            return ''.join(self._seed_rng.choice(self._names)
+                           for _ in range(2))
+
+
+def warm_up(rom: bytes):
+    '''
+    Fill the base caches for the common presets so the first requests do not
+    pay for them.
+    '''
+    presets = (rset.Settings.get_race_presets(),
+               rset.Settings.get_new_player_presets(),
+               rset.Settings.get_lost_worlds_presets(),
+               rset.Settings.get_hard_presets())
+
+    for settings in presets:
+        settings.fix_flag_conflicts()
+        randomizer.Randomizer.warm_base_caches(rom, settings)
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description='Serve seed generation over http.'
+    )
+
+    parser.add_argument(
+        '--input-file', '-i', required=True,
+        help='path to Chrono Trigger (U) rom'
+    )
+    parser.add_argument(
+        '--host', default='127.0.0.1',
+        help='address to listen on (default 127.0.0.1)'
+    )
+    parser.add_argument(
+        '--port', type=int, default=8080,
+        help='port to listen on (default 8080)'
+    )
+    parser.add_argument(
+        '--workers', type=int, default=os.cpu_count() or 1,
+        help='number of seeds to generate at once (default cpu count)'
+    )
+    parser.add_argument(
+        '--queue-size', type=int, default=8,
+        help='number of requests to hold while workers are busy (default 8)'
+    )
+    parser.add_argument(
+        '--threads', action='store_true',
+        help='use worker threads instead of worker processes'
+    )
+    parser.add_argument(
+        '--verbose', '-v', action='store_true',
+        help='log requests and generation errors'
+    )
+
+    return parser
+
+
+def main():
+    args = get_parser().parse_args()
+
+    with open(args.input_file, 'rb') as infile:
+        rom = infile.read()
+
+    if not randomizer.CTRom.validate_ct_rom_bytes(rom):
+        print('Warning: File provided is not a vanilla CT ROM.')
+
+    print('Warming caches...')
+    warm_up(rom)
+
+    pool = GenerationPool(rom, args.workers, args.queue_size, args.threads)
+    base_name = os.path.basename(args.input_file)
+    server = GenerationServer((args.host, args.port), pool, base_name,
+                              verbose=args.verbose)
+
+    print(f'Serving on http://{args.host}:{args.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,7 @@
 from __future__ import annotations  # 3.8 compatability
 
 import math
-import random
+import rng
 
 from typing import Union, Optional
 
@@ -21,8 +21,8 @@ def getRandomPrice():
     '''
     Get a random price that's weighted towards lower prices.
     '''
-    r1 = random.uniform(0, 1)
-    r2 = random.uniform(0, 1)
+    r1 = rng.uniform(0, 1)
+    r2 = rng.uniform(0, 1)
 
     # E[|X-Y|] = 1/3 for X,Y Uniform on [0,1].
     return math.floor(abs(r1 - r2) * 65000 + 1)
@@ -67,11 +67,11 @@ def randomize_healing(settings: rset.Settings, config: cfg.RandoConfig):
     ItemID = ctenums.ItemID
     item_db = config.item_db
 
-    base_hp_healing = random.choice(range(30, 51, 1))
-    revive_mult = random.choice((1, 2, 3))
-    tonic_mult = random.choice((1, 2))
-    mid_tonic_mult = random.choice((3, 4, 5, 6, 7))
-    full_tonic_mult = random.choice((8, 9, 10, 11, 12, 13, 14))
+    base_hp_healing = rng.choice(range(30, 51, 1))
+    revive_mult = rng.choice((1, 2, 3))
+    tonic_mult = rng.choice((1, 2))
+    mid_tonic_mult = rng.choice((3, 4, 5, 6, 7))
+    full_tonic_mult = rng.choice((8, 9, 10, 11, 12, 13, 14))
 
     item_db.base_hp_healing = base_hp_healing
     item_db[ItemID.TONIC].stats.heal_multiplier = tonic_mult
@@ -79,29 +79,29 @@ def randomize_healing(settings: rset.Settings, config: cfg.RandoConfig):
     item_db[ItemID.FULL_TONIC].stats.heal_multiplier = full_tonic_mult
     item_db[ItemID.REVIVE].stats.heal_multiplier = revive_mult
 
-    base_mp_healing = random.choice(range(7, 14, 1))
+    base_mp_healing = rng.choice(range(7, 14, 1))
     ether_mult = 1
-    mid_ether_mult = random.choice((2, 3, 4))
-    full_ether_mult = random.choice((5, 6, 7))
+    mid_ether_mult = rng.choice((2, 3, 4))
+    full_ether_mult = rng.choice((5, 6, 7))
 
     item_db.base_mp_healing = base_mp_healing
     item_db[ItemID.ETHER].stats.heal_multiplier = ether_mult
     item_db[ItemID.MID_ETHER].stats.heal_multiplier = mid_ether_mult
     item_db[ItemID.FULL_ETHER].stats.heal_multiplier = full_ether_mult
 
-    lapis_is_hp = random.choice((True, False))
+    lapis_is_hp = rng.choice((True, False))
 
     lapis = item_db[ItemID.LAPIS]
     if lapis_is_hp:
         lapis.stats.heals_hp = True
         lapis.stats.heals_mp = False
         lapis.stats.base_healing = base_hp_healing
-        lapis.stats.heal_multiplier = random.choice((3, 4, 5, 6, 7))
+        lapis.stats.heal_multiplier = rng.choice((3, 4, 5, 6, 7))
     else:
         lapis.stats.heals_hp = False
         lapis.stats.heals_mp = True
         lapis.stats.base_healing = base_mp_healing
-        lapis.stats.heal_multiplier = random.choice((2, 3, 4))
+        lapis.stats.heal_multiplier = rng.choice((2, 3, 4))
         lapis.name = ctstrings.CTNameString.from_string(
             ' Lapis-M', 11
         )
@@ -623,7 +623,7 @@ def randomize_weapon_armor_stats(settings: rset.Settings,
     }
 
     for item_id in ultimate_wpns:
-        mode = random.choice((0, 1, 2, 3))
+        mode = rng.choice((0, 1, 2, 3))
 
         item = item_db[item_id]
         if mode == 0:  # critical_rate
@@ -676,7 +676,7 @@ def randomize_weapon_armor_stats(settings: rset.Settings,
         (_BID.NOTHING, _BID.NOTHING, _BID.NOTHING)
     )
 
-    fist_mode = random.choice(modes)
+    fist_mode = rng.choice(modes)
     for ind, fist_id in enumerate(ayla_fists):
         fist = config.item_db[fist_id]
         boost_id = fist_mode[ind]
@@ -722,7 +722,7 @@ def randomize_accessories(settings: rset.Settings,
 
     for item_id in counter_accs:
         item = config.item_db[item_id]
-        normal_counter = (random.random() < 0.75)
+        normal_counter = (rng.random() < 0.75)
         item.stats.has_normal_counter_mode = normal_counter
         if not item.stats.has_normal_counter_mode:
             append_to_item_name(item, '?')
@@ -756,18 +756,18 @@ def randomize_accessories(settings: rset.Settings,
     for rock_id in rocks:
         rock = config.item_db[rock_id]
 
-        rock_bonus = random.random()
+        rock_bonus = rng.random()
         if rock_bonus < 0.4:
             rock.stats.has_stat_boost = True
             rock.stats.has_battle_buff = False
-            rock.stats.stat_boost_index = random.choice(rock_boosts)
+            rock.stats.stat_boost_index = rng.choice(rock_boosts)
             append_to_item_name(rock, '+')
 
         elif rock_bonus < 0.8:
             rock.stats.has_battle_buff = True
             rock.stats.has_stat_boost = False
             buffs, weights = zip(*rock_buff_dist.items())
-            battle_buffs = random.choices(
+            battle_buffs = rng.choices(
                 buffs,
                 weights=weights,
                 k=1)[0]
@@ -777,7 +777,7 @@ def randomize_accessories(settings: rset.Settings,
 
     # randomize specs as specs or haste charm
     item_id = IID.PRISMSPECS
-    if random.random() < 0.25:
+    if rng.random() < 0.25:
         item = config.item_db[item_id]
         item.stats.battle_buffs = [T8.HASTE]
         item.name = ctstrings.CTNameString.from_string(
@@ -803,11 +803,11 @@ def randomize_accessories(settings: rset.Settings,
                         _BID.MDEF_15)
 
         medal = config.item_db[IID.HERO_MEDAL]
-        medal_bonus = random.random()
+        medal_bonus = rng.random()
         if medal_bonus < 0.45:
             medal.stats.has_stat_boost = True
             medal.stats.has_battle_buff = False
-            medal.stats.stat_boost_index = random.choice(medal_boosts)
+            medal.stats.stat_boost_index = rng.choice(medal_boosts)
             append_to_item_name(medal, '+')
         elif medal_bonus < 0.9:
             medal.stats.has_battle_buff = True
@@ -815,7 +815,7 @@ def randomize_accessories(settings: rset.Settings,
             buffs, weights = zip(*medal_buff_dist.items())
             # buffs = list(medal_buff_dist.keys())
             # weights = (medal_buff_dist[buff] for buff in buffs)
-            battle_buffs = random.choices(
+            battle_buffs = rng.choices(
                 buffs, weights=weights, k=1
             )[0]
 
@@ -874,7 +874,7 @@ def restrict_gear(settings: rset.Settings,
     ]
 
     restrict_dict = {
-        pool: random.choice(pool) for pool in item_pools
+        pool: rng.choice(pool) for pool in item_pools
     }
 
     # Take Union b/c of possible gold assignment
@@ -992,8 +992,8 @@ def apply_plus_minus(item: itemdata.Item, mod: int):
                 item.stats.effect_id = AE(cur_effect-5)
             elif cur_effect == AE.IMMUNE_ALL:
                 item.stats.effect_id = \
-                    random.choice((AE.IMMUNE_CHAOS, AE.IMMUNE_SLOW_STOP,
-                                   AE.IMMUNE_LOCK))
+                    rng.choice((AE.IMMUNE_CHAOS, AE.IMMUNE_SLOW_STOP,
+                                AE.IMMUNE_LOCK))
             else:
                 # Shield, Barrier, Haste are left as-is?  Maybe they
                 # Should get nuked too.
@@ -1001,13 +1001,13 @@ def apply_plus_minus(item: itemdata.Item, mod: int):
         elif mod >= 3:
             add_effect = add_resist = False
             if epm == 0 and cur_effect == AE.NONE:
-                add_effect = random.random() < 0.5
+                add_effect = rng.random() < 0.5
                 add_resist = not add_effect
 
             if epm == 0 and add_resist:
                 Element = ctenums.Element
-                elem = random.choice((Element.FIRE, Element.ICE,
-                                      Element.SHADOW, Element.LIGHTNING))
+                elem = rng.choice((Element.FIRE, Element.ICE,
+                                   Element.SHADOW, Element.LIGHTNING))
                 item.secondary_stats.set_protect_element(elem, True)
                 new_epm = 10 if mod == 5 else 5
                 item.secondary_stats.elemental_protection_magnitude = new_epm
@@ -1034,7 +1034,7 @@ def apply_plus_minus(item: itemdata.Item, mod: int):
 
     cur_boost = _BoostID(item.secondary_stats.stat_boost_index)
     if cur_boost in (_BoostID.MDEF_5, _BoostID.MDEF_5_DUP):
-        cur_boost = random.choice((_BoostID.MDEF_5, _BoostID.MDEF_5_DUP))
+        cur_boost = rng.choice((_BoostID.MDEF_5, _BoostID.MDEF_5_DUP))
 
     if cur_boost == _BoostID.NOTHING:
         # If nothing, promote to a lv1 boost but add an extra demotion
@@ -1129,7 +1129,7 @@ def randomize_unique_gear(settings: rset.Settings,
     )
 
     for item_id in ultimate_wpns:
-        mode = random.choice((0, 1, 2, 3))
+        mode = rng.choice((0, 1, 2, 3))
 
         item = config.item_db[item_id]
         item.secondary_stats.stat_boost_index = boost_dist.get_random_item()
@@ -1183,7 +1183,7 @@ def randomize_unique_gear(settings: rset.Settings,
         (_BID.NOTHING, _BID.NOTHING, _BID.NOTHING)
     )
 
-    fist_mode = random.choice(modes)
+    fist_mode = rng.choice(modes)
     for ind, fist_id in enumerate(ayla_fists):
         fist = config.item_db[fist_id]
         boost_id = fist_mode[ind]
@@ -1197,8 +1197,8 @@ def randomize_unique_gear(settings: rset.Settings,
     # Prism Helm -- New effect and new boost
     item = config.item_db[IID.PRISM_HELM]
     item.secondary_stats.stat_boost_index = \
-        random.choice((_BID.MDEF_9, _BID.SPEED_1, _BID.HIT_10, _BID.MAG_MDEF_5,
-                      _BID.MAGIC_6, _BID.POWER_6))
+        rng.choice((_BID.MDEF_9, _BID.SPEED_1, _BID.HIT_10, _BID.MAG_MDEF_5,
+                   _BID.MAGIC_6, _BID.POWER_6))
     item.stats.effect_id = armor_effect_dist.get_random_item()
 
     # PrismDress -- Just a new effect
@@ -1217,7 +1217,7 @@ def randomize_unique_gear(settings: rset.Settings,
 
     # Moon Armor -- Different Stats OR an effect
     item = config.item_db[IID.MOON_ARMOR]
-    if random.random() < 0.5:
+    if rng.random() < 0.5:
         # New stats
         item.secondary_stats.stat_boost_index = boost_dist.get_random_item()
     else:
@@ -1236,7 +1236,7 @@ def randomize_unique_gear(settings: rset.Settings,
 
     # Haste Helm gets no special treatment now
     # Safe Helm is randomly shield/barrier
-    safe_effect = random.choice((AE.BARRIER, AE.SHIELD))
+    safe_effect = rng.choice((AE.BARRIER, AE.SHIELD))
     if safe_effect == AE.BARRIER:
         item = config.item_db[IID.SAFE_HELM]
         item.stats.effect_id = safe_effect
@@ -1292,8 +1292,8 @@ def alt_gear_rando(settings: rset.Settings,
     for gear_list in gear_in_tier.values():
         for item_id in gear_list:
             # whatever plusminus dist is good
-            mod = sum(random.random() < binom_param for i in range(5))
-            mod = mod*(1 - 2*(random.random() < 0.5))
+            mod = sum(rng.random() < binom_param for i in range(5))
+            mod = mod*(1 - 2*(rng.random() < 0.5))
 
             item = config.item_db[item_id]
             apply_plus_minus(item, mod)
@@ -1,6 +1,6 @@
 # Python libraries
 from __future__ import annotations
-import random as rand
+import rng
 
 
 # jets of time libraries
@@ -62,7 +62,7 @@ def getRandomLocation(groups):
     weightTotal = weightTotal + group.getWeight()
   
   # Select a location group
-  locationChoice = rand.randint(1, weightTotal)
+  locationChoice = rng.randint(1, weightTotal)
   counter = 0
   chosenGroup = None
   for group in groups:
@@ -72,7 +72,7 @@ def getRandomLocation(groups):
       break
     
   # Select a random location from the chosen location group.
-  location = rand.choice(chosenGroup.getLocations())
+  location = rng.choice(chosenGroup.getLocations())
   
   return chosenGroup, location
 # end getRandomLocation
@@ -90,7 +90,7 @@ def getShuffledKeyItemList(weightedList):
 
   # In the shuffle, higher weighted items have a better chance of appearing
   # before lower weighted items.
-  rand.shuffle(tempList)
+  rng.shuffle(tempList)
   
   keyItemList = []
   for keyItem in tempList:
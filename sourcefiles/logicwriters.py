@@ -1,5 +1,5 @@
 from __future__ import annotations
-import random
+import rng
 import typing
 
 import logicfactory
@@ -67,7 +67,7 @@ class RandomRejectionFiller:
                     f'{len(key_items_list)} KIs'
                 )
 
-            random.shuffle(available_locations)
+            rng.shuffle(available_locations)
             for ind, item in enumerate(key_items_list):
                 available_locations[ind].setKeyItem(item)
 
@@ -114,7 +114,7 @@ class ALTTPRWeightedFiller:
             if not unassigned_key_items:
                 break
 
-            random.shuffle(unassigned_key_items)
+            rng.shuffle(unassigned_key_items)
             next_item = unassigned_key_items.pop()
 
             collectable_key_items = get_collectable_key_items(game_config)
@@ -146,9 +146,9 @@ class ALTTPRWeightedFiller:
 
             else:
                 weights = [group.getWeight() for group in avail_groups]
-                group = random.choices(avail_groups, weights=weights, k=1)[0]
-                loc = random.choice([loc for loc in group.locations
-                                     if loc not in assigned_locations])
+                group = rng.choices(avail_groups, weights=weights, k=1)[0]
+                loc = rng.choice([loc for loc in group.locations
+                                  if loc not in assigned_locations])
                 loc.setKeyItem(next_item)
                 assigned_locations.append(loc)
 
@@ -285,7 +285,7 @@ class ALTTPRFiller:
             if not unassigned_key_items:
                 break
 
-            random.shuffle(unassigned_key_items)
+            rng.shuffle(unassigned_key_items)
             next_item = unassigned_key_items.pop()
 
             collectable_key_items = get_collectable_key_items(game_config)
@@ -312,7 +312,7 @@ class ALTTPRFiller:
                 unassigned_key_items = list(key_items_list)
                 assigned_locations = []
             else:
-                loc = random.choice(avail_locs)
+                loc = rng.choice(avail_locs)
                 assigned_locations.append(loc)
                 loc.setKeyItem(next_item)
 
@@ -364,7 +364,7 @@ class ChronosanityFiller:
 
         # In the shuffle, higher weighted items have a better chance of
         # appearing before lower weighted items.
-        random.shuffle(tempList)
+        rng.shuffle(tempList)
 
         keyItemList = []
         for keyItem in tempList:
@@ -393,7 +393,7 @@ class ChronosanityFiller:
             weightTotal = weightTotal + group.getWeight()
 
         # Select a location group
-        locationChoice = random.randint(1, weightTotal)
+        locationChoice = rng.randint(1, weightTotal)
         counter = 0
         chosenGroup = None
         for group in groups:
@@ -406,7 +406,7 @@ class ChronosanityFiller:
             raise ValueError("Weighted choice failed")
 
         # Select a random location from the chosen location group.
-        location = random.choice(chosenGroup.getLocations())
+        location = rng.choice(chosenGroup.getLocations())
         return chosenGroup, location
 
     # end getRandomLocation
@@ -3,14 +3,14 @@ import copy
 import functools
 import typing
 
-import random
+import rng
 import randosettings as rset
 
 
 def random_weighted_choice_from_dict(choice_dict: dict[typing.Any, int]):
     '''Make a random choice from dict keys given weights in dict values.'''
     keys, weights = zip(*choice_dict.items())
-    return random.choices(keys, weights, k=1)[0]
+    return rng.choices(keys, weights, k=1)[0]
 
 
 def generate_mystery_settings(base_settings: rset.Settings) -> rset.Settings:
@@ -59,7 +59,7 @@ def generate_mystery_settings(base_settings: rset.Settings) -> rset.Settings:
             added_flag = flag
         elif flag in ms.flag_prob_dict:
             prob = ms.flag_prob_dict[flag]
-            if random.random() < prob:
+            if rng.random() < prob:
                 added_flag = flag
             else:
                 added_flag = GF(0)
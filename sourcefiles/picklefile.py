@@ -0,0 +1,43 @@
+'''
+Atomic pickle files for the on-disk caches (basecache, scriptcache and
+fluxcache).
+
+The value is pickled to a temporary file next to the destination which is
+then renamed over it, so a reader never sees a partly written cache.
+'''
+from __future__ import annotations
+
+import os
+import pickle
+import tempfile
+from typing import Any
+
+
+def write_pickle(path: str, value: Any) -> bool:
+    '''
+    Atomically pickle value to path, making its directory if needed.
+
+    Returns False if the file could not be written.  The caches are an
+    optimization, so callers carry on without them.  Errors from pickling
+    value itself are raised.  The temporary file is removed either way.
+    '''
+    dir_name = os.path.dirname(os.path.abspath(path))
+    try:
+        os.makedirs(dir_name, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=dir_name, suffix='.tmp')
+    except OSError:
+        return False
+
+    try:
+        with os.fdopen(fd, 'wb') as outfile:
+            pickle.dump(value, outfile, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return True
+    except OSError:
+        return False
+    finally:
+        if os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
@@ -6,14 +6,15 @@ from __future__ import annotations
 import copy
 import os
 import random
-import pickle
 import sys
 import json
+import time
 import textwrap
 import typing
-from typing import Optional
+from typing import Optional, Tuple
 
 import arguments
+import basecache
 import charassign
 import eventfunction
 
@@ -37,6 +38,7 @@ import charrando
 import roboribbon
 import techrandomizer
 import qolhacks
+import rng
 import cosmetichacks
 import iceage
 import legacyofcyrus
@@ -45,8 +47,12 @@ from vanillarando import vanillarando
 import epochfail
 import flashreduce
 import seedhash
+import stageprofile
 import prismshard
+import scriptindex
 import scriptshortener
+import sharedrom
+import spaceledger
 import bucketlist
 import techdescs
 import techdamagerando
@@ -101,15 +107,21 @@ class Randomizer:
         rando.generate_rom()
         out_rom = rando.get_generated_rom()
     '''
-    def __init__(self, rom: bytes, is_vanilla: bool = True,
+    def __init__(self, rom: typing.Union[bytes, sharedrom.SharedRomImage],
+                 is_vanilla: bool = True,
                  settings: Optional[rset.Settings] = None,
-                 config: Optional[cfg.RandoConfig] = None):
+                 config: Optional[cfg.RandoConfig] = None,
+                 profiler: Optional[stageprofile.StageProfiler] = None,
+                 ledger: Optional[spaceledger.AllocationLedger] = None,
+                 share_strings: bool = False):
         '''
         Constructor for a Randomizer.
 
         Args:
-            rom : bytes
-                A bytes-like object of the input rom.
+            rom : bytes | sharedrom.SharedRomImage
+                A bytes-like object of the input rom.  Randomizers made from
+                the same SharedRomImage share its memory instead of each
+                holding a copy of the rom.
             is_vanilla: bool = True
                 Whether the rom is an unmodified rom.  Both headerless and
                 headered roms will be accepted if is_vanilla is True.  Using
@@ -124,6 +136,19 @@ class Randomizer:
                 here.  Note, the settings(above) must be the same settings
                 (except cosmetic) used to generate the config, or rom
                 generation will likely fail.
+            profiler: Optional[stageprofile.StageProfiler] = None
+                If provided, each stage of config and rom generation is
+                recorded in the profiler.
+            ledger: Optional[spaceledger.AllocationLedger] = None
+                If provided, the free space used and released while writing
+                the rom is recorded in the ledger under the stage that made
+                the change.  Space used by the (cached) basic patches is not
+                recorded.
+            share_strings: bool = False
+                Whether scripts written together store identical strings
+                once (see ScriptManager.write_scripts).  This saves free
+                space but places scripts differently, so the same settings
+                and seed give a different rom than without it.
         '''
         # We want to keep a copy of the base rom around so that we can
         # generate many seeds from it.
@@ -132,6 +157,14 @@ class Randomizer:
         self.hash_string_bytes: Optional[bytes] = None
         self.has_generated = False
 
+        # The generator for all of the config's random choices.  It is
+        # seeded from the settings by set_random_config.
+        self.rng = random.Random()
+
+        self.profiler = profiler
+        self.ledger = ledger
+        self.share_strings = share_strings
+
         self.settings = settings
         self.config = config
 
@@ -164,6 +197,18 @@ class Randomizer:
         self._config = new_config
         self.has_generated = False
 
+    def __begin_stage(self, name: str):
+        if self.profiler is not None:
+            self.profiler.begin(name)
+        if self.ledger is not None:
+            self.ledger.stage = name
+
+    def __end_stage(self):
+        if self.profiler is not None:
+            self.profiler.end()
+        if self.ledger is not None:
+            self.ledger.stage = None
+
     def set_random_config(self):
         '''
         Use the Randomizer's settings to generate a random cfg.Randoconfig.
@@ -171,39 +216,42 @@ class Randomizer:
         if self.settings is None:
             raise NoSettingsException
 
-        random.seed(self.settings.seed)
+        # Each Randomizer draws from its own generator so that seeds can be
+        # generated concurrently.  A str seed gives the same sequence that
+        # random.seed(seed) did, so output is unchanged.
+        self.rng.seed(self.settings.seed)
+
+        with rng.use_rng(self.rng):
+            self.__write_random_config()
 
+    def __write_random_config(self):
+        '''
+        Write the config from the settings.  Call with self.rng active.
+        '''
+        self.__begin_stage('settings')
         if rset.GameFlags.MYSTERY in self.settings.gameflags:
             self.settings = mystery.generate_mystery_settings(self.settings)
 
         self.settings.fix_flag_conflicts()
 
+        self.__begin_stage('base_config')
         # Some of the config defaults (prices, techdb, enemy stats) are
-        # read from the rom.  This routine partially patches a copy of the
-        # base rom, gets the data, and builds the base config.
+        # read from the rom.  This routine gets the data read from a
+        # partially patched copy of the base rom (cached by basecache) and
+        # builds the base config.
         self.config = Randomizer.get_base_config_from_settings(
-            bytearray(self.base_ctrom.rom_data.getvalue()),
+            self.base_ctrom.rom_data.getbuffer(),
             self.settings
         )
 
-        # An alternate approach is to build the base config with the pickles
-        # provided.  You just have to make sure to redump any time time that
-        # base_patch.ips or hard.ips change.  Demo below.
-        '''
-        with open('./pickles/default_randoconfig.pickle', 'rb') as infile:
-            self.config = pickle.load(infile)
-
-        if self.settings.enemy_difficulty == rset.Difficulty.HARD:
-            with open('./pickles/enemy_dict_hard.pickle', 'rb') as infile:
-                self.config.enemy_dict = pickle.load(infile)
-        '''
-
+        self.__begin_stage('charrando')
         # Character config.  Includes tech randomization and who can equip
         # which items.
         charrando.write_config(self.settings, self.config)
         techrandomizer.write_tech_order_to_config(self.settings,
                                                   self.config)
 
+        self.__begin_stage('techdescs')
         # Tech Damage Rando can add duplicate effect headers for randomized powers.
         # So we have to generate the combo tech descs before randomizing the single tech damage.
         techdescs.update_combo_tech_descs(self.config.tech_db)
@@ -212,30 +260,38 @@ class Randomizer:
         techdescs.update_single_tech_descs(self.config.tech_db)
         techdescs.clean_up_desc_space(self.config.tech_db)
 
+        self.__begin_stage('fastmagic')
         # Fast Magic.  Should be fine before or after charrando.
         # Safest after.
         fastmagic.write_config(self.settings, self.config)
 
+        self.__begin_stage('treasurewriter')
         # Treasure config.
         treasurewriter.write_treasures_to_config(self.settings, self.config)
 
+        self.__begin_stage('enemyrewards')
         # Enemy rewards
         enemyrewards.write_enemy_rewards_to_config(self.settings, self.config)
 
+        self.__begin_stage('logicwriter')
         # Key item config.  Important that this goes after treasures because
         # otherwise the treasurewriter can overwrite key items placed by
         # Chronosanity
         logicwriter.commitKeyItems(self.settings, self.config)
 
+        self.__begin_stage('lw_key_item_gear')
         # Now go write LW extra items if need be
         treasurewriter.add_lw_key_item_gear(self.settings, self.config)
 
+        self.__begin_stage('shopwriter')
         # Shops
         shopwriter.write_shops_to_config(self.settings, self.config)
 
+        self.__begin_stage('roboribbon')
         # Robo's Ribbon in itemdb
         roboribbon.set_robo_ribbon_in_config(self.config)
 
+        self.__begin_stage('itemrando')
         # Item Rando
         # Important this is done after roboribbon or itemrando gets confused
         # over which stat boost is +3 speed
@@ -246,6 +302,7 @@ class Randomizer:
         itemrando.alt_gear_rando(self.settings, self.config)
         self.config.item_db.update_all_descriptions()
 
+        self.__begin_stage('bossrando')
         # Boss Rando
         bossrando.write_assignment_to_config(self.settings, self.config)
 
@@ -257,26 +314,34 @@ class Randomizer:
         # This has to come before boss rando scaling  because some boss scaling
         # changes are defined absolutely instead of relatively, so they would
         # just overwrite the boss rando scaling.
+        self.__begin_stage('bossscaler')
         bossscaler.determine_boss_rank(self.settings, self.config)
 
+        self.__begin_stage('boss_scaling')
         # Finally, scale based on new location.
         bossrando.scale_bosses_given_assignment(self.settings, self.config)
 
+        self.__begin_stage('midbosses')
         # Black Tyrano/Magus boss randomization
         bossrando.randomize_midbosses(self.settings, self.config)
 
+        self.__begin_stage('tabwriter')
         # Tabs
         tabwriter.write_tabs_to_config(self.settings, self.config)
 
+        self.__begin_stage('bucketlist')
         # Bucket
         bucketlist.add_objectives_to_config(self.settings, self.config)
 
+        self.__begin_stage('omen_elevators')
         # Omen elevator
         self.__update_key_item_descs()
         self.__set_omen_elevators_config()
 
+        self.__begin_stage('iceage')
         # Ice age GG buffs if IA flag is present in settings.
         iceage.write_config(self.settings, self.config)
+        self.__end_stage()
 
     @classmethod
     def __set_fast_zeal_teleporters(cls, ct_rom: CTRom):
@@ -693,9 +758,9 @@ class Randomizer:
         fight_thresh_up = [0xA0, 0x60, 0x80]
         fight_thresh_down = [0x80, 0x60, 0xA0]
         fights_up = [ind for ind, thresh in enumerate(fight_thresh_up)
-                     if random.randrange(0, 0x100) < thresh]
+                     if rng.randrange(0, 0x100) < thresh]
         fights_down = [ind for ind, thresh in enumerate(fight_thresh_down)
-                       if random.randrange(0, 0x100) < thresh]
+                       if rng.randrange(0, 0x100) < thresh]
 
         self.config.omen_elevator_fights_up = fights_up
         self.config.omen_elevator_fights_down = fights_down
@@ -915,7 +980,8 @@ class Randomizer:
             return
 
         # With valid config and settings, we can write generate the rom
-        self.__write_out_rom()
+        with rng.use_rng(self.rng):
+            self.__write_out_rom()
 
     # There are no good tools for working with animation scripts.  The
     # change is small, so we're doing it directly
@@ -946,6 +1012,7 @@ class Randomizer:
         config = self.config
         ctrom = self.out_rom
 
+        self.__begin_stage('write_enemies')
         # We can always do this, even if not reverting to black hole because
         # antilife just uses life2's script, not black hole's....
         # ...unless we're in vanilla mode.
@@ -967,18 +1034,21 @@ class Randomizer:
         for enemy_id, sprite_data in config.enemy_sprite_dict.items():
             sprite_data.write_to_ctrom(ctrom, enemy_id)
 
+        self.__begin_stage('write_treasures')
         # Write treasures out -- this includes key items
         # for treasure in config.treasure_assign_dict.values():
         for tid in config.treasure_assign_dict:
             treasure = config.treasure_assign_dict[tid]
             treasure.write_to_ctrom(ctrom)
 
+        self.__begin_stage('write_shops_items')
         # Write shops out
         config.shop_manager.write_to_ctrom(ctrom)
 
         # Write items out
         config.item_db.write_to_ctrom(ctrom)
 
+        self.__begin_stage('write_characters')
         # Write characters out
         # Recruitment spots
         for character in config.char_assign_dict.values():
@@ -989,48 +1059,51 @@ class Randomizer:
             rset.GameFlags.LOCKED_CHARS in self.settings.gameflags
         )
 
+        self.__begin_stage('write_objectives')
         # I need to write objectives before bosses are in because otherwise
         # the change in object count change the correct object_ids to hook into.
         bucketlist.write_objectives_to_ctrom(self.out_rom, self.settings,
                                              self.config)
 
+        self.__begin_stage('write_characters')
         # Stats
         config.pcstats.write_to_ctrom(ctrom)
 
         # Write out the rest of the character data (incl. techs)
         charrando.reassign_characters_on_ctrom(ctrom, config)
 
+        self.__begin_stage('write_bosses')
         # Write out the bosses
         bossrando.write_bosses_to_ctrom(ctrom, config)
 
+        self.__begin_stage('write_tabs_omen')
         # tabs
         tabwriter.rewrite_tabs_on_ctrom(ctrom, config)
 
         # Omen elevator
         self.__set_omen_elevators_ctrom(ctrom, config)
 
+        self.__begin_stage('scriptshortener')
         scriptshortener.shorten_all_scripts(ctrom)
+        self.__begin_stage('xmenu_charlocks')
         # Disabling xmenu character locks is only relevant in LoC and IA, but
         # there's no reason not to just do it always.
         self.__disable_xmenu_charlocks(ctrom)
 
     def __write_out_rom(self):
         '''Given config and settings, write to self.out_rom'''
-        self.out_rom = CTRom(self.base_ctrom.rom_data.getvalue(), True)
-
-        initial_vanilla = False
-        if CTRom.validate_ct_rom_bytes(self.out_rom.rom_data.getbuffer()):
-            initial_vanilla = True
-            # It's too hard reclaiming space from basepatch.ips.  Just take
-            # one block that I know is OK.
-            # basepatch.mark_initial_free_space(self.out_rom)
-            self.out_rom.rom_data.space_manager.mark_block(
-                (0x027DE4, 0x028000), ctevent.FSWriteType.MARK_FREE
-            )
+        self.__begin_stage('base_patches')
+        base_rom = self.base_ctrom.rom_data.getbuffer()
+        initial_vanilla = CTRom.validate_ct_rom_bytes(base_rom)
+
+        # The basic patches are the same for every seed, so the patched rom
+        # comes from the cache.
+        self.out_rom = self.__get_basic_patched_ctrom(base_rom,
+                                                      initial_vanilla)
+        self.out_rom.rom_data.ledger = self.ledger
 
         # TODO:  Consider working some of the always-applied script changes
         #        Into base_patch.ips to improve generation speed.
-        self.__apply_basic_patches(self.out_rom, self.settings)
         self.__free_guardia_forest_600_objs()
         self.__apply_settings_patches(self.out_rom, self.settings)
 
@@ -1044,6 +1117,7 @@ class Randomizer:
                 (0x027DE4, 0x028000), ctevent.FSWriteType.MARK_USED
             )
 
+        self.__begin_stage('script_fixes')
         # This makes copies of heckran cave passagesways, king's trial,
         # and now Zenan Bridge so that all bosses can go there.
         # There's no reason not do just do this regardless of whether
@@ -1199,6 +1273,7 @@ class Randomizer:
         # Now, write the information from the config to the rom.
         self.__write_config_to_out_rom()
 
+        self.__begin_stage('mode_scripts')
         # Fix to giant's claw box
         claw_copy = treasuretypes.ChestTreasureData()
         claw_copy.copy_location = ctenums.LocID.TYRANO_LAIR_ANTECHAMBERS
@@ -1222,9 +1297,13 @@ class Randomizer:
         elif mode == rset.GameMode.VANILLA_RANDO:
             vanillarando.restore_sos(self.out_rom, self.config)
 
+        self.__begin_stage('write_all_scripts')
         # Write and remove all scripts
-        self.out_rom.write_all_scripts_to_rom(clear_scripts=True)
+        self.out_rom.write_all_scripts_to_rom(
+            clear_scripts=True, share_strings=self.share_strings
+        )
 
+        self.__begin_stage('post_patches')
         # Put the seed hash on the active/wait screen
         self.hash_string_bytes = seedhash.write_hash_string(self.out_rom)
 
@@ -1242,9 +1321,14 @@ class Randomizer:
             gi_jogger_name='AzureCale',
         )
 
+        self.__begin_stage('write_all_scripts')
         # Rewrite any scripts changed by post-randomization
-        self.out_rom.write_all_scripts_to_rom()
+        self.out_rom.write_all_scripts_to_rom(
+            share_strings=self.share_strings
+        )
+        self.__begin_stage('fix_snes_checksum')
         self.out_rom.fix_snes_checksum()
+        self.__end_stage()
         self.has_generated = True
 
     def get_generated_rom(self) -> bytes:
@@ -1802,6 +1886,29 @@ class Randomizer:
 
         basepatch.apply_tf_compressed_enemy_gfx_hack(ctrom)
 
+    @classmethod
+    def __get_basic_patched_ctrom(cls, rom: bytes,
+                                  mark_initial_free: bool = False) -> CTRom:
+        '''
+        Get a new CTRom of rom with the basic patches applied.  The result is
+        cached by basecache since it does not depend on the seed.
+
+        If mark_initial_free is set, a block which is known to be unused in
+        the vanilla rom is marked free before patching.
+        '''
+        def patch_func(ct_rom: CTRom):
+            if mark_initial_free:
+                # It's too hard reclaiming space from basepatch.ips.  Just
+                # take one block that I know is OK.
+                # basepatch.mark_initial_free_space(ct_rom)
+                ct_rom.rom_data.space_manager.mark_block(
+                    (0x027DE4, 0x028000), ctevent.FSWriteType.MARK_FREE
+                )
+            cls.__apply_basic_patches(ct_rom)
+
+        tag = 'basic-initfree' if mark_initial_free else 'basic'
+        return basecache.default_cache.get_patched_ctrom(rom, patch_func, tag)
+
     @classmethod
     def __apply_settings_patches(cls, ctrom: CTRom,
                                  settings: rset.Settings):
@@ -1936,21 +2043,6 @@ class Randomizer:
 
         settings.ctoptions.write_to_ctrom(ctrom)
 
-    @classmethod
-    def dump_default_config(cls, ct_vanilla: bytearray):
-        '''Turn vanilla ct rom into default objects for a config.
-        Should run whenever a big patch (base_patch.ips, hard.ips) changes.'''
-        ct_rom = CTRom(ct_vanilla, ignore_checksum=False)
-        cls.__apply_basic_patches(ct_rom)
-
-        RC = cfg.RandoConfig
-        config = RC()
-        cls.fill_default_config_entries(config)
-        config.update_from_ct_rom(ct_rom)
-
-        with open('./pickles/default_randoconfig.pickle', 'wb') as outfile:
-            pickle.dump(config, outfile)
-
     @classmethod
     def fill_default_config_entries(cls, config: cfg.RandoConfig):
         config.boss_assign_dict = rotypes.get_default_boss_assignment()
@@ -1958,9 +2050,109 @@ class Randomizer:
         config.char_assign_dict = pcrecruit.get_base_recruit_dict()
         config.boss_rank_dict = {}
 
+    @classmethod
+    def __get_rom_base_config(
+            cls, ct_vanilla: typing.ByteString, settings: rset.Settings
+    ) -> Tuple[cfg.RandoConfig, Optional[dict]]:
+        '''
+        Get a copy of the config values read from the rom for the settings'
+        game mode and difficulties.  The values come from basecache and are
+        only read from the rom when the patches or rom change.
+
+        Returns the config and, outside of vanilla rando, the vanilla Black
+        Hole tech for reverting Antilife.
+        '''
+        mode = settings.game_mode
+        enemy_difficulty = settings.enemy_difficulty
+        item_difficulty = settings.item_difficulty
+
+        def build_func():
+            # Only copied when the cache misses.
+            return cls.__read_rom_base_config(bytearray(ct_vanilla), mode,
+                                              enemy_difficulty,
+                                              item_difficulty)
+
+        tag = f'config-{mode.name}-{enemy_difficulty.name}-' \
+            f'{item_difficulty.name}'.lower()
+        return basecache.default_cache.get_object(ct_vanilla, build_func, tag)
+
+    @classmethod
+    def warm_base_caches(cls, rom: bytes, settings: rset.Settings):
+        '''
+        Fill basecache with the patched rom and base config that generating
+        with these settings will need.  Used to share the work between
+        processes (e.g. batch generation) before they start.
+        '''
+        initial_vanilla = CTRom.validate_ct_rom_bytes(rom)
+
+        # Scripts which the base patches leave alone are then read from the
+        # index instead of being decompressed for every seed.
+        if scriptindex.default_index is None:
+            scriptindex.set_default_index(
+                scriptindex.ScriptIndex.from_rom(rom)
+            )
+
+        cls.__get_basic_patched_ctrom(rom, initial_vanilla)
+        cls.__get_rom_base_config(bytearray(rom), settings)
+
+    @classmethod
+    def __read_rom_base_config(
+            cls, ct_vanilla: bytearray,
+            mode: rset.GameMode,
+            enemy_difficulty: rset.Difficulty,
+            item_difficulty: rset.Difficulty
+    ) -> Tuple[cfg.RandoConfig, Optional[dict]]:
+        '''
+        Read the config values which come from the (partially patched) rom.
+        See get_base_config_from_settings for which members these are.
+        '''
+        van_ct_rom = CTRom(ct_vanilla, True)
+        config = cfg.RandoConfig()
+
+        if mode == rset.GameMode.VANILLA_RANDO:
+            config.update_from_ct_rom(van_ct_rom)
+            return config, None
+
+        ct_rom = cls.__get_basic_patched_ctrom(ct_vanilla)
+
+        van_config = cfg.RandoConfig()
+        van_config.update_from_ct_rom(van_ct_rom)
+        config.update_from_ct_rom(ct_rom)
+
+        # base_patch.ips apparently writes marle into the magus spot with
+        # custom ai to heal and cast ice2.  It's cool, but we want the
+        # vanilla north cape magus.
+        magus_id = ctenums.EnemyID.MAGUS_NORTH_CAPE
+        magus_nc_sprite = van_config.enemy_sprite_dict[magus_id]
+        magus_nc_ai = van_config.enemy_ai_db.scripts[magus_id]
+        magus_nc_stats = van_config.enemy_dict[magus_id]
+
+        config.enemy_ai_db.scripts[magus_id] = magus_nc_ai
+        config.enemy_sprite_dict[magus_id] = magus_nc_sprite
+        config.enemy_dict[magus_id] = magus_nc_stats
+
+        # Get hard versions of config items if needed.
+        # We're done with the rom at this point, so it's OK to patch.
+        ct_rom.rom_data.patch_ips_file('./patches/hard.ips')
+        if enemy_difficulty == rset.Difficulty.HARD:
+            config.enemy_dict = \
+                enemystats.get_stat_dict_from_ctrom(ct_rom)
+
+        if item_difficulty == rset.Difficulty.HARD:
+            config.item_db = itemdata.ItemDB.from_rom(
+                ct_rom.rom_data.getvalue()
+            )
+
+        # Black Hole is needed when Antilife is reverted.
+        TechDB = charrando.TechDB
+        vanilla_db = TechDB.get_default_db(ct_vanilla)
+        black_hole = vanilla_db.get_tech(ctenums.TechID.ANTI_LIFE)
+
+        return config, black_hole
+
     @classmethod
     def get_base_config_from_settings(cls,
-                                      ct_vanilla: bytearray,
+                                      ct_vanilla: typing.ByteString,
                                       settings: rset.Settings):
         '''Gets an rset.RandoConfig object with the correct initial values.
 
@@ -1979,16 +2171,11 @@ class Randomizer:
                          base_patch.ips.
         '''
 
-        # It's a little wasteful copying the rom data to partially patch it
-        # to extract the base values for the above.
-
-        # I do have a pickle with a default config and normal/hard enemy dicts
-        # which can be used instead if this is an issue.  The problem with
-        # using those is the need to update them with every patch.
-        van_ct_rom = CTRom(ct_vanilla, True)
-        ct_rom = CTRom(ct_vanilla, True)
-        Randomizer.__apply_basic_patches(ct_rom)
-        config = cfg.RandoConfig()
+        # Reading the base values from the rom is the most expensive part of
+        # building the config, so basecache keeps the values read for each
+        # (mode, enemy difficulty, item difficulty).  Each seed gets its own
+        # copy which is then modified based on the flags.
+        config, black_hole = cls.__get_rom_base_config(ct_vanilla, settings)
         cls.fill_default_config_entries(config)
 
         spots = bossrando.get_assignable_spots(settings.game_mode,
@@ -2001,7 +2188,6 @@ class Randomizer:
         config.boss_data_dict = rotypes.get_boss_data_dict()
 
         if settings.game_mode == rset.GameMode.VANILLA_RANDO:
-            config.update_from_ct_rom(van_ct_rom)
             vanillarando.fix_config(config)
 
             # Apply the experimental logic tweaks in the config
@@ -2009,37 +2195,9 @@ class Randomizer:
             cls.__apply_logic_tweaks_to_config(settings, config)
 
         else:
-            van_config = cfg.RandoConfig()
-            van_config.update_from_ct_rom(van_ct_rom)
-            config.update_from_ct_rom(ct_rom)
-
-            # base_patch.ips apparently writes marle into the magus spot with
-            # custom ai to heal and cast ice2.  It's cool, but we want the
-            # vanilla north cape magus.
-            magus_id = ctenums.EnemyID.MAGUS_NORTH_CAPE
-            magus_nc_sprite = van_config.enemy_sprite_dict[magus_id]
-            magus_nc_ai = van_config.enemy_ai_db.scripts[magus_id]
-            magus_nc_stats = van_config.enemy_dict[magus_id]
-
-            config.enemy_ai_db.scripts[magus_id] = magus_nc_ai
-            config.enemy_sprite_dict[magus_id] = magus_nc_sprite
-            config.enemy_dict[magus_id] = magus_nc_stats
-
             # Apply the experimental logic tweaks in the config
             cls.__apply_logic_tweaks_to_config(settings, config)
 
-            # Get hard versions of config items if needed.
-            # We're done with the rom at this point, so it's OK to patch.
-            ct_rom.rom_data.patch_ips_file('./patches/hard.ips')
-            if settings.enemy_difficulty == rset.Difficulty.HARD:
-                config.enemy_dict = \
-                    enemystats.get_stat_dict_from_ctrom(ct_rom)
-
-            if settings.item_difficulty == rset.Difficulty.HARD:
-                config.item_db = itemdata.ItemDB.from_rom(
-                    ct_rom.rom_data.getvalue()
-                )
-
             # Why is Dalton worth so few TP?
             config.enemy_dict[ctenums.EnemyID.DALTON_PLUS].tp = 50
 
@@ -2105,10 +2263,6 @@ class Randomizer:
 
             # Revert antilife to black hole
             if rset.GameFlags.USE_ANTILIFE not in settings.gameflags:
-                TechDB = charrando.TechDB
-                vanilla_db = TechDB.get_default_db(ct_vanilla)
-                black_hole = vanilla_db.get_tech(ctenums.TechID.ANTI_LIFE)
-
                 anti_life = tech_db.get_tech(ctenums.TechID.ANTI_LIFE)
                 anti_life['control'][8] = 0x16  # +Atk for down allies
                 anti_life['effects'][0][9] = 0x20  # Megabomb power
@@ -2256,6 +2410,15 @@ class RandomizerWriter:
         self.json_spoiler_path = os.path.join(output_path, json_spoiler_name)
         self.rando.write_json_spoiler_log(self.json_spoiler_path)
 
+    def write_profile(self, output_path: str):
+        if self.rando.profiler is None:
+            raise ValueError("Randomizer has no profiler.")
+
+        profile_name = f"{self.out_string}.profile.json"
+        self.profile_path = os.path.join(output_path, profile_name)
+        self.rando.profiler.close()
+        self.rando.profiler.write_json(self.profile_path)
+
 
 def read_names():
     p = open("names.txt", "r")
@@ -2265,6 +2428,55 @@ def read_names():
     return names
 
 
+def batch_main(val_dict: dict, arg_namespace, input_file: str,
+               output_path: str):
+    '''Generate many seeds according to the --batch options.'''
+    # Imported here because batchgen imports this module.
+    import batchgen
+
+    if val_dict['batch_settings'] is not None:
+        settings = batchgen.read_settings_file(val_dict['batch_settings'])
+    else:
+        settings = arguments.args_to_settings(arg_namespace)
+
+    if val_dict['batch_seeds'] is not None:
+        seeds = batchgen.read_seed_file(val_dict['batch_seeds'])
+    else:
+        names = read_names()
+        seeds = [
+            "".join(random.choice(names) for i in range(2))
+            for _ in range(val_dict['batch_count'])
+        ]
+
+    with open(input_file, 'rb') as infile:
+        rom = infile.read()
+
+    if not CTRom.validate_ct_rom_bytes(rom):
+        print('Warning: File provided is not a vanilla CT ROM.')
+
+    base_name = os.path.basename(input_file)
+    start = time.perf_counter()
+    results = batchgen.generate_batch(
+        rom, settings, seeds, output_path, base_name,
+        num_workers=val_dict['batch_workers'],
+        spoilers=val_dict['spoilers'],
+        json_spoilers=val_dict['json_spoilers']
+    )
+    total_time = time.perf_counter() - start
+
+    summary_path = os.path.join(output_path, f"{base_name}.batch.json")
+    batchgen.write_summary(results, summary_path, total_time)
+
+    num_failed = sum(not result.success for result in results)
+    for result in results:
+        if not result.success:
+            print(f"seed {result.seed} failed:\n{result.error}")
+
+    print(f"generated {len(results)-num_failed}/{len(results)} seeds in "
+          f"{total_time:.1f}s")
+    print(f"batch summary: {summary_path}")
+
+
 def main():
     parser = arguments.get_parser()
     arg_namespace = parser.parse_args()
@@ -2281,6 +2493,15 @@ def main():
     elif not os.path.isdir(output_path):
         raise FileNotFoundError("Invalid output directory.")
 
+    # Read unchanged scripts from the prebuilt index if there is one.
+    scriptindex.set_default_index(
+        scriptindex.load_index(val_dict['script_index'])
+    )
+
+    if val_dict['batch']:
+        batch_main(val_dict, arg_namespace, input_file, output_path)
+        return
+
     # Make sure the settings are ok before going further and reading the rom.
     settings = arguments.args_to_settings(arg_namespace)
     if settings.seed is None or settings.seed == "":
@@ -2299,8 +2520,12 @@ def main():
         if not proceed:
             sys.exit()
 
+    profiler = None
+    if val_dict['profile']:
+        profiler = stageprofile.StageProfiler()
+
     rando = Randomizer(rom, is_vanilla=False,
-                       settings=settings, config=None)
+                       settings=settings, config=None, profiler=profiler)
     rando.set_random_config()
 
     base_name = os.path.basename(input_file)
@@ -2308,6 +2533,10 @@ def main():
     writer.write_output_rom(output_path)
     print(f"output ROM: {writer.full_output_path}")
 
+    if val_dict['profile']:
+        writer.write_profile(output_path)
+        print(f"profile: {writer.profile_path}")
+
     if val_dict['spoilers']:
         writer.write_spoiler_log(output_path)
         print(f"spoilers: {writer.spoiler_path}")
@@ -7,6 +7,7 @@ import bossrandotypes as rotypes
 import ctoptions
 
 SIE = TypeVar('SIE', bound='StrIntEnum')
+FlagT = TypeVar('FlagT', bound=Flag)
 
 
 class StrIntEnum(IntEnum):
@@ -396,6 +397,64 @@ class Settings:
             "cosmetic_flags": self.cosmetic_flags
         }
 
+    @classmethod
+    def from_jot_json(cls, json_dict: dict) -> Settings:
+        '''
+        Build a Settings object from a dict with the same shape as the
+        (json encoded) output of _jot_json.  Missing keys keep their default
+        values.  Flags may be given as 'GameFlags.FIX_GLITCH' or
+        'FIX_GLITCH'.  Raises ValueError if a value has the wrong type or is
+        not recognized.
+        '''
+        def get_enum(enum_type: Type[SIE], key: str, default: SIE) -> SIE:
+            if key not in json_dict:
+                return default
+
+            str_dict = enum_type.inv_str_dict(lambda x: x.lower())
+            value = str(json_dict[key]).lower()
+            if value not in str_dict:
+                raise ValueError(f'Invalid value for {key}: {value}')
+            return str_dict[value]
+
+        def get_flags(flag_type: Type[FlagT], key: str,
+                      default: FlagT) -> FlagT:
+            if key not in json_dict:
+                return default
+
+            flag_strs = json_dict[key]
+            if not isinstance(flag_strs, list) or \
+               not all(isinstance(flag_str, str) for flag_str in flag_strs):
+                raise ValueError(f'{key} must be a list of strings.')
+
+            ret = flag_type(0)
+            for flag_str in flag_strs:
+                flag_name = flag_str.split('.')[-1].upper()
+                if flag_name not in flag_type.__members__:
+                    raise ValueError(f'Invalid flag for {key}: {flag_str}')
+                ret |= flag_type[flag_name]
+
+            return ret
+
+        ret = cls()
+        ret.seed = json_dict.get('seed', ret.seed)
+        if not isinstance(ret.seed, str):
+            raise ValueError('seed must be a string.')
+
+        ret.game_mode = get_enum(GameMode, 'mode', ret.game_mode)
+        ret.enemy_difficulty = get_enum(Difficulty, 'enemy_difficulty',
+                                        ret.enemy_difficulty)
+        ret.item_difficulty = get_enum(Difficulty, 'item_difficulty',
+                                       ret.item_difficulty)
+        ret.techorder = get_enum(TechOrder, 'tech_order', ret.techorder)
+        ret.shopprices = get_enum(ShopPrices, 'shops', ret.shopprices)
+        ret.gameflags = get_flags(GameFlags, 'flags', ret.gameflags)
+        ret.initial_flags = get_flags(GameFlags, 'initial_flags',
+                                      ret.gameflags)
+        ret.cosmetic_flags = get_flags(CosmeticFlags, 'cosmetic_flags',
+                                       ret.cosmetic_flags)
+
+        return ret
+
     @staticmethod
     def get_race_presets():
         ret = Settings()
@@ -0,0 +1,81 @@
+'''
+Random number generation for the config writers.
+
+The writers draw their random numbers through this module instead of the
+global random module.  By default the calls go to the global generator (so
+calling a writer directly behaves as before), but a Randomizer makes its own
+random.Random seeded from the settings and activates it with use_rng while it
+writes the config.  The active generator is per-thread, so several
+Randomizers can generate in threads of one process without affecting each
+other's results.
+
+Basic usage:
+    gen = random.Random(seed)
+    with rng.use_rng(gen):
+        treasurewriter.write_treasures_to_config(settings, config)
+'''
+from __future__ import annotations
+
+import contextlib
+import random as _random
+import threading
+from typing import Iterator, MutableSequence, Optional, Sequence, TypeVar
+
+T = TypeVar('T')
+
+_local = threading.local()
+
+
+def get_rng() -> _random.Random:
+    '''Get the generator active in this thread.'''
+    gen: Optional[_random.Random] = getattr(_local, 'rng', None)
+    if gen is None:
+        # random._inst is the generator behind the module-level functions.
+        return _random._inst  # type: ignore
+    return gen
+
+
+@contextlib.contextmanager
+def use_rng(gen: _random.Random) -> Iterator[_random.Random]:
+    '''Make gen the active generator in this thread within the block.'''
+    prev_gen = getattr(_local, 'rng', None)
+    _local.rng = gen
+    try:
+        yield gen
+    finally:
+        _local.rng = prev_gen
+
+
+# The functions below mirror the random module functions of the same name.
+def random() -> float:
+    return get_rng().random()
+
+
+def uniform(a: float, b: float) -> float:
+    return get_rng().uniform(a, b)
+
+
+def randrange(start: int, stop: Optional[int] = None, step: int = 1) -> int:
+    return get_rng().randrange(start, stop, step)
+
+
+def randint(a: int, b: int) -> int:
+    return get_rng().randint(a, b)
+
+
+def choice(seq: Sequence[T]) -> T:
+    return get_rng().choice(seq)
+
+
+def choices(population: Sequence[T], weights=None, *, cum_weights=None,
+            k: int = 1) -> list[T]:
+    return get_rng().choices(population, weights, cum_weights=cum_weights,
+                             k=k)
+
+
+def sample(population: Sequence[T], k: int) -> list[T]:
+    return get_rng().sample(population, k)
+
+
+def shuffle(x: MutableSequence) -> None:
+    get_rng().shuffle(x)
@@ -0,0 +1,156 @@
+'''
+Cache of compressed event scripts keyed on their uncompressed contents.
+
+Many scripts are identical from seed to seed (flux scripts and fixes which do
+not depend on the seed), so compressing them again when generating several
+seeds in one process is wasted work.  The cache holds compressed packets in
+least recently used order and evicts old entries once the total size of the
+stored packets passes a limit.  If given a path, the cache can be loaded from
+and saved to disk so that later processes start warm.
+'''
+from __future__ import annotations
+
+import collections
+import hashlib
+import os
+import pickle
+import threading
+from typing import ByteString, Optional
+
+import picklefile
+from ctdecompress import compress
+
+# Bump this when compress changes its output so that stale entries on disk
+# are not reused.
+_CACHE_VERSION = 1
+
+DEFAULT_MAX_BYTES = 0x1000000
+
+
+class CompressionCache:
+    '''
+    LRU cache of compressed packets.
+
+    Basic usage:
+        cache = CompressionCache()
+        compr_event = cache.compress(script.get_bytearray())
+
+    max_bytes bounds the total length of the stored compressed packets.
+    '''
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES,
+                 path: Optional[str] = None):
+        '''
+        If path is given and the file exists, entries are loaded from it.
+        '''
+        self.max_bytes = max_bytes
+        self.path = path
+
+        self._entries: collections.OrderedDict[bytes, bytes] = \
+            collections.OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        if path is not None:
+            self.load(path)
+
+    @staticmethod
+    def get_key(data: ByteString) -> bytes:
+        return hashlib.blake2b(data, digest_size=20).digest()
+
+    @property
+    def size(self) -> int:
+        '''The total length of the stored compressed packets.'''
+        return self._size
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def _insert(self, key: bytes, value: bytes):
+        '''Add an entry and evict old ones.  The lock must be held.'''
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+
+        if len(value) > self.max_bytes:
+            return
+
+        self._entries[key] = value
+        self._size += len(value)
+
+        while self._size > self.max_bytes:
+            _, old_value = self._entries.popitem(last=False)
+            self._size -= len(old_value)
+
+    def compress(self, data: ByteString) -> bytes:
+        '''Get compress(data), reusing an earlier result when possible.'''
+        key = self.get_key(data)
+
+        with self._lock:
+            value = self._entries.get(key, None)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+
+        # Compress outside of the lock so that threads can compress
+        # different scripts at the same time.
+        value = bytes(compress(data))
+
+        with self._lock:
+            self._insert(key, value)
+
+        return value
+
+    def load(self, path: str):
+        '''
+        Add the entries saved in path.  A missing or unreadable file is
+        ignored.
+        '''
+        if not os.path.isfile(path):
+            return
+
+        try:
+            with open(path, 'rb') as infile:
+                version, entries = pickle.load(infile)
+        except Exception:
+            return
+
+        if version != _CACHE_VERSION:
+            return
+
+        with self._lock:
+            for key, value in entries:
+                self._insert(key, value)
+
+    def save(self, path: Optional[str] = None):
+        '''Atomically write the entries to path (default self.path).'''
+        if path is None:
+            path = self.path
+        if path is None:
+            raise ValueError('No path given to save the cache to.')
+
+        with self._lock:
+            entries = list(self._entries.items())
+
+        picklefile.write_pickle(path, (_CACHE_VERSION, entries))
+
+
+# The cache used by ScriptManager unless told otherwise.
+default_cache = CompressionCache()
+
+
+def set_default_cache(cache: CompressionCache):
+    '''Replace the cache used by ScriptManager.'''
+    global default_cache
+    default_cache = cache
@@ -0,0 +1,264 @@
+'''
+Prebuilt index of decompressed location event scripts.
+
+Reading a location's script means decompressing it and scanning it for
+strings, and a seed reads well over a hundred of them.  The index stores each
+location's decompressed script, its strings and its compressed length, so a
+ScriptManager can build the Event without touching the packet.
+
+Each entry also records where its packet and strings were on the rom it was
+built from.  An entry is only used if the rom being read still has the same
+packet (checked by hash) and the same strings at those addresses, so one index
+built from the vanilla rom is safe to use with patched roms.  Locations whose
+scripts were changed are read from the rom as usual.
+
+The file is a header, a table of fixed size records (one per location) and
+then the script and string data.  It is read through mmap, so opening it
+costs little and only the scripts which are used are read.
+
+Build an index with:
+    python scriptindex.py vanilla.sfc cache/scripts.idx
+
+The randomizer loads the index from DEFAULT_INDEX_PATH (or --script-index)
+if it is there.  Without a usable index, every script is read from the rom.
+'''
+from __future__ import annotations
+
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+from typing import ByteString, Optional, Tuple
+
+import ctevent
+from ctdecompress import get_compressed_length
+
+_MAGIC = b'JOTSIDX\x00'
+_VERSION = 1
+
+# magic, version, number of records
+_HEADER = struct.Struct('<8sII')
+
+# loc_id, num_objects, modified_strings, packet ptr, packet length,
+# packet digest, data offset, data length, strings offset, number of strings
+_RECORD = struct.Struct('<HBBII16sIIII')
+
+# rom address, length
+_STRING_HEADER = struct.Struct('<IH')
+
+NUM_LOCATIONS = 0x200
+
+DEFAULT_INDEX_PATH = os.path.join('.', 'cache', 'scripts.idx')
+
+
+class ScriptIndexError(Exception):
+    '''Raised when an index file is malformed or the wrong version.'''
+
+
+def _get_digest(data: ByteString) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def build_index(rom: ByteString,
+                loc_ids: Optional[list[int]] = None) -> bytes:
+    '''
+    Build the index for the given locations (default all) of rom.
+    Locations which can not be read are left out.
+    '''
+    if loc_ids is None:
+        loc_ids = list(range(NUM_LOCATIONS))
+
+    records = []
+    blob = bytearray()
+    for loc_id in loc_ids:
+        try:
+            ptr = ctevent.get_loc_event_ptr(rom, loc_id)
+            event, string_addrs = \
+                ctevent.Event.from_rom_with_string_addrs(rom, ptr)
+            compr_len = get_compressed_length(rom, ptr)
+        except (IndexError, ValueError):
+            continue
+
+        data_offset = len(blob)
+        blob.extend(event.data)
+
+        strings_offset = len(blob)
+        for addr, string in zip(string_addrs, event.strings):
+            blob.extend(_STRING_HEADER.pack(addr, len(string)))
+            blob.extend(string)
+
+        records.append(
+            _RECORD.pack(loc_id, event.num_objects, event.modified_strings,
+                         ptr, compr_len,
+                         _get_digest(rom[ptr:ptr+compr_len]),
+                         data_offset, len(event.data),
+                         strings_offset, len(event.strings))
+        )
+
+    blob_start = _HEADER.size + _RECORD.size*len(records)
+
+    # Record offsets are relative to the blob so that the table can be
+    # built before knowing its own size.  Fix them up here.
+    out = bytearray(_HEADER.pack(_MAGIC, _VERSION, len(records)))
+    for record in records:
+        fields = list(_RECORD.unpack(record))
+        fields[6] += blob_start
+        fields[8] += blob_start
+        out.extend(_RECORD.pack(*fields))
+    out.extend(blob)
+
+    return bytes(out)
+
+
+class ScriptIndex:
+    '''
+    Read access to an index made by build_index.
+
+    Basic usage:
+        index = ScriptIndex.from_file('scripts.idx')
+        result = index.get_event(rom, loc_id)
+        if result is not None:
+            event, compressed_len = result
+    '''
+    def __init__(self, buffer: ByteString):
+        self._buffer = memoryview(buffer)
+
+        if len(self._buffer) < _HEADER.size:
+            raise ScriptIndexError('Index is too short.')
+
+        magic, version, num_records = _HEADER.unpack_from(self._buffer, 0)
+        if magic != _MAGIC:
+            raise ScriptIndexError('Not a script index.')
+        if version != _VERSION:
+            raise ScriptIndexError(f'Unsupported index version {version}.')
+
+        table_end = _HEADER.size + _RECORD.size*num_records
+        if len(self._buffer) < table_end:
+            raise ScriptIndexError('Index is truncated.')
+
+        # loc_id -> offset of the record
+        self._record_offsets: dict[int, int] = {}
+        for ind in range(num_records):
+            offset = _HEADER.size + _RECORD.size*ind
+            loc_id = struct.unpack_from('<H', self._buffer, offset)[0]
+            self._record_offsets[loc_id] = offset
+
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_rom(cls, rom: ByteString) -> ScriptIndex:
+        '''Build an in-memory index of every location in rom.'''
+        return cls(build_index(rom))
+
+    @classmethod
+    def from_file(cls, filename: str) -> ScriptIndex:
+        with open(filename, 'rb') as infile:
+            buffer = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return cls(buffer)
+
+    def __contains__(self, loc_id: int) -> bool:
+        return loc_id in self._record_offsets
+
+    def __len__(self):
+        return len(self._record_offsets)
+
+    def get_event(self, rom: ByteString,
+                  loc_id: int) -> Optional[Tuple[ctevent.Event, int]]:
+        '''
+        Get a new Event for loc_id and the length of its compressed packet.
+        Returns None if loc_id is not indexed or rom's script differs from
+        the indexed one.
+        '''
+        offset = self._record_offsets.get(loc_id, None)
+        if offset is None:
+            self.misses += 1
+            return None
+
+        (_, num_objects, modified_strings, ptr, compr_len, digest,
+         data_offset, data_len, strings_offset, num_strings) = \
+            _RECORD.unpack_from(self._buffer, offset)
+
+        if ctevent.get_loc_event_ptr(rom, loc_id) != ptr or \
+           _get_digest(rom[ptr:ptr+compr_len]) != digest:
+            self.misses += 1
+            return None
+
+        buffer = self._buffer
+        strings = []
+        pos = strings_offset
+        for _ in range(num_strings):
+            addr, length = _STRING_HEADER.unpack_from(buffer, pos)
+            pos += _STRING_HEADER.size
+            string = bytearray(buffer[pos:pos+length])
+            pos += length
+
+            if rom[addr:addr+length] != string:
+                self.misses += 1
+                return None
+
+            strings.append(string)
+
+        event = ctevent.Event()
+        event.num_objects = num_objects
+        event.data = bytearray(buffer[data_offset:data_offset+data_len])
+        event.strings = strings
+        event.modified_strings = bool(modified_strings)
+
+        self.hits += 1
+        return event, compr_len
+
+
+def load_index(filename: str) -> Optional[ScriptIndex]:
+    '''
+    Open the index in filename.  Returns None if there is no such file or
+    it is not a usable index, in which case scripts are read from the rom.
+    '''
+    if not os.path.isfile(filename):
+        return None
+
+    try:
+        return ScriptIndex.from_file(filename)
+    except (OSError, ValueError, ScriptIndexError) as exc:
+        print(f'Warning: Ignoring script index {filename}: {exc}')
+        return None
+
+
+# The index used by ScriptManager unless told otherwise.  None means read
+# every script from the rom.
+default_index: Optional[ScriptIndex] = None
+
+
+def set_default_index(index: Optional[ScriptIndex]):
+    '''Replace the index used by ScriptManager.'''
+    global default_index
+    default_index = index
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Build an index of the event scripts in a rom.'
+    )
+    parser.add_argument('rom', help='the (vanilla) rom to index')
+    parser.add_argument('output', help='where to write the index')
+    args = parser.parse_args()
+
+    with open(args.rom, 'rb') as infile:
+        rom = infile.read()
+
+    # Strip a copier header if present.
+    if len(rom) % 0x400 == 0x200:
+        rom = rom[0x200:]
+
+    index_bytes = build_index(rom)
+    with open(args.output, 'wb') as outfile:
+        outfile.write(index_bytes)
+
+    print(f'Indexed {len(ScriptIndex(index_bytes))} locations '
+          f'({len(index_bytes)} bytes).')
+
+
+if __name__ == '__main__':
+    main()
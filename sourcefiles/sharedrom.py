@@ -0,0 +1,202 @@
+'''
+Copy-on-write roms opened from one shared base image.
+
+Generating a seed used to mean copying the whole (6MB) patched base rom into
+a new FSRom even though a seed only changes a small part of it.  A
+SharedRomImage holds the base rom once, in an anonymous file, and each
+CowFSRom maps that file privately (mmap.ACCESS_COPY).  The operating system
+shares the pages of the image between every rom opened from it and only
+copies a page the first time a rom writes to it, so the memory used by each
+seed is proportional to the pages it changes.  getbuffer() still gives a
+writable memoryview of the whole rom, so code which edits the rom through
+the buffer works unchanged.
+
+The image keeps the free space markers of the base rom too, so each rom
+opened from it starts with the same free space.  Opened roms do not affect
+the image or each other.  A forked process inherits the image's file and
+shares its pages with the parent.
+
+Basic usage:
+    image = SharedRomImage(rom_bytes)
+    fsrom = image.open()    # or ctrom.CTRom(image, True)
+    fsrom.seek(0x3FF000)
+    fsrom.write(b'...', FSWriteType.MARK_USED)
+    print(len(fsrom.get_dirty_pages()))
+'''
+from __future__ import annotations
+
+import mmap
+import os
+import tempfile
+from io import SEEK_CUR, SEEK_END, SEEK_SET
+from typing import ByteString, Optional, Sequence, Union
+
+import freespace
+
+
+class SharedRomImage:
+    '''
+    An immutable rom and its free space which FSRoms can be opened from.
+    '''
+    def __init__(self, rom: ByteString, first_free: Optional[bool] = None,
+                 markers: Optional[Sequence[int]] = None):
+        '''
+        first_free and markers are the rom's free space (see FreeSpace).  If
+        they are not given, all of the rom is used space as in FSRom(rom).
+        '''
+        self.size = len(rom)
+
+        if markers is None:
+            space_man = freespace.FreeSpace(self.size, False)
+            first_free, markers = space_man.first_free, space_man.markers
+
+        self.first_free = bool(first_free)
+        self.markers = tuple(markers)
+
+        if hasattr(os, 'memfd_create'):
+            self._file = open(os.memfd_create('ctrom'), 'w+b')
+        else:
+            self._file = tempfile.TemporaryFile()
+
+        self._file.write(rom)
+        self._file.flush()
+
+        # Read only view of the image for comparing roms against.
+        self.view: ByteString = b''
+        if self.size > 0:
+            self.view = mmap.mmap(self._file.fileno(), self.size,
+                                  access=mmap.ACCESS_READ)
+
+    @classmethod
+    def from_fsrom(cls, fsrom: freespace.FSRom) -> SharedRomImage:
+        '''Make an image of an FSRom's current data and free space.'''
+        space_man = fsrom.space_manager
+        with fsrom.getbuffer() as buf:
+            return cls(buf, space_man.first_free, space_man.markers)
+
+    def open_map(self) -> Union[mmap.mmap, bytearray]:
+        '''
+        Get a private copy-on-write mapping of the image.  An empty file can
+        not be mapped, so an empty image gives an empty bytearray.
+        '''
+        if self.size == 0:
+            return bytearray()
+
+        return mmap.mmap(self._file.fileno(), self.size,
+                         access=mmap.ACCESS_COPY)
+
+    def restore_free_space(self, space_man: freespace.FreeSpace):
+        '''Set space_man to the free space of the image.'''
+        space_man.num_bytes = self.size
+        space_man.first_free = self.first_free
+        space_man.markers = list(self.markers)
+
+    def open(self, policy: Optional[freespace.AllocationPolicy] = None
+             ) -> CowFSRom:
+        '''Open a new FSRom with the image's data and free space.'''
+        return CowFSRom(self, policy)
+
+
+class CowFSRom(freespace.FSRom):
+    '''
+    An FSRom whose data is a copy-on-write mapping of a SharedRomImage.
+
+    Writing past the end of the image (e.g. expanding the rom) moves the rom
+    to private memory, so the whole rom is copied once.  As with BytesIO,
+    this raises BufferError while views from getbuffer are alive.
+    '''
+    def __init__(self, image: SharedRomImage,
+                 policy: Optional[freespace.AllocationPolicy] = None):
+        # The BytesIO part of the FSRom is left empty.  Reads and writes go
+        # to the mapping instead.
+        super().__init__(b'', False, policy)
+        image.restore_free_space(self.space_manager)
+
+        self.image = image
+        self._map = image.open_map()
+        self._pos = 0
+
+    @property
+    def is_shared(self) -> bool:
+        '''Whether the rom still maps the image.'''
+        return len(self._map) == self.image.size
+
+    def seek(self, pos: int, whence: int = SEEK_SET) -> int:
+        if whence == SEEK_SET:
+            new_pos = pos
+        elif whence == SEEK_CUR:
+            new_pos = self._pos + pos
+        elif whence == SEEK_END:
+            new_pos = len(self._map) + pos
+        else:
+            raise ValueError(f'Invalid whence ({whence})')
+
+        if new_pos < 0:
+            raise ValueError(f'Negative seek position {new_pos}')
+
+        self._pos = new_pos
+        return new_pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        start = min(self._pos, len(self._map))
+        end = len(self._map)
+        if size is not None and size >= 0:
+            end = min(start + size, end)
+
+        self._pos = end
+        return self._map[start:end]
+
+    def _write_bytes(self, payload) -> int:
+        view = memoryview(payload).cast('B')
+        end = self._pos + len(view)
+        if end > len(self._map):
+            self.__grow(end)
+
+        self._map[self._pos:end] = view
+        self._pos = end
+        return len(view)
+
+    def __grow(self, size: int):
+        '''Move the rom to private memory of the given size.'''
+        new_map = mmap.mmap(-1, size)
+        new_map[:len(self._map)] = self._map
+
+        # A view from getbuffer would go on using the old mapping, so growing
+        # fails while there are any.  Closing the mapping checks for them.
+        if isinstance(self._map, mmap.mmap):
+            try:
+                self._map.close()
+            except BufferError:
+                new_map.close()
+                raise BufferError(
+                    'Existing exports of data: object cannot be re-sized'
+                ) from None
+
+        self._map = new_map
+
+    def getvalue(self) -> bytes:
+        return bytes(self._map)
+
+    def getbuffer(self) -> memoryview:
+        return memoryview(self._map)
+
+    def get_dirty_pages(self) -> list[int]:
+        '''
+        Get the indices (in units of mmap.PAGESIZE) of the pages which differ
+        from the image.  Pages past the end of the image are dirty.
+        '''
+        page_size = mmap.PAGESIZE
+        base = self.image.view
+        num_pages = -(-len(self._map) // page_size)
+
+        ret = []
+        for page in range(num_pages):
+            start = page*page_size
+            end = start + page_size
+            if self._map[start:end] != base[start:end]:
+                ret.append(page)
+
+        return ret
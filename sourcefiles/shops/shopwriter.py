@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import math
-import random as rand
+import rng
 
 from ctenums import ItemID, ShopID
 from treasures import treasuredata as td
@@ -134,11 +134,11 @@ def get_melchior_shop_items():
     katanas = [ItemID.FLINT_EDGE, ItemID.DARK_SABER, ItemID.AEON_BLADE]
 
     item_list = [
-        rand.choice(swords),
-        rand.choice(robo_arms),
-        rand.choice(guns),
-        rand.choice(bows),
-        rand.choice(katanas),
+        rng.choice(swords),
+        rng.choice(robo_arms),
+        rng.choice(guns),
+        rng.choice(bows),
+        rng.choice(katanas),
         ItemID.REVIVE,
         ItemID.SHELTER
     ]
@@ -150,7 +150,7 @@ def get_shop_items(guaranteed_items: list[ItemID], item_dist):
     shop_items = guaranteed_items[:]
 
     # potentially shop size should be passed in.  Keep the random isolated.
-    item_count = rand.randrange(3, 9) - len(shop_items)
+    item_count = rng.randrange(3, 9) - len(shop_items)
 
     for item_index in range(item_count):
         item = item_dist.get_random_item()
@@ -172,6 +172,6 @@ def get_shop_items(guaranteed_items: list[ItemID], item_dist):
 # bias lower numbers to avoid everything being prohibitively expensive.
 #
 def getRandomPrice():
-    r1 = rand.uniform(0, 1)
-    r2 = rand.uniform(0, 1)
+    r1 = rng.uniform(0, 1)
+    r2 = rng.uniform(0, 1)
     return math.floor(abs(r1 - r2) * 65000 + 1)
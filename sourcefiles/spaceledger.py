@@ -0,0 +1,149 @@
+'''
+Opt-in record of who used which part of a rom's free space.
+
+When generation fails with FreeSpaceError, the free space map only shows
+what is left.  An AllocationLedger attached to an FSRom records each change
+to its free space: the address, size and bank, the stage of generation (the
+subsystem), the module which made the change, and an optional detail such as
+the location whose script was written.
+
+Only space which actually changes is recorded.  Marking space which was
+already used as used records nothing, and space released (marked free) is
+recorded with a negative size, so the totals are the net space used.
+
+Basic usage:
+    ledger = AllocationLedger()
+    rando = randomizer.Randomizer(rom, settings=settings, ledger=ledger)
+    rando.set_random_config()
+    rando.generate_rom()
+    ledger.write_json('seed.ledger.json')
+    ledger.write_csv('seed.ledger.csv')
+'''
+from __future__ import annotations
+
+import contextlib
+import csv
+import dataclasses
+import json
+import sys
+import typing
+from typing import Iterator, Optional
+
+# Writes made from these modules are credited to their caller.
+_SKIPPED_MODULES = frozenset(('freespace', 'spaceledger', 'contextlib'))
+
+
+@dataclasses.dataclass
+class Allocation:
+    '''One block of free space used, or released if size is negative.'''
+    stage: Optional[str]
+    module: str
+    detail: Optional[str]
+    address: int
+    size: int
+    bank: int
+
+    def _jot_json(self):
+        return dataclasses.asdict(self)
+
+
+class AllocationLedger:
+    '''
+    Records allocations in the order they were made.
+
+    stage is set by whoever drives generation (Randomizer sets it at the
+    start of each stage) and totals are reported per stage and per module.
+    '''
+    def __init__(self):
+        self.allocations: list[Allocation] = []
+        self.stage: Optional[str] = None
+        self._details: list[str] = []
+
+    @contextlib.contextmanager
+    def detail(self, detail: str) -> Iterator[None]:
+        '''Attach detail to the allocations made in a with block.'''
+        self._details.append(detail)
+        try:
+            yield
+        finally:
+            self._details.pop()
+
+    @staticmethod
+    def _get_caller_module() -> str:
+        frame = sys._getframe(1)
+        while frame is not None:
+            module = frame.f_globals.get('__name__', '?')
+            if module not in _SKIPPED_MODULES:
+                return module
+            frame = frame.f_back
+
+        return '?'
+
+    def new_allocation(self, address: int, size: int) -> Allocation:
+        '''
+        Make (but do not record) an Allocation of size bytes at address with
+        the current stage, caller and detail.
+        '''
+        detail = self._details[-1] if self._details else None
+        return Allocation(self.stage, self._get_caller_module(), detail,
+                          address, size, address >> 16)
+
+    def record(self, address: int, size: int):
+        '''Record size free bytes at address becoming used.'''
+        self.allocations.append(self.new_allocation(address, size))
+
+    def release(self, address: int, size: int):
+        '''Record size used bytes at address becoming free.'''
+        self.record(address, -size)
+
+    def get_totals(self, key: str = 'stage') -> dict[str, int]:
+        '''
+        Get the net bytes used per value of key (an Allocation field).
+        '''
+        totals: dict[str, int] = {}
+        for allocation in self.allocations:
+            name = str(getattr(allocation, key))
+            totals[name] = totals.get(name, 0) + allocation.size
+
+        return totals
+
+    def _jot_json(self):
+        return {
+            'total_bytes': sum(allocation.size
+                               for allocation in self.allocations),
+            'stage_totals': self.get_totals('stage'),
+            'module_totals': self.get_totals('module'),
+            'allocations': [allocation._jot_json()
+                            for allocation in self.allocations]
+        }
+
+    def write_json(self, outfile: typing.Union[str, typing.TextIO]):
+        '''Write the ledger as json to a filename or file object.'''
+        if isinstance(outfile, str):
+            with open(outfile, 'w', encoding='utf-8') as real_outfile:
+                self.write_json(real_outfile)
+        else:
+            json.dump(self._jot_json(), outfile, indent=2)
+
+    def write_csv(self, outfile: typing.Union[str, typing.TextIO]):
+        '''Write one row per allocation to a filename or file object.'''
+        if isinstance(outfile, str):
+            with open(outfile, 'w', encoding='utf-8',
+                      newline='') as real_outfile:
+                self.write_csv(real_outfile)
+            return
+
+        fields = [field.name for field in dataclasses.fields(Allocation)]
+        writer = csv.DictWriter(outfile, fieldnames=fields)
+        writer.writeheader()
+        for allocation in self.allocations:
+            writer.writerow(allocation._jot_json())
+
+
+def detail(ledger: Optional[AllocationLedger],
+           text: str) -> typing.ContextManager:
+    '''ledger.detail(text), or a no-op context if there is no ledger.'''
+    if ledger is None:
+        return contextlib.nullcontext()
+
+    return ledger.detail(text)
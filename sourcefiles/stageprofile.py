@@ -0,0 +1,128 @@
+'''
+Opt-in timing and memory instrumentation for the stages of generation.
+
+Generation is a long linear sequence of steps, so stages are marked by
+calling begin() at the start of each one.  Beginning a stage ends the one
+before it.  Each stage records its call count, wall time, and (optionally)
+the peak memory allocated while it ran, as seen by tracemalloc.
+
+Basic usage:
+    profiler = StageProfiler()
+    rando = randomizer.Randomizer(rom, settings=settings, profiler=profiler)
+    rando.set_random_config()
+    rando.generate_rom()
+    profiler.close()
+    profiler.write_json('seed.profile.json')
+'''
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import json
+import time
+import tracemalloc
+import typing
+from typing import Optional
+
+
+@dataclasses.dataclass
+class StageStats:
+    '''Totals for all runs of one stage.'''
+    name: str
+    calls: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    peak_bytes: Optional[int] = None
+
+    def _jot_json(self):
+        return dataclasses.asdict(self)
+
+
+class StageProfiler:
+    '''
+    Records per-stage wall time, call counts, and peak traced memory.
+
+    Stats are kept in the order stages are first seen.
+    '''
+    def __init__(self, trace_memory: bool = True):
+        self.trace_memory = trace_memory
+        self.stages: dict[str, StageStats] = {}
+
+        self._cur_name: Optional[str] = None
+        self._cur_start = 0.0
+        self._cur_mem_start = 0
+        self._started_tracing = False
+
+    def _start_memory(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+        # reset_peak is new in 3.9.  Before that, clear the traces so that
+        # the peak counts only this stage's allocations.
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        else:
+            tracemalloc.clear_traces()
+
+        self._cur_mem_start = tracemalloc.get_traced_memory()[0]
+
+    def begin(self, name: str):
+        '''End the running stage (if any) and begin the stage name.'''
+        self.end()
+
+        self._cur_name = name
+        if self.trace_memory:
+            self._start_memory()
+        self._cur_start = time.perf_counter()
+
+    def end(self):
+        '''End the running stage (if any).'''
+        if self._cur_name is None:
+            return
+
+        elapsed = time.perf_counter() - self._cur_start
+        stats = self.stages.setdefault(self._cur_name,
+                                       StageStats(self._cur_name))
+        stats.calls += 1
+        stats.total_seconds += elapsed
+        stats.max_seconds = max(stats.max_seconds, elapsed)
+
+        if self.trace_memory and tracemalloc.is_tracing():
+            peak = tracemalloc.get_traced_memory()[1] - self._cur_mem_start
+            if stats.peak_bytes is None or peak > stats.peak_bytes:
+                stats.peak_bytes = peak
+
+        self._cur_name = None
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        '''Time the body of a with block as the stage name.'''
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end()
+
+    def close(self):
+        '''End the running stage and stop tracemalloc if we started it.'''
+        self.end()
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _jot_json(self):
+        return {
+            'trace_memory': self.trace_memory,
+            'total_seconds': sum(stats.total_seconds
+                                 for stats in self.stages.values()),
+            'stages': [stats._jot_json() for stats in self.stages.values()]
+        }
+
+    def write_json(self, outfile: typing.Union[str, typing.TextIO]):
+        '''Write the stats as json to a filename or file object.'''
+        if isinstance(outfile, str):
+            with open(outfile, 'w', encoding='utf-8') as real_outfile:
+                self.write_json(real_outfile)
+        else:
+            json.dump(self._jot_json(), outfile, indent=2)
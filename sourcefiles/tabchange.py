@@ -1,4 +1,4 @@
-import random as rand
+import rng
 
 from byteops import to_little_endian, to_rom_ptr
 from ctrom import CTRom
@@ -13,7 +13,7 @@ def choose_binom(min_val: int, max_val: int, p_succ: float):
     num_flips = max_val - min_val + 1
     add = 0
     for i in range(num_flips):
-        add += int(rand.random() < p_succ)
+        add += int(rng.random() < p_succ)
 
     return min_val + add
 
@@ -31,7 +31,7 @@ def write_tabs_to_config(settings: rset.Settings,
     elif tab_settings.scheme == rset.TabRandoScheme.UNIFORM:
 
         def rand_func(x: int, y: int):
-            return rand.randrange(x, y + 1)
+            return rng.randrange(x, y + 1)
 
     power_amt = rand_func(tab_settings.power_min, tab_settings.power_max)
     magic_amt = rand_func(tab_settings.magic_min, tab_settings.magic_max)
@@ -205,14 +205,14 @@ def rewrite_tabs(filename, rt_start=0x5F7450):
     rt_start_addr = to_little_endian(rt_start, 3)
 
     # Change these, make them function parameters, etc to alter the magnitudes
-    random_num = rand.randrange(0, 100, 1)
+    random_num = rng.randrange(0, 100, 1)
     if random_num < 33:
         pow_add = bytearray([2])
     elif random_num > 32 and random_num < 66:
         pow_add = bytearray([3])
     else:
         pow_add = bytearray([4])
-    random_num = rand.randrange(0, 101, 1)
+    random_num = rng.randrange(0, 101, 1)
     if random_num < 33:
         mag_add = bytearray([2])
     elif random_num > 32 and random_num < 66:
@@ -1,6 +1,6 @@
 """Module to randomize tech damage based on assigned mp."""
 import math
-import random
+import rng
 from typing import Callable
 
 import ctenums, ctstrings
@@ -57,7 +57,7 @@ def modify_all_single_techs(tech_db: techdb.TechDB):
 
     # Shuffle the MP values
     new_mp_vals = list(orig_mps.values())
-    random.shuffle(new_mp_vals)
+    rng.shuffle(new_mp_vals)
     new_mps = dict(zip(orig_mps.keys(), new_mp_vals))
 
     # Scale the effects.  Also scale the duplicate if one exists
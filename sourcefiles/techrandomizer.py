@@ -1,7 +1,7 @@
 from byteops import get_record
 from techdb import TechDB
 import copy
-import random
+import rng
 
 import ctenums
 import randosettings as rset
@@ -57,7 +57,7 @@ def generate_permutation_freq(rel_freqs):
 
     for start in range(0, len(rel_freqs)-1):
         N = sum(rel_freqs[start:])
-        x = random.randrange(1, N+1)
+        x = rng.randrange(1, N+1)
 
         for i in range(start, len(rel_freqs)):
             x -= rel_freqs[i]
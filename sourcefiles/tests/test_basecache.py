@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+import basecache
+import ctrom
+from freespace import FSWriteType
+
+
+@pytest.fixture
+def patch_dir(tmp_path):
+    patch_dir = tmp_path / 'patches'
+    patch_dir.mkdir()
+    (patch_dir / 'a.ips').write_bytes(b'PATCHEOF')
+
+    yield patch_dir
+    basecache.clear_patch_digests()
+
+
+def _make_patch_func(calls: list):
+    def patch_func(ct_rom: ctrom.CTRom):
+        calls.append(ct_rom)
+        ct_rom.rom_data.space_manager.mark_block((0x10, 0x20),
+                                                 FSWriteType.MARK_FREE)
+        ct_rom.rom_data.seek(0)
+        ct_rom.rom_data.write(b'\xFF')
+
+    return patch_func
+
+
+def test_load_from_cache_dir(tmp_path, patch_dir):
+    rom = bytes(range(0x40))
+    cache_dir = str(tmp_path / 'cache')
+    calls = []
+
+    cache = basecache.BaseCache(cache_dir, str(patch_dir))
+    cache.get_patched_ctrom(rom, _make_patch_func(calls), 'test')
+    cache.get_object(rom, lambda: {'built': len(calls)}, 'obj')
+    assert len(calls) == 1
+
+    # A new cache (e.g. in another process) reads the entries from disk.
+    other = basecache.BaseCache(cache_dir, str(patch_dir))
+    ct_rom = other.get_patched_ctrom(rom, _make_patch_func(calls), 'test')
+    assert len(calls) == 1
+    assert ct_rom.rom_data.getvalue() == b'\xFF' + rom[1:]
+    assert ct_rom.rom_data.space_manager.markers == [0, 0x10, 0x20, 0x40]
+
+    assert other.get_object(rom, lambda: None, 'obj') == {'built': 1}
+
+
+def test_patch_change_rebuilds(tmp_path, patch_dir):
+    rom = bytes(0x40)
+    cache_dir = str(tmp_path / 'cache')
+    calls = []
+
+    cache = basecache.BaseCache(cache_dir, str(patch_dir))
+    cache.get_patched_ctrom(rom, _make_patch_func(calls), 'test')
+
+    (patch_dir / 'a.ips').write_bytes(b'PATCH\x00\x00\x00\x00\x01\x01EOF')
+    basecache.clear_patch_digests()
+
+    # Neither the in-memory nor the on-disk entry matches the new hash.
+    cache.get_patched_ctrom(rom, _make_patch_func(calls), 'test')
+    other = basecache.BaseCache(cache_dir, str(patch_dir))
+    other.get_patched_ctrom(rom, _make_patch_func(calls), 'test')
+    assert len(calls) == 2
+
+    # The stale entry was replaced on disk.
+    assert len(os.listdir(cache_dir)) == 1
+
+
+def test_different_rom_rebuilds(patch_dir):
+    calls = []
+    cache = basecache.BaseCache(None, str(patch_dir))
+    cache.get_patched_ctrom(bytes(0x40), _make_patch_func(calls), 'test')
+    cache.get_patched_ctrom(bytes(0x41), _make_patch_func(calls), 'test')
+    assert len(calls) == 2
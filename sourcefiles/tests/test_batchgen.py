@@ -0,0 +1,62 @@
+import json
+import os
+
+import batchgen
+import randomizer
+import randosettings as rset
+
+
+class _FakeRandomizer:
+    '''Stands in for randomizer.Randomizer.  Seed 'bad' fails.'''
+    def __init__(self, rom, is_vanilla=True, settings=None, config=None):
+        self.rom = rom
+        self.settings = settings
+
+    @classmethod
+    def warm_base_caches(cls, rom, settings):
+        pass
+
+    def set_random_config(self):
+        if self.settings.seed == 'bad':
+            raise randomizer.GenerationFailedException('bad seed')
+
+
+class _FakeWriter:
+    def __init__(self, rando, base_name):
+        self.rando = rando
+        self.base_name = base_name
+
+    def write_output_rom(self, output_path):
+        self.full_output_path = os.path.join(
+            output_path, f'{self.base_name}.{self.rando.settings.seed}.sfc'
+        )
+        with open(self.full_output_path, 'wb') as outfile:
+            outfile.write(bytes(self.rando.rom.view))
+
+
+def test_batch_in_process(tmp_path, monkeypatch):
+    monkeypatch.setattr(randomizer, 'Randomizer', _FakeRandomizer)
+    monkeypatch.setattr(randomizer, 'RandomizerWriter', _FakeWriter)
+
+    rom = b'\x01\x02\x03\x04'
+    results = batchgen.generate_batch(
+        rom, rset.Settings(), ['first', 'bad', 'last'], str(tmp_path), 'ct',
+        num_workers=1
+    )
+
+    assert [result.seed for result in results] == ['first', 'bad', 'last']
+    assert [result.success for result in results] == [True, False, True]
+    assert 'bad seed' in results[1].error
+
+    with open(results[2].rom_path, 'rb') as infile:
+        assert infile.read() == rom
+
+    summary_path = str(tmp_path / 'summary.json')
+    batchgen.write_summary(results, summary_path, 1.5)
+    with open(summary_path, 'r', encoding='utf-8') as infile:
+        summary = json.load(infile)
+
+    assert summary['num_seeds'] == 3
+    assert summary['num_failed'] == 1
+    assert summary['total_seconds'] == 1.5
+    assert summary['seeds'][1]['rom_path'] is None
@@ -0,0 +1,25 @@
+import io
+
+from benchmarks import bench
+
+
+def test_benchmarks_register():
+    names = [benchmark.name for benchmark in bench.get_benchmarks()]
+    assert len(names) == len(set(names))
+    assert 'ctdecompress.compress' in names
+
+
+def test_run_and_compare(tmp_path):
+    benchmark = bench.get_benchmarks('FreeSpace.get_free_addr')[0]
+    result = bench.run_benchmark(benchmark, repeat=1)
+    assert result.skipped is None and len(result.times) == 1
+
+    baseline_path = str(tmp_path / 'baseline.json')
+    bench.save_baseline([result], baseline_path)
+    baseline = bench.load_baseline(baseline_path)
+
+    # Pretend the baseline was much faster.
+    baseline[result.name]['median'] /= 100
+    regressions = bench.write_report([result], baseline, 0.25,
+                                     io.StringIO())
+    assert regressions == [result.name]
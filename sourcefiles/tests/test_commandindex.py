@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import bisect
+import random
+
+import pytest
+
+import ctevent
+from commandindex import CommandIndex, _PositionList
+from eventcommand import EventCommand as EC, get_command
+
+_FLUX_FILES = ('./flux/cr_burrow.Flux', './flux/jot_trading_post.Flux',
+               './flux/VR_0E6_RSeries.Flux')
+
+
+def _linear_find(event: ctevent.Event, cmd_ids, start, end):
+    '''The search find_command_opt did before the index.'''
+    pos = start
+    while pos < end:
+        cmd = get_command(event.data, pos)
+        if cmd.command in cmd_ids:
+            return pos
+        pos += len(cmd)
+    return None
+
+
+def _assert_index_matches(event: ctevent.Event):
+    index = event._command_index
+    fresh = CommandIndex(event.data, event.get_object_start(0),
+                         event.generation)
+
+    assert index is not None and index.is_current(event.generation)
+    assert index.positions == fresh.positions
+    assert index.opcodes == fresh.opcodes
+    assert index.fwd_jumps == fresh.fwd_jumps
+    assert index.back_jumps == fresh.back_jumps
+    assert {key: value for key, value in index.opcode_positions.items()
+            if value} == fresh.opcode_positions
+
+
+@pytest.mark.parametrize('filename', _FLUX_FILES)
+def test_find_matches_linear(filename):
+    event = ctevent.Event.from_flux(filename)
+    start = event.get_object_start(0)
+    opcodes = sorted(set(event.data[pos] for pos in
+                         CommandIndex(event.data, start, 0).positions))
+
+    for obj_id in range(event.num_objects):
+        obj_start = event.get_object_start(obj_id)
+        obj_end = event.get_object_end(obj_id)
+        for opcode in opcodes:
+            pos, _ = event.find_command_opt([opcode], obj_start, obj_end)
+            assert pos == _linear_find(event, [opcode], obj_start, obj_end)
+
+
+@pytest.mark.parametrize('filename', _FLUX_FILES)
+def test_incremental_updates(filename):
+    event = ctevent.Event.from_flux(filename)
+    gen = random.Random(filename)
+    set_bit = EC.set_bit(0x7F01E0, 0x01).to_bytearray()
+
+    for _ in range(40):
+        index = CommandIndex(event.data, event.get_object_start(0),
+                             event.generation)
+        func_start = event.get_function_start(
+            gen.randrange(event.num_objects), 0
+        )
+
+        if gen.random() < 0.5 or len(index.positions) < 10:
+            event.insert_commands(set_bit, func_start)
+        else:
+            pos = gen.choice(index.positions)
+            cmd_id = event.data[pos]
+            if cmd_id in EC.fwd_jump_commands + EC.back_jump_commands or \
+               cmd_id in (0, 0xB8):
+                continue
+            event.delete_commands(pos, 1)
+
+        # Searching uses the index.  It must agree with a fresh one.
+        event.find_command_opt([0xFF])
+        _assert_index_matches(event)
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_position_list_matches_list(seed):
+    gen = random.Random(seed)
+    expected = sorted(gen.sample(range(0, 0x4000, 4), 200))
+    positions = _PositionList(list(expected))
+
+    for _ in range(500):
+        action = gen.random()
+        if action < 0.4:
+            ind = gen.randrange(len(expected) + 1)
+            shift = gen.randrange(-2, 4)
+            low = expected[ind-1] if ind > 0 else 0
+            if ind < len(expected) and expected[ind] + shift <= low:
+                continue
+            expected[ind:] = [x + shift for x in expected[ind:]]
+            positions.shift(ind, shift)
+        elif action < 0.6 and expected:
+            value = gen.choice(expected)
+            expected.remove(value)
+            positions.remove(value)
+        elif action < 0.8:
+            value = gen.randrange(expected[-1] + 2 if expected else 10)
+            if value in expected:
+                continue
+            bisect.insort(expected, value)
+            positions.insort(value)
+        else:
+            value = gen.randrange(-1, expected[-1] + 2 if expected else 10)
+            lo = gen.randrange(len(expected) + 1)
+            assert positions.bisect_left(value, lo) == \
+                bisect.bisect_left(expected, value, lo)
+            assert positions.bisect_right(value, lo) == \
+                bisect.bisect_right(expected, value, lo)
+
+        assert positions == expected
+
+    lo = gen.randrange(len(expected))
+    hi = gen.randrange(lo, len(expected) + 1)
+    del expected[lo:hi]
+    positions.delete(lo, hi)
+    assert positions == expected
+
+
+def test_direct_edits_rebuild():
+    event = ctevent.Event.from_flux(_FLUX_FILES[1])
+    pos, _ = event.find_command([0xB8])
+
+    # Overwrite the string index command with returns.
+    event.data[pos:pos+4] = EC.return_cmd().to_bytearray()*4
+    assert event.find_command_opt([0xB8], pos, pos+4)[0] is None
+    _assert_index_matches(event)
+
+
+def _get_jump_span(data, pos) -> tuple[int, int]:
+    cmd = get_command(data, pos)
+    if cmd.command in EC.fwd_jump_commands:
+        return pos, pos + len(cmd) + cmd.args[-1] - 1
+    return pos + len(cmd) - cmd.args[-1] - 1, pos + len(cmd)
+
+
+@pytest.mark.parametrize('filename', _FLUX_FILES)
+def test_jump_candidates(filename):
+    event = ctevent.Event.from_flux(filename)
+    index = CommandIndex(event.data, event.get_object_start(0),
+                         event.generation)
+    jumps = index.get_positions(EC.fwd_jump_commands + EC.back_jump_commands,
+                                0, len(event.data))
+    assert jumps
+
+    for before_pos in index.positions[::7]:
+        for after_pos in (before_pos, before_pos + 3):
+            covering = []
+            for pos in jumps:
+                start, end = _get_jump_span(event.data, pos)
+                if start < before_pos and end >= after_pos:
+                    covering.append(pos)
+
+            candidates = index.get_jump_candidates(before_pos, after_pos)
+            assert set(covering) <= set(candidates)
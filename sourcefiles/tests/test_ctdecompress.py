@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import os
+import random
+
+import pytest
+
+import ctdecompress
+import ctevent
+
+_has_c_decompress = ctdecompress._decompress_c is not None
+requires_c = pytest.mark.skipif(not _has_c_decompress,
+                                reason='ctcompress has no decompress')
+
+_FLUX_FILES = ('./flux/cr_burrow.Flux', './flux/jot_trading_post.Flux',
+               './flux/VR_0E6_RSeries.Flux')
+
+
+def _get_payloads() -> list[bytes]:
+    payloads = [bytes(ctevent.Event.from_flux(filename).get_bytearray())
+                for filename in _FLUX_FILES]
+
+    gen = random.Random(0)
+    # Random bytes don't compress, so the packet needs addenda.  Keep it
+    # well under 0x1000 since compress can't handle longer runs of literals.
+    payloads.append(bytes(gen.randrange(0x100) for _ in range(0x700)))
+    # Runs compress heavily.
+    payloads.append(b''.join(bytes([gen.choice(b'\x00\x01\xFF')]) *
+                             gen.randrange(1, 40) for _ in range(200)))
+    payloads.append(b'a')
+    return payloads
+
+
+@pytest.mark.parametrize('payload', _get_payloads(),
+                         ids=lambda payload: f'len{len(payload):04X}')
+def test_round_trip(payload):
+    compressed = ctdecompress.compress(payload)
+    # Put the packet at an offset in a larger buffer.
+    rom = b'\xAA'*0x123 + bytes(compressed) + b'\x55'*0x10
+
+    assert ctdecompress.decompress(rom, 0x123) == payload
+    assert ctdecompress.decompress_py(rom, 0x123) == payload
+    assert ctdecompress.get_compressed_length(rom, 0x123) == \
+        ctdecompress.get_compressed_length_py(rom, 0x123)
+
+
+@requires_c
+def test_c_accepts_buffers():
+    compressed = ctdecompress.compress(_get_payloads()[0])
+    expected = ctdecompress.decompress_py(compressed, 0)
+
+    for rom in (bytes(compressed), bytearray(compressed),
+                memoryview(bytes(compressed))):
+        result = ctdecompress._decompress_c(rom, 0)
+        assert isinstance(result, bytearray)
+        assert result == expected
+
+
+@requires_c
+def test_c_truncated_packet():
+    compressed = ctdecompress.compress(_get_payloads()[0])
+    with pytest.raises(IndexError):
+        ctdecompress._decompress_c(compressed[:len(compressed)//2], 0)
+    with pytest.raises(IndexError):
+        ctdecompress._get_compressed_length_c(compressed[:1], 0)
+
+
+def _get_vanilla_rom() -> bytes:
+    path = os.environ.get('CT_ROM_PATH', None)
+    if path is None or not os.path.isfile(path):
+        pytest.skip('CT_ROM_PATH not set')
+
+    with open(path, 'rb') as infile:
+        rom = infile.read()
+
+    # Strip a copier header if present.
+    if len(rom) % 0x400 == 0x200:
+        rom = rom[0x200:]
+
+    return rom
+
+
+@requires_c
+def test_vanilla_event_packets():
+    '''The C and python versions agree on every vanilla event packet.'''
+    rom = _get_vanilla_rom()
+
+    ptrs = {ctevent.get_loc_event_ptr(rom, loc_id)
+            for loc_id in range(0x200)}
+
+    for ptr in sorted(ptrs):
+        assert ctdecompress._decompress_c(rom, ptr) == \
+            ctdecompress.decompress_py(rom, ptr), f'{ptr:06X}'
+        assert ctdecompress._get_compressed_length_c(rom, ptr) == \
+            ctdecompress.get_compressed_length_py(rom, ptr), f'{ptr:06X}'
@@ -0,0 +1,46 @@
+import pytest
+
+import ctevent
+from eventcommand import CommandView, get_command, get_command_length
+
+_FLUX_FILES = ('./flux/cr_burrow.Flux', './flux/jot_trading_post.Flux',
+               './flux/VR_0E6_RSeries.Flux',
+               './flux/VR_10C_Geno_Dome_Mainframe.Flux')
+
+# Commands whose length depends on their arguments.
+_VARIABLE_COMMANDS = (
+    bytes.fromhex('2E4001020304'), bytes.fromhex('2E800102'),
+    bytes.fromhex('4E00100105000102'),
+    bytes.fromhex('8800'), bytes.fromhex('882001FF'),
+    bytes.fromhex('8840010203'), bytes.fromhex('88800403AABB'),
+    bytes.fromhex('F100'), bytes.fromhex('F10101'),
+    bytes.fromhex('FF900102'), bytes.fromhex('FF970101'),
+    bytes.fromhex('FF10'),
+)
+
+
+def _assert_same(buf, pos):
+    cmd = get_command(buf, pos)
+    view = CommandView(buf, pos)
+
+    assert get_command_length(buf, pos) == len(cmd) == len(view)
+    assert view.command == cmd.command
+    assert view.arg_lens == cmd.arg_lens
+    assert view.args == cmd.args
+
+
+@pytest.mark.parametrize('filename', _FLUX_FILES)
+def test_view_matches_get_command(filename):
+    event = ctevent.Event.from_flux(filename)
+    pos = event.get_object_start(0)
+    while pos < len(event.data):
+        _assert_same(event.data, pos)
+        pos += get_command_length(event.data, pos)
+
+    assert pos == len(event.data)
+
+
+@pytest.mark.parametrize('buf', _VARIABLE_COMMANDS,
+                         ids=lambda buf: buf[:2].hex())
+def test_variable_length_commands(buf):
+    _assert_same(buf + bytes(8), 0)
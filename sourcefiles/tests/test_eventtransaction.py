@@ -0,0 +1,108 @@
+import copy
+import random
+
+import pytest
+
+import ctevent
+from commandindex import CommandIndex
+from eventcommand import EventCommand as EC
+
+_FLUX_FILES = ('./flux/cr_burrow.Flux', './flux/jot_trading_post.Flux',
+               './flux/VR_0E6_RSeries.Flux')
+
+
+def _get_edits(event: ctevent.Event, gen: random.Random, num_edits: int):
+    '''Random (kind, pos) edits at distinct command boundaries.'''
+    index = CommandIndex(event.data, event.get_object_start(0), 0)
+    # Keep the string index and the last command where they are.
+    positions = [pos for pos in index.positions[:-1]
+                 if event.data[pos] != 0xB8]
+    positions = sorted(gen.sample(positions, num_edits))
+
+    # A deletion must not run into the next edit.
+    edits = []
+    for ind, pos in enumerate(positions):
+        kind = gen.choice(('insert', 'delete', 'replace'))
+        if kind != 'insert' and ind + 1 < len(positions):
+            next_cmd = index.positions[index.positions.index(pos)+1]
+            if next_cmd > positions[ind+1]:
+                kind = 'insert'
+        edits.append((kind, pos))
+
+    return edits
+
+
+@pytest.mark.parametrize('filename', _FLUX_FILES)
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('num_edits', (12, 60))
+def test_matches_sequential_edits(filename, seed, num_edits):
+    gen = random.Random(seed)
+    event = ctevent.Event.from_flux(filename)
+    new_cmds = EC.set_bit(0x7F01E0, 0x01).to_bytearray()
+
+    edits = _get_edits(event, gen, num_edits)
+
+    # Sequential edits from the back need no position adjustment.
+    expected = copy.deepcopy(event)
+    for kind, pos in reversed(edits):
+        if kind in ('insert', 'replace'):
+            expected.insert_commands(new_cmds, pos)
+        if kind == 'replace':
+            expected.delete_commands(pos+len(new_cmds), 1)
+        elif kind == 'delete':
+            expected.delete_commands(pos, 1)
+
+    # Queue them in a random order.
+    gen.shuffle(edits)
+    with event.edit() as tx:
+        for kind, pos in edits:
+            if kind == 'insert':
+                tx.insert(pos, new_cmds)
+            elif kind == 'delete':
+                tx.delete(pos)
+            else:
+                tx.replace(pos, new_cmds)
+
+    assert event.data == expected.data
+
+
+def test_delete_range_matches_single_deletes():
+    event = ctevent.Event.from_flux(_FLUX_FILES[2])
+    start = event.get_function_start(1, 0)
+    end = event.get_function_end(1, 0)
+
+    # Delete everything but the function's last command.
+    index = CommandIndex(event.data, event.get_object_start(0), 0)
+    func_cmds = [pos for pos in index.positions if start <= pos < end]
+
+    expected = copy.deepcopy(event)
+    for _ in func_cmds[:-1]:
+        expected.delete_commands(start)
+
+    event.delete_commands_range(start, func_cmds[-1])
+    assert event.data == expected.data
+
+
+def test_invalid_edits():
+    event = ctevent.Event.from_flux(_FLUX_FILES[0])
+    start = event.get_function_start(0, 0)
+
+    with event.edit() as tx:
+        length = tx.delete(start, 2)
+        with pytest.raises(ValueError):
+            tx.delete(start+length-1)
+        with pytest.raises(ValueError):
+            tx.insert(start+1, b'\x00')
+
+    # An exception in the block discards the edits.
+    data = event.data[:]
+    with pytest.raises(RuntimeError):
+        with event.edit() as tx:
+            tx.delete(start)
+            raise RuntimeError
+    assert event.data == data
+
+    with pytest.raises(ValueError):
+        with event.edit() as tx:
+            tx.delete(start)
+            event.data[start] ^= 0xFF
@@ -0,0 +1,55 @@
+import pathlib
+import shutil
+
+import ctevent
+import fluxcache
+
+_FLUX_FILE = './flux/jot_trading_post.Flux'
+
+
+def _assert_same_event(event: ctevent.Event, expected: ctevent.Event):
+    assert event.num_objects == expected.num_objects
+    assert event.data == expected.data
+    assert event.strings == expected.strings
+    assert event.modified_strings == expected.modified_strings
+
+
+def test_hit_is_independent_copy():
+    cache = fluxcache.FluxCache()
+    expected = ctevent.Event.from_flux_bytes(
+        pathlib.Path(_FLUX_FILE).read_bytes()
+    )
+
+    first = cache.get_event(_FLUX_FILE, ctevent.Event.from_flux_bytes)
+    first.data[0] ^= 0xFF
+    first.strings[0][0] ^= 0xFF
+
+    second = cache.get_event(_FLUX_FILE, ctevent.Event.from_flux_bytes)
+    _assert_same_event(second, expected)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_changed_file_misses(tmp_path):
+    path = tmp_path / 'script.Flux'
+    shutil.copy(_FLUX_FILE, path)
+
+    cache = fluxcache.FluxCache()
+    cache.get_event(str(path), ctevent.Event.from_flux_bytes)
+
+    shutil.copy('./flux/cr_burrow.Flux', path)
+    event = cache.get_event(str(path), ctevent.Event.from_flux_bytes)
+    assert cache.misses == 2
+    _assert_same_event(event, ctevent.Event.from_flux_bytes(path.read_bytes()))
+
+
+def test_persistence(tmp_path):
+    path = str(tmp_path / 'flux.cache')
+
+    cache = fluxcache.FluxCache(path=path)
+    expected = cache.get_event(_FLUX_FILE, ctevent.Event.from_flux_bytes)
+    cache.save()
+
+    loaded = fluxcache.FluxCache(path=path)
+    event = loaded.get_event(_FLUX_FILE, ctevent.Event.from_flux_bytes)
+    assert loaded.misses == 0
+    _assert_same_event(event, expected)
@@ -0,0 +1,235 @@
+import io
+import random
+
+import pytest
+
+import freespace
+from freespace import FSWriteType
+
+
+def _call(space: freespace.FreeSpace, method: str, *args):
+    '''Call a method and return its result or the FreeSpaceError raised.'''
+    try:
+        return getattr(space, method)(*args)
+    except freespace.FreeSpaceError:
+        return freespace.FreeSpaceError
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_indexed_matches_freespace(seed):
+    gen = random.Random(seed)
+    num_bytes = 0x400000
+    is_free = seed % 2 == 0
+
+    reference = freespace.FreeSpace(num_bytes, is_free)
+    indexed = freespace.IndexedFreeSpace(num_bytes, is_free)
+
+    for _ in range(1500):
+        action = gen.random()
+        if action < 0.6:
+            start = gen.choice((0, gen.randrange(num_bytes),
+                                gen.randrange(0, num_bytes, 0x10000)))
+            size = gen.choice((gen.randrange(1, 0x100),
+                               gen.randrange(1, 0x20000)))
+            block = (start, min(start + size, num_bytes))
+            mark_type = gen.choice((FSWriteType.MARK_FREE,
+                                    FSWriteType.MARK_USED, False))
+            reference.mark_block(block, mark_type)
+            indexed.mark_block(block, mark_type)
+        elif action < 0.9:
+            size = gen.choice((gen.randrange(1, 0x100),
+                               gen.randrange(1, 0x10000)))
+            hint = gen.choice((0, gen.randrange(num_bytes)))
+            assert _call(reference, 'get_free_addr', size, hint) == \
+                _call(indexed, 'get_free_addr', size, hint)
+        else:
+            start = gen.randrange(num_bytes-0x100)
+            block = (start, start + gen.randrange(1, 0x100))
+            assert reference.is_block_free(block) == \
+                indexed.is_block_free(block)
+
+        assert reference.markers == indexed.markers
+        assert reference.first_free == indexed.first_free
+
+
+def test_restored_state():
+    '''Setting markers directly (as basecache does) is picked up.'''
+    reference = freespace.FreeSpace(0x400000, False)
+    reference.mark_block((0x200000, 0x210000), FSWriteType.MARK_FREE)
+    reference.mark_block((0x300000, 0x300100), FSWriteType.MARK_FREE)
+
+    indexed = freespace.IndexedFreeSpace(0x400000, False)
+    _call(indexed, 'get_free_addr', 0x10)  # Builds the index.
+    indexed.first_free = reference.first_free
+    indexed.markers = list(reference.markers)
+
+    for size in (0x80, 0x1000, 0x10000):
+        assert indexed.get_free_addr(size) == reference.get_free_addr(size)
+
+
+def test_fsrom_backend():
+    fsrom = freespace.FSRom(bytes(0x10000), True)
+    assert type(fsrom.space_manager) is freespace.FreeSpace
+
+    fsrom = freespace.FSRom(bytes(0x10000), True, indexed=True)
+    assert isinstance(fsrom.space_manager, freespace.IndexedFreeSpace)
+
+
+@pytest.mark.parametrize('backend', (freespace.FreeSpace,
+                                     freespace.IndexedFreeSpace))
+def test_rollback_restores(backend):
+    gen = random.Random(backend.__name__)
+    space = backend(0x400000, False)
+    snapshots = []
+
+    for step in range(600):
+        if step % 50 == 0 and len(snapshots) < 4:
+            space.checkpoint()
+            snapshots.append((space.first_free, list(space.markers)))
+
+        start = gen.randrange(0x3F0000)
+        mark_type = gen.choice((FSWriteType.MARK_FREE, FSWriteType.MARK_USED))
+        space.mark_block((start, start+gen.randrange(1, 0x4000)), mark_type)
+        if step % 97 == 0:
+            space.extend_end_marker(space.markers[-1] + 0x100,
+                                    gen.random() < 0.5)
+
+        if step % 70 == 0 and snapshots:
+            if gen.random() < 0.5:
+                space.rollback()
+                assert (space.first_free, space.markers) == snapshots.pop()
+            else:
+                space.commit()
+                snapshots.pop()
+
+    reference = freespace.FreeSpace(0x400000, False)
+    while snapshots:
+        space.rollback()
+        reference.first_free, reference.markers = snapshots.pop()
+        assert (space.first_free, space.markers) == \
+            (reference.first_free, reference.markers)
+
+    for size in (0x10, 0x800, 0x8000):
+        assert _call(space, 'get_free_addr', size) == \
+            _call(reference, 'get_free_addr', size)
+
+
+def test_same_bank_is_dry_run():
+    space = freespace.IndexedFreeSpace(0x400000, False)
+    space.mark_block((0x20F000, 0x210000), FSWriteType.MARK_FREE)
+    space.mark_block((0x218000, 0x21A000), FSWriteType.MARK_FREE)
+    markers = list(space.markers)
+
+    addrs = space.get_same_bank_free_addrs([0x800, 0x1000])
+    assert addrs == [0x219000, 0x218000]
+    assert space.markers == markers
+
+
+def _make_holes() -> freespace.IndexedFreeSpace:
+    '''Holes of 0x800 at 0x201000, 0x100 at 0x208000 and 0x20 at 0x30F000.'''
+    space = freespace.IndexedFreeSpace(0x400000, False)
+    for start, size in ((0x201000, 0x800), (0x208000, 0x100),
+                        (0x30F000, 0x20)):
+        space.mark_block((start, start+size), FSWriteType.MARK_FREE)
+    return space
+
+
+def test_policies():
+    space = _make_holes()
+    assert space.get_free_addr(0x10) == 0x201000
+
+    space.policy = freespace.BestFitPolicy()
+    assert space.get_free_addr(0x10) == 0x30F000
+    assert space.get_free_addr(0x80) == 0x208000
+    with pytest.raises(freespace.FreeSpaceError):
+        space.get_free_addr(0x900)
+
+    space.policy = freespace.BankAffinityPolicy(0x30)
+    assert space.get_free_addr(0x10) == 0x30F000
+    assert space.get_free_addr(0x40) == 0x201000
+
+    space.policy = freespace.SizeClassPolicy((0x40, 0x200, 0x1000))
+    assert space.get_free_addr(0x10) == 0x30F000
+    assert space.get_free_addr(0x80) == 0x208000
+    assert space.get_free_addr(0x300) == 0x201000
+
+
+def test_fragmentation():
+    space = _make_holes()
+    space.mark_block((0x20FFF0, 0x210010), FSWriteType.MARK_FREE)
+
+    # The last block is split at the bank boundary.
+    stats = space.get_fragmentation(min_useful=0x40)
+    assert stats.free_bytes == 0x800 + 0x100 + 0x20 + 0x20
+    assert stats.free_block_count == 5
+    assert stats.largest_free_by_bank == {0x20: 0x800, 0x21: 0x10,
+                                          0x30: 0x20}
+    assert stats.wasted_tail_bytes == 0x40
+
+
+def _make_ips(records) -> bytes:
+    '''records are (address, payload) or (address, (rle_size, rle_byte)).'''
+    data = bytearray(b'PATCH')
+    for addr, payload in records:
+        data.extend(addr.to_bytes(3, 'big'))
+        if isinstance(payload, tuple):
+            rle_size, rle_byte = payload
+            data.extend(b'\x00\x00' + rle_size.to_bytes(2, 'big'))
+            data.append(rle_byte)
+        else:
+            data.extend(len(payload).to_bytes(2, 'big') + payload)
+    data.extend(b'EOF')
+    return bytes(data)
+
+
+def _write_ips_slowly(fsrom: freespace.FSRom, records):
+    '''What patch_ips did before patches were compiled.'''
+    for addr, payload in records:
+        mark = FSWriteType.MARK_USED
+        if isinstance(payload, tuple):
+            rle_size, rle_byte = payload
+            if rle_byte == 0 and rle_size >= 0x10:
+                mark = FSWriteType.MARK_FREE
+            payload = bytes([rle_byte])*rle_size
+        fsrom.seek(addr)
+        fsrom.write(payload, mark)
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_compiled_ips_matches_writes(seed):
+    gen = random.Random(seed)
+    records = []
+    for _ in range(300):
+        addr = gen.randrange(0x3F0000)
+        if gen.random() < 0.3:
+            payload = (gen.randrange(1, 0x100), gen.choice((0, 0xFF)))
+        else:
+            size = gen.randrange(1, 0x80)
+            payload = gen.getrandbits(8*size).to_bytes(size, 'little')
+        records.append((addr, payload))
+
+    # One write past the end of the buffer
+    if seed == 0:
+        records.append((0x3FFFF0, b'\x01'*0x20))
+
+    patched = freespace.FSRom(bytes(0x400000), seed % 2 == 0)
+    patched.patch_ips(io.BytesIO(_make_ips(records)))
+
+    expected = freespace.FSRom(bytes(0x400000), seed % 2 == 0)
+    _write_ips_slowly(expected, records)
+
+    assert patched.getvalue() == expected.getvalue()
+    assert patched.space_manager.markers == expected.space_manager.markers
+    assert patched.space_manager.first_free == \
+        expected.space_manager.first_free
+
+
+def test_compiled_patch_is_cached():
+    patch = _make_ips([(0x1000, b'\x01\x02'), (0x2000, (0x20, 0))])
+    first = freespace.get_compiled_patch(patch, freespace.compile_ips)
+    assert freespace.get_compiled_patch(patch, freespace.compile_ips) \
+        is first
+    assert list((addr, bytes(payload), mark)
+                for addr, payload, mark in first.iter_writes()) == \
+        [(0x1000, b'\x01\x02', FSWriteType.MARK_USED),
+         (0x2000, bytes(0x20), FSWriteType.MARK_FREE)]
@@ -0,0 +1,99 @@
+import http.client
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import genserver
+
+
+@pytest.fixture
+def server(monkeypatch):
+    '''Server with one worker thread, no queue, and a blocking generator.'''
+    release = threading.Event()
+
+    def fake_generate_seed(settings, base_name, spoilers=True):
+        release.wait(timeout=10)
+        return {'seed': settings.seed}
+
+    monkeypatch.setattr(genserver, 'generate_seed', fake_generate_seed)
+
+    pool = genserver.GenerationPool(b'', 1, 0, use_threads=True)
+    srv = genserver.GenerationServer(('127.0.0.1', 0), pool)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+
+    yield srv, release
+
+    release.set()
+    srv.shutdown()
+    srv.server_close()
+    pool.shutdown()
+
+
+def _request(srv, path, data=None):
+    port = srv.server_address[1]
+    req = urllib.request.Request(f'http://127.0.0.1:{port}{path}', data=data,
+                                 method='GET' if data is None else 'POST')
+    try:
+        with urllib.request.urlopen(req) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as exc:
+        return exc.code, json.loads(exc.read())
+
+
+def test_bad_settings(server):
+    srv, _ = server
+    status, _ = _request(srv, '/generate', b'{"mode": "not a mode"}')
+    assert status == 400
+
+
+def test_busy_server_refuses(server):
+    srv, release = server
+
+    results = []
+    first = threading.Thread(
+        target=lambda: results.append(
+            _request(srv, '/generate', b'{"seed": "first"}')
+        )
+    )
+    first.start()
+
+    # Wait for the first request to occupy the only worker.
+    for _ in range(1000):
+        if srv.pool.pending:
+            break
+        threading.Event().wait(0.01)
+
+    status, _ = _request(srv, '/generate', b'{"seed": "second"}')
+    assert status == 503
+
+    release.set()
+    first.join()
+    assert results == [(200, {'seed': 'first'})]
+
+    status, body = _request(srv, '/status')
+    assert status == 200 and body['workers'] == 1
+
+
+@pytest.mark.parametrize('body', [b'{"flags": 5}', b'{"flags": [5]}'])
+def test_bad_value_types(server, body):
+    srv, _ = server
+    status, _ = _request(srv, '/generate', body)
+    assert status == 400
+
+
+def test_negative_content_length(server):
+    srv, _ = server
+    port = srv.server_address[1]
+
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    conn.putrequest('POST', '/generate')
+    conn.putheader('Content-Length', '-1')
+    conn.endheaders()
+
+    response = conn.getresponse()
+    assert response.status == 400
+    conn.close()
@@ -0,0 +1,25 @@
+import os
+import pickle
+import threading
+
+import pytest
+
+import picklefile
+
+
+def test_write_pickle(tmp_path):
+    path = str(tmp_path / 'sub' / 'entry.pickle')
+    assert picklefile.write_pickle(path, {'a': 1})
+
+    with open(path, 'rb') as infile:
+        assert pickle.load(infile) == {'a': 1}
+
+
+def test_failed_pickle_leaves_no_temp_file(tmp_path):
+    path = str(tmp_path / 'entry.pickle')
+
+    # Locks can not be pickled.
+    with pytest.raises(TypeError):
+        picklefile.write_pickle(path, threading.Lock())
+
+    assert os.listdir(tmp_path) == []
@@ -1,6 +1,10 @@
+import json
+
 import pytest
 import randosettings as rset
 
+from jotjson import JOTJSONEncoder
+
 from randosettings import GameFlags as _GF
 from randosettings import GameMode as _GM
 
@@ -145,3 +149,35 @@ def test_fix_flag_conflicts_unfixable(settings):
     with pytest.raises(ValueError) as ex:
         settings.fix_flag_conflicts()
     assert 'fix flag conflicts' in str(ex)
+
+
+def test_from_jot_json_round_trip():
+    '''Check settings survive encoding to json and reading back.'''
+    settings = rset.Settings.get_race_presets()
+    settings.seed = 'SomeSeed'
+    settings.game_mode = _GM.LOST_WORLDS
+    settings.gameflags |= _GF.CHRONOSANITY | _GF.TAB_TREASURES
+
+    json_dict = json.loads(json.dumps(settings, cls=JOTJSONEncoder))
+    new_settings = rset.Settings.from_jot_json(json_dict)
+
+    assert new_settings.seed == settings.seed
+    assert new_settings.game_mode == settings.game_mode
+    assert new_settings.item_difficulty == settings.item_difficulty
+    assert new_settings.enemy_difficulty == settings.enemy_difficulty
+    assert new_settings.gameflags == settings.gameflags
+    assert new_settings.initial_flags == settings.initial_flags
+    assert new_settings.cosmetic_flags == settings.cosmetic_flags
+
+
+def test_from_jot_json_bad_flag():
+    with pytest.raises(ValueError):
+        rset.Settings.from_jot_json({'flags': ['GameFlags.NOT_A_FLAG']})
+
+
+@pytest.mark.parametrize('json_dict', [{'flags': 5}, {'flags': [5]},
+                                       {'cosmetic_flags': 'x'},
+                                       {'seed': 12}])
+def test_from_jot_json_bad_types(json_dict):
+    with pytest.raises(ValueError):
+        rset.Settings.from_jot_json(json_dict)
@@ -0,0 +1,86 @@
+import random
+import threading
+
+import pytest
+
+import mystery
+import randosettings as rset
+import rng
+
+
+def _draw_values():
+    vals = [rng.random(), rng.uniform(0, 5), rng.randrange(0, 100),
+            rng.randrange(3, 9), rng.randint(1, 6),
+            rng.choice(range(50)), rng.choices('abcde', [1, 2, 3, 4, 5], k=3),
+            rng.sample(range(100), 5)]
+    lst = list(range(20))
+    rng.shuffle(lst)
+    vals.append(lst)
+    return vals
+
+
+def test_use_rng_matches_global_seed():
+    '''A seeded Random must give the same draws as seeding the module.'''
+    random.seed('SomeSeed')
+    global_vals = _draw_values()
+
+    with rng.use_rng(random.Random('SomeSeed')):
+        local_vals = _draw_values()
+
+    assert global_vals == local_vals
+
+
+def test_use_rng_restores_previous():
+    outer = random.Random(1)
+    inner = random.Random(2)
+
+    with rng.use_rng(outer):
+        with rng.use_rng(inner):
+            assert rng.get_rng() is inner
+        assert rng.get_rng() is outer
+
+    assert rng.get_rng() is random._inst
+
+
+def test_use_rng_threads_are_independent():
+    '''Generators active in different threads do not share state.'''
+    expected = {}
+    for seed in ('A', 'B', 'C', 'D'):
+        with rng.use_rng(random.Random(seed)):
+            expected[seed] = [_draw_values() for _ in range(50)]
+
+    results = {}
+    barrier = threading.Barrier(4)
+
+    def worker(seed):
+        with rng.use_rng(random.Random(seed)):
+            barrier.wait()
+            results[seed] = [_draw_values() for _ in range(50)]
+
+    threads = [threading.Thread(target=worker, args=(seed,))
+               for seed in expected]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == expected
+
+
+@pytest.mark.parametrize('seed', ['abc', 'JetsOfTime'])
+def test_mystery_settings_unchanged(seed):
+    '''Writers give the same result with use_rng as with random.seed.'''
+    settings = rset.Settings.get_race_presets()
+    settings.gameflags |= rset.GameFlags.MYSTERY
+
+    random.seed(seed)
+    global_settings = mystery.generate_mystery_settings(settings)
+
+    with rng.use_rng(random.Random(seed)):
+        local_settings = mystery.generate_mystery_settings(settings)
+
+    assert global_settings.game_mode == local_settings.game_mode
+    assert global_settings.gameflags == local_settings.gameflags
+    assert global_settings.item_difficulty == local_settings.item_difficulty
+    assert global_settings.enemy_difficulty == \
+        local_settings.enemy_difficulty
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import ctdecompress
+import ctevent
+import scriptcache
+
+
+def _get_payloads() -> list[bytearray]:
+    return [ctevent.Event.from_flux(filename).get_bytearray()
+            for filename in ('./flux/cr_burrow.Flux',
+                             './flux/jot_trading_post.Flux',
+                             './flux/VR_0E6_RSeries.Flux')]
+
+
+def test_hit_matches_compress():
+    cache = scriptcache.CompressionCache()
+    payload = _get_payloads()[0]
+
+    first = cache.compress(payload)
+    second = cache.compress(bytearray(payload))
+
+    assert first == ctdecompress.compress(payload)
+    assert second is first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_eviction():
+    payloads = _get_payloads()
+    sizes = [len(ctdecompress.compress(payload)) for payload in payloads]
+
+    # Room for packet 0 and one of the others.
+    cache = scriptcache.CompressionCache(
+        max_bytes=sizes[0]+max(sizes[1], sizes[2])
+    )
+    cache.compress(payloads[0])
+    cache.compress(payloads[1])
+    cache.compress(payloads[0])  # 0 is now the most recently used
+    cache.compress(payloads[2])
+
+    assert cache.size <= cache.max_bytes
+    cache.compress(payloads[0])
+    assert cache.hits == 2
+    cache.compress(payloads[1])
+    assert cache.misses == 4
+
+
+def test_persistence(tmp_path):
+    path = str(tmp_path / 'scripts.cache')
+    payloads = _get_payloads()
+
+    cache = scriptcache.CompressionCache(path=path)
+    for payload in payloads:
+        cache.compress(payload)
+    cache.save()
+
+    loaded = scriptcache.CompressionCache(path=path)
+    assert len(loaded) == len(payloads)
+    for payload in payloads:
+        assert loaded.compress(payload) == ctdecompress.compress(payload)
+    assert loaded.misses == 0
+
+    # A corrupt file is ignored.
+    with open(path, 'wb') as outfile:
+        outfile.write(b'not a pickle')
+    assert len(scriptcache.CompressionCache(path=path)) == 0
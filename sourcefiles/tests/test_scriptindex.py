@@ -0,0 +1,103 @@
+import pytest
+
+import ctevent
+import ctrom
+import freespace
+import scriptindex
+from ctenums import LocID
+
+
+@pytest.fixture(name='rom')
+def fixture_rom() -> bytearray:
+    '''A blank rom with a flux script (with strings) written to location 0.'''
+    fsrom = freespace.FSRom(bytes(0x400000), False)
+    fsrom.space_manager.mark_block((0x200000, 0x210000),
+                                   freespace.FSWriteType.MARK_FREE)
+
+    manager = ctevent.ScriptManager(fsrom, [])
+    manager.set_script(
+        ctevent.Event.from_flux('./flux/jot_trading_post.Flux'),
+        LocID(0)
+    )
+    manager.write_script_to_rom(LocID(0), free_old=False)
+
+    return bytearray(fsrom.getvalue())
+
+
+def _assert_same_event(event: ctevent.Event, expected: ctevent.Event):
+    assert event.num_objects == expected.num_objects
+    assert event.data == expected.data
+    assert event.strings == expected.strings
+    assert event.modified_strings == expected.modified_strings
+
+
+def test_matches_rom(rom):
+    index = scriptindex.ScriptIndex(scriptindex.build_index(rom, [0]))
+    assert 0 in index and 1 not in index
+
+    event, compr_len = index.get_event(rom, 0)
+    _assert_same_event(event, ctevent.Event.from_rom_location(rom, 0))
+    assert compr_len == ctevent.get_compressed_event_length(rom, 0)
+
+    # Each call gives an independent copy.
+    event.data[0] ^= 0xFF
+    _assert_same_event(index.get_event(rom, 0)[0],
+                       ctevent.Event.from_rom_location(rom, 0))
+
+
+def test_changed_rom_misses(rom):
+    index = scriptindex.ScriptIndex(scriptindex.build_index(rom, [0]))
+    event = ctevent.Event.from_rom_location(rom, 0)
+    ptr = ctevent.get_loc_event_ptr(rom, 0)
+
+    changed_string = bytearray(rom)
+    string_addr = changed_string.find(bytes(event.strings[0]))
+    changed_string[string_addr] ^= 0xFF
+    assert index.get_event(changed_string, 0) is None
+
+    changed_packet = bytearray(rom)
+    changed_packet[ptr+5] ^= 0xFF
+    assert index.get_event(changed_packet, 0) is None
+
+
+def test_script_manager_uses_index(rom, tmp_path):
+    path = tmp_path / 'scripts.idx'
+    path.write_bytes(scriptindex.build_index(rom, [0]))
+    index = scriptindex.ScriptIndex.from_file(str(path))
+
+    fsrom = freespace.FSRom(bytes(rom), False)
+    manager = ctevent.ScriptManager(fsrom, [LocID(0)], script_index=index)
+
+    assert index.hits == 1
+    _assert_same_event(manager.get_script(LocID(0)),
+                       ctevent.Event.from_rom_location(rom, 0))
+    assert manager.orig_len_dict[LocID(0)] == \
+        ctevent.get_compressed_event_length(rom, 0)
+
+
+def test_bad_index():
+    with pytest.raises(scriptindex.ScriptIndexError):
+        scriptindex.ScriptIndex(b'not an index at all')
+
+
+def test_load_index(rom, tmp_path):
+    path = tmp_path / 'scripts.idx'
+    assert scriptindex.load_index(str(path)) is None
+
+    for bad_data in (b'', b'not an index at all'):
+        path.write_bytes(bad_data)
+        assert scriptindex.load_index(str(path)) is None
+
+    path.write_bytes(scriptindex.build_index(rom, [0]))
+    index = scriptindex.load_index(str(path))
+    assert index is not None
+
+    # New CTRoms read from the default index.
+    scriptindex.set_default_index(index)
+    try:
+        ct_rom = ctrom.CTRom(bytes(rom), True)
+        ct_rom.script_manager.get_script(LocID(0))
+    finally:
+        scriptindex.set_default_index(None)
+
+    assert index.hits == 1
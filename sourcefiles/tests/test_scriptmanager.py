@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import pytest
+
+import ctevent
+import ctrom
+import freespace
+from ctenums import LocID
+from ctevent import ScriptPlacement
+from eventcommand import EventCommand as EC
+
+_FLUX_FILES = ('./flux/cr_burrow.Flux', './flux/jot_trading_post.Flux',
+               './flux/VR_0E6_RSeries.Flux')
+
+
+def _make_manager() -> ctevent.ScriptManager:
+    '''A blank rom with a flux script in each of the first few locations.'''
+    fsrom = freespace.FSRom(bytes(0x400000), False)
+    fsrom.space_manager.mark_block((0x200000, 0x240000),
+                                   freespace.FSWriteType.MARK_FREE)
+
+    manager = ctevent.ScriptManager(fsrom, [])
+    loc_ids = list(LocID)[:2*len(_FLUX_FILES)]
+    for ind, (filename, loc_id) in enumerate(zip(_FLUX_FILES*2, loc_ids)):
+        event = ctevent.Event.from_flux(filename)
+        # Half of the scripts keep their (already written) strings.
+        event.modified_strings = ind % 2 == 0
+        manager.set_script(event, loc_id)
+
+    return manager
+
+
+def _write_all(manager: ctevent.ScriptManager, num_workers) -> bytes:
+    compressed = manager.compress_scripts(list(manager.script_dict),
+                                          num_workers)
+    for loc_id in manager.script_dict:
+        manager.write_script_to_rom(loc_id, free_old=False,
+                                    compressed=compressed.get(loc_id, None))
+
+    return manager.fsrom.getvalue()
+
+
+def test_parallel_matches_serial():
+    manager = _make_manager()
+    compressed = manager.compress_scripts(list(manager.script_dict), 4)
+    assert all(not manager.get_script(loc_id).modified_strings
+               for loc_id in compressed)
+
+    assert _write_all(_make_manager(), 4) == _write_all(_make_manager(), 1)
+
+
+def test_dirty_tracking():
+    manager = _make_manager()
+    loc_id = next(iter(manager.script_dict))
+    assert manager.is_dirty(loc_id)  # set, not read
+
+    manager.write_script_to_rom(loc_id, free_old=False)
+    manager = ctevent.ScriptManager(manager.fsrom, [loc_id])
+    script = manager.get_script(loc_id)
+    assert manager.get_dirty_scripts() == []
+
+    # Direct edits are caught, and undoing them leaves the script clean.
+    script.data[-1] ^= 0xFF
+    assert manager.is_dirty(loc_id)
+    script.data[-1] ^= 0xFF
+    assert not manager.is_dirty(loc_id)
+
+    script.strings[0][0] ^= 0xFF
+    assert manager.is_dirty(loc_id)
+    script.strings[0][0] ^= 0xFF
+
+    script.insert_commands(EC.return_cmd().to_bytearray(),
+                           script.get_function_start(0, 0))
+    assert manager.get_dirty_scripts() == [loc_id]
+
+    manager.write_script_to_rom(loc_id)
+    assert not manager.is_dirty(loc_id)
+
+    manager.set_script(ctevent.Event.from_flux(_FLUX_FILES[0]), loc_id)
+    assert manager.is_dirty(loc_id)
+
+
+def test_placement():
+    manager = _make_manager()
+    loc_id = next(iter(manager.script_dict))
+    manager.write_script_to_rom(loc_id, free_old=False)
+    assert manager.placement_counts[ScriptPlacement.FIRST_FIT] == 1
+
+    fsrom = manager.fsrom
+    manager = ctevent.ScriptManager(fsrom, [loc_id])
+    script = manager.get_script(loc_id)
+    old_ptr = ctevent.get_loc_event_ptr(fsrom.getbuffer(), loc_id)
+
+    # A smaller script goes back where it was.
+    script.delete_commands(script.get_function_start(0, 0))
+    manager.write_script_to_rom(loc_id)
+    assert manager.placement_counts[ScriptPlacement.IN_PLACE] == 1
+    assert ctevent.get_loc_event_ptr(fsrom.getbuffer(), loc_id) == old_ptr
+
+    # A bigger script which can not grow in place stays in the bank.
+    old_end = old_ptr + manager.orig_len_dict[loc_id]
+    fsrom.space_manager.mark_block((old_end, old_end+1),
+                                   freespace.FSWriteType.MARK_USED)
+    new_commands = b''.join(
+        EC.set_bit(0x7F0000 + ind, 1 << (ind % 8)).to_bytearray()
+        for ind in range(0x80)
+    )
+    script.insert_commands(new_commands, script.get_function_start(0, 0))
+    manager.write_script_to_rom(loc_id)
+
+    new_ptr = ctevent.get_loc_event_ptr(fsrom.getbuffer(), loc_id)
+    assert manager.placement_counts[ScriptPlacement.SAME_BANK] == 1
+    assert new_ptr != old_ptr and new_ptr >> 16 == old_ptr >> 16
+    assert ctevent.Event.from_rom_location(fsrom.getbuffer(), loc_id).data \
+        == script.data
+
+
+def _get_free_bytes(space: freespace.FreeSpace) -> int:
+    start = 0 if space.first_free else 1
+    return sum(space.markers[ind+1] - space.markers[ind]
+               for ind in range(start, len(space.markers)-1, 2))
+
+
+def test_strings_shared_and_freed():
+    manager = _make_manager()
+    loc_ids = list(manager.script_dict)
+    space = manager.fsrom.space_manager
+
+    # Locations 0 and 3 have the same script.  Write both plus location 1.
+    written = [loc_ids[0], loc_ids[3], loc_ids[1]]
+    for loc_id in written:
+        manager.get_script(loc_id).modified_strings = True
+    expected = {loc_id: list(manager.get_script(loc_id).strings)
+                for loc_id in written}
+
+    free_before = _get_free_bytes(space)
+    manager.write_strings(written, max_block_size=0x10000)
+    strings_size = free_before - _get_free_bytes(space)
+
+    script_size = {
+        loc_id: sum(len(string) + 2
+                    for string in manager.get_script(loc_id).strings)
+        for loc_id in written
+    }
+    assert strings_size == \
+        script_size[loc_ids[0]] + script_size[loc_ids[1]] + \
+        2*len(expected[loc_ids[3]])
+
+    for loc_id in written:
+        manager.write_script_to_rom(loc_id, free_old=False)
+        event = ctevent.Event.from_rom_location(manager.fsrom.getbuffer(),
+                                                loc_id)
+        assert event.strings == expected[loc_id]
+
+    # Rewriting every script of the block frees it.  The new string is
+    # shared by all three.
+    new_string = ctevent.ctstrings.CTString.from_str('New string.{null}')
+    free_before = _get_free_bytes(space)
+    for loc_id in written:
+        manager.get_script(loc_id).add_string(new_string)
+    manager.write_strings(written, max_block_size=0x10000)
+
+    assert free_before - _get_free_bytes(space) == \
+        2*len(written) + len(new_string)
+
+
+def _make_ctrom(loc_ids: list[LocID]) -> ctrom.CTRom:
+    '''A blank rom where each of loc_ids has its own script index.'''
+    rom = bytearray(0x400000)
+    for ind, loc_id in enumerate(loc_ids):
+        rom[0x360000 + 14*loc_id + 8] = ind
+
+    ct_rom = ctrom.CTRom(bytes(rom), True)
+    ct_rom.rom_data.space_manager.mark_block((0x200000, 0x210000),
+                                             freespace.FSWriteType.MARK_FREE)
+    return ct_rom
+
+
+def test_write_all_matches_serial():
+    loc_ids = list(LocID)[:2*len(_FLUX_FILES)]
+    roms = []
+    for _ in range(2):
+        ct_rom = _make_ctrom(loc_ids)
+        # Set in reverse so that the order scripts were set in differs from
+        # LocID order.
+        for loc_id, filename in reversed(list(zip(loc_ids, _FLUX_FILES*2))):
+            event = ctevent.Event.from_flux(filename)
+            ct_rom.script_manager.set_script(event, loc_id)
+        roms.append(ct_rom)
+
+    roms[0].write_all_scripts_to_rom(num_workers=4)
+    for loc_id in sorted(loc_ids):
+        roms[1].script_manager.write_script_to_rom(loc_id)
+
+    assert roms[0].rom_data.getvalue() == roms[1].rom_data.getvalue()
+
+
+@pytest.mark.parametrize('share_strings', (False, True))
+def test_tight_free_space(share_strings):
+    loc_ids = list(LocID)[:4]
+    ct_rom = _make_ctrom(loc_ids)
+    fsrom = ct_rom.rom_data
+
+    big_script = \
+        ctevent.Event.from_flux('./flux/VR_10C_Geno_Dome_Mainframe.Flux')
+    for loc_id in loc_ids:
+        ct_rom.script_manager.set_script(big_script.copy(), loc_id)
+    ct_rom.write_all_scripts_to_rom(share_strings=False)
+
+    # Read the scripts back like vanilla ones, whose strings are never freed.
+    # Only the space of the old packets is free.
+    fsrom.space_manager.mark_block((0, 0x400000),
+                                   freespace.FSWriteType.MARK_USED)
+    ct_rom.script_manager = ctevent.ScriptManager(fsrom, loc_ids)
+
+    small_script = ctevent.Event.from_flux('./flux/VR_0BC_Choras_Cafe.Flux')
+    scripts = {loc_id: small_script.copy() for loc_id in loc_ids}
+    for loc_id, script in scripts.items():
+        script.modified_strings = True
+        ct_rom.script_manager.set_script(script, loc_id)
+    ct_rom.write_all_scripts_to_rom(share_strings=share_strings)
+
+    for loc_id, script in scripts.items():
+        event = ctevent.Event.from_rom_location(fsrom.getbuffer(), loc_id)
+        assert event.data == script.data
+        assert event.strings == small_script.strings
+
+
+def test_compress_pool_reused():
+    pool = ctevent._get_compress_pool(4)
+    assert ctevent._get_compress_pool(4) is pool
+    assert list(pool.map(abs, [-1, -2])) == [1, 2]
+
+    other = ctevent._get_compress_pool(2)
+    assert other is not pool
+    assert ctevent._get_compress_pool(2) is other
@@ -0,0 +1,129 @@
+import mmap
+import random
+
+import pytest
+
+import basecache
+import ctrom
+import freespace
+import sharedrom
+from freespace import FSWriteType
+
+
+def _randbytes(gen: random.Random, size: int) -> bytes:
+    # random.Random.randbytes is new in Python 3.9.
+    return gen.getrandbits(8*size).to_bytes(size, 'little')
+
+
+def _make_rom(seed: int, size: int = 0x400000) -> bytes:
+    return _randbytes(random.Random(seed), size)
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_cow_matches_fsrom(seed):
+    gen = random.Random(seed)
+    rom = _make_rom(seed)
+
+    cow = sharedrom.SharedRomImage(rom).open()
+    expected = freespace.FSRom(rom, False)
+    size = len(rom)
+
+    for _ in range(300):
+        # Writes stay inside the rom.  Growing it is done below.
+        addr = gen.randrange(size - 0x100)
+        action = gen.random()
+        if action < 0.4:
+            payload = _randbytes(gen, gen.randrange(1, 0x100))
+            mark = gen.choice(list(FSWriteType))
+            for fsrom in (cow, expected):
+                fsrom.seek(addr)
+                fsrom.write(payload, mark)
+        elif action < 0.6:
+            for fsrom in (cow, expected):
+                fsrom.getbuffer()[addr] = addr & 0xFF
+        elif action < 0.8:
+            num_bytes = gen.randrange(0x200)
+            cow.seek(addr)
+            expected.seek(addr)
+            assert cow.read(num_bytes) == expected.read(num_bytes)
+        else:
+            offset = gen.randrange(-0x100, 0)
+            assert cow.seek(offset, 2) == expected.seek(offset, 2)
+
+        assert cow.tell() == expected.tell()
+
+    # Grow the rom as base_patch.ips does.
+    for fsrom in (cow, expected):
+        fsrom.seek(size + 0x100)
+        fsrom.write(b'\x01'*0x100, FSWriteType.MARK_FREE)
+
+    assert not cow.is_shared
+    assert cow.getvalue() == expected.getvalue()
+    assert cow.space_manager.markers == expected.space_manager.markers
+
+
+def test_grow_with_views():
+    rom = _make_rom(3, 0x10000)
+    cow = sharedrom.SharedRomImage(rom).open()
+
+    # Like BytesIO, growing fails while a view of the rom is alive.
+    for fsrom in (cow, freespace.FSRom(rom, False)):
+        view = fsrom.getbuffer()
+        fsrom.seek(0x10000)
+        with pytest.raises(BufferError):
+            fsrom.write(b'\x01'*0x10, FSWriteType.MARK_FREE)
+        view.release()
+
+        fsrom.seek(0x10000)
+        fsrom.write(b'\x01'*0x10, FSWriteType.MARK_FREE)
+        assert fsrom.getvalue() == rom + b'\x01'*0x10
+
+    assert not cow.is_shared
+
+
+def test_roms_are_independent():
+    rom = _make_rom(0, 0x10000)
+    image = sharedrom.SharedRomImage(rom, True, [0, 0x8000, 0x10000])
+    first, second = image.open(), image.open()
+
+    first.write_data_to_freespace(b'\xAA'*0x1800)
+    assert first.getvalue()[:0x1800] == b'\xAA'*0x1800
+    assert first.get_dirty_pages() == \
+        list(range(-(-0x1800 // mmap.PAGESIZE)))
+
+    assert second.getvalue() == rom
+    assert second.get_dirty_pages() == []
+    assert second.space_manager.markers == [0, 0x8000, 0x10000]
+    assert bytes(image.view) == rom
+
+
+def test_ctrom_from_image():
+    image = sharedrom.SharedRomImage(_make_rom(1, 0x10000))
+    ct_rom = ctrom.CTRom(image, ignore_checksum=True)
+    assert isinstance(ct_rom.rom_data, sharedrom.CowFSRom)
+
+    with pytest.raises(ctrom.InvalidRomException):
+        ctrom.CTRom(image)
+
+
+def test_basecache_shares_patched_rom():
+    rom = _make_rom(2, 0x10000)
+    num_calls = 0
+
+    def patch_func(ct_rom: ctrom.CTRom):
+        nonlocal num_calls
+        num_calls += 1
+        ct_rom.rom_data.space_manager.mark_block((0x100, 0x200),
+                                                 FSWriteType.MARK_FREE)
+        ct_rom.rom_data.seek(0)
+        ct_rom.rom_data.write(b'\x01\x02')
+
+    cache = basecache.BaseCache(None)
+    first = cache.get_patched_ctrom(rom, patch_func, 'test')
+    first.rom_data.write_data_to_freespace(b'\xFF'*0x10)
+    second = cache.get_patched_ctrom(rom, patch_func, 'test')
+
+    assert num_calls == 1
+    assert second.rom_data.getvalue() == b'\x01\x02' + rom[2:]
+    assert second.rom_data.space_manager.markers == [0, 0x100, 0x200, 0x10000]
+    assert first.rom_data.getvalue()[0x100:0x110] == b'\xFF'*0x10
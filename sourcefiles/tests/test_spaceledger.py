@@ -0,0 +1,115 @@
+import csv
+import io
+import json
+
+import ctevent
+import freespace
+import spaceledger
+from ctenums import LocID
+from freespace import FSWriteType
+
+
+def _make_rom() -> freespace.FSRom:
+    fsrom = freespace.FSRom(bytes(0x400000), False)
+    fsrom.space_manager.mark_block((0x200000, 0x220000),
+                                   FSWriteType.MARK_FREE)
+    fsrom.ledger = spaceledger.AllocationLedger()
+    return fsrom
+
+
+def test_records_used_writes():
+    fsrom = _make_rom()
+    ledger = fsrom.ledger
+
+    ledger.stage = 'first'
+    addr = fsrom.write_data_to_freespace(b'\x01'*0x10)
+    fsrom.seek(0x210000)
+    fsrom.write(b'\x02'*0x20, FSWriteType.NO_MARK)
+    fsrom.write(b'\x02'*0x20, FSWriteType.MARK_FREE)
+
+    ledger.stage = 'second'
+    with ledger.detail('table'):
+        fsrom.seek(0x218000)
+        fsrom.write(b'\x03'*0x30, FSWriteType.MARK_USED)
+
+    assert [(alloc.stage, alloc.detail, alloc.address, alloc.size,
+             alloc.bank) for alloc in ledger.allocations] == \
+        [('first', None, addr, 0x10, 0x20),
+         ('second', 'table', 0x218000, 0x30, 0x21)]
+    assert all(alloc.module == __name__ for alloc in ledger.allocations)
+    assert ledger.get_totals() == {'first': 0x10, 'second': 0x30}
+
+
+def test_only_changes_recorded():
+    fsrom = _make_rom()
+    ledger = fsrom.ledger
+
+    # Rewriting used bytes (as many table edits do) uses no free space.
+    fsrom.seek(0x100)
+    fsrom.write(b'\x01'*0x10, FSWriteType.MARK_USED)
+    fsrom.write_many([(0x1F0000, b'\x01'*0x10, FSWriteType.MARK_USED)])
+    assert ledger.allocations == []
+
+    # Only the part of a write which was free is recorded.
+    fsrom.seek(0x1FFFF0)
+    fsrom.write(b'\x02'*0x20, FSWriteType.MARK_USED)
+    fsrom.seek(0x1FFFF0)
+    fsrom.write(b'\x02'*0x40, FSWriteType.MARK_USED)
+
+    # Releases are recorded however they are made, but not in dry runs.
+    space = fsrom.space_manager
+    space.mark_block((0x200000, 0x200020), FSWriteType.MARK_FREE)
+    with space.dry_run():
+        space.mark_block((0x210000, 0x210100), FSWriteType.MARK_USED)
+
+    # Changes kept by committing a checkpoint are recorded when the
+    # outermost checkpoint is committed.
+    space.checkpoint()
+    space.mark_block((0x211000, 0x211010), FSWriteType.MARK_USED)
+    space.checkpoint()
+    space.mark_block((0x212000, 0x212010), FSWriteType.MARK_USED)
+    space.rollback()
+    space.checkpoint()
+    space.mark_block((0x213000, 0x213010), FSWriteType.MARK_USED)
+    space.commit()
+    assert len(ledger.allocations) == 3
+    space.commit()
+
+    assert [(alloc.address, alloc.size) for alloc in ledger.allocations] == \
+        [(0x200000, 0x10), (0x200010, 0x20), (0x200000, -0x20),
+         (0x211000, 0x10), (0x213000, 0x10)]
+    assert all(alloc.module == __name__ for alloc in ledger.allocations)
+    assert ledger.get_totals() == {'None': 0x30}
+
+
+def test_script_writes_have_details():
+    fsrom = _make_rom()
+    manager = ctevent.ScriptManager(fsrom, [])
+    manager.set_script(
+        ctevent.Event.from_flux('./flux/jot_trading_post.Flux'), LocID(0)
+    )
+    manager.write_script_to_rom(LocID(0), free_old=False)
+
+    details = [(alloc.module, alloc.detail)
+               for alloc in fsrom.ledger.allocations]
+    assert details == [('ctevent', f'strings {LocID(0)}'),
+                       ('ctevent', f'script {LocID(0)}')]
+
+
+def test_export():
+    fsrom = _make_rom()
+    fsrom.ledger.stage = 'stage'
+    fsrom.write_data_to_freespace(b'\x01'*0x10)
+    fsrom.write_data_to_freespace(b'\x01'*0x08)
+
+    json_out = io.StringIO()
+    fsrom.ledger.write_json(json_out)
+    jot = json.loads(json_out.getvalue())
+    assert jot['total_bytes'] == 0x18
+    assert jot['stage_totals'] == {'stage': 0x18}
+    assert len(jot['allocations']) == 2
+
+    csv_out = io.StringIO()
+    fsrom.ledger.write_csv(csv_out)
+    rows = list(csv.DictReader(io.StringIO(csv_out.getvalue())))
+    assert [int(row['size']) for row in rows] == [0x10, 0x08]
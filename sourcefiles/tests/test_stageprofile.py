@@ -0,0 +1,38 @@
+import io
+import json
+
+import stageprofile
+
+
+def test_stages_recorded_in_order():
+    profiler = stageprofile.StageProfiler()
+
+    profiler.begin('first')
+    data = [bytearray(1000) for _ in range(100)]
+    profiler.begin('second')
+    del data
+    profiler.begin('first')
+    with profiler.stage('third'):
+        pass
+    profiler.close()
+
+    report = json.loads(json.dumps(profiler._jot_json()))
+    stages = report['stages']
+
+    assert [stage['name'] for stage in stages] == \
+        ['first', 'second', 'third']
+    assert [stage['calls'] for stage in stages] == [2, 1, 1]
+    assert stages[0]['peak_bytes'] >= 100*1000
+    assert all(stage['total_seconds'] >= 0 for stage in stages)
+
+
+def test_no_memory_tracing():
+    profiler = stageprofile.StageProfiler(trace_memory=False)
+    with profiler.stage('only'):
+        pass
+
+    outfile = io.StringIO()
+    profiler.write_json(outfile)
+    report = json.loads(outfile.getvalue())
+
+    assert report['stages'][0]['peak_bytes'] is None
@@ -9,7 +9,7 @@
 from __future__ import annotations
 
 from typing import Tuple
-import random
+import rng
 
 from ctenums import TreasureID as TID, StrIntEnum, ItemID
 
@@ -398,14 +398,14 @@ class TreasureDist:
         self.weight_item_pairs = weight_item_pairs
 
     def get_random_item(self) -> ItemID:
-        target = random.randrange(0, self.__total_weight)
+        target = rng.randrange(0, self.__total_weight)
 
         value = 0
         for x in self.__weight_item_pairs:
             value += x[0]
 
             if value > target:
-                return random.choice(x[1])
+                return rng.choice(x[1])
 
         raise ValueError("No selection")
 
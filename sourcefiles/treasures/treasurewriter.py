@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-import random as rand
+import rng
 
 import ctenums
 import logictypes
@@ -101,7 +101,7 @@ def add_lw_key_item_gear(settings: rset.Settings,
     added_treasures = [ItemID.HERO_MEDAL, ItemID.MASAMUNE_2,
                        ItemID.ROBORIBBON]
 
-    added_tids = rand.sample(lw_avail_tids, len(added_treasures))
+    added_tids = rng.sample(lw_avail_tids, len(added_treasures))
 
     for ind, tid in enumerate(added_tids):
         item = added_treasures[ind]
@@ -152,23 +152,23 @@ def write_treasures_to_config(settings: rset.Settings,
     mid_gear = gil(ITier.MID_GEAR)
     for treasure_id in (TID.SNAIL_STOP_KEY, TID.LAZY_CARPENTER,
                         TID.FROGS_BURROW_LEFT):
-        assign[treasure_id].reward = rand.choice(mid_gear)
+        assign[treasure_id].reward = rng.choice(mid_gear)
 
     good_gear = gil(ITier.GOOD_GEAR)
     for treasure_id in (TID.TABAN_KEY, TID.ZENAN_BRIDGE_KEY,
                         TID.DENADORO_MTS_KEY):
-        assign[treasure_id].reward = rand.choice(good_gear)
+        assign[treasure_id].reward = rng.choice(good_gear)
 
     high_gear = gil(ITier.HIGH_GEAR)
     for treasure_id in (TID.REPTITE_LAIR_KEY, TID.GIANTS_CLAW_KEY,
                         TID.ARRIS_DOME_DOAN_KEY, TID.SUN_PALACE_KEY,
                         TID.KINGS_TRIAL_KEY, TID.FIONA_KEY):
-        assign[treasure_id].reward = rand.choice(high_gear)
+        assign[treasure_id].reward = rng.choice(high_gear)
 
     awesome_gear = gil(ITier.AWESOME_GEAR)
     for treasure_id in (TID.GENO_DOME_KEY, TID.MT_WOE_KEY,
                         TID.MELCHIOR_KEY):
-        assign[treasure_id].reward = rand.choice(awesome_gear)
+        assign[treasure_id].reward = rng.choice(awesome_gear)
 
     # Now do special treasures.  These don't have complicated distributions.
     # The distribution is just a random choice from the items associated with
@@ -198,24 +198,24 @@ def write_treasures_to_config(settings: rset.Settings,
 
     for ind, tid in enumerate(specials):
         items = item_lists[ind]
-        assign[tid].reward = rand.choice(items)
+        assign[tid].reward = rng.choice(items)
 
     # finally rocks
     if rset.GameFlags.ROCKSANITY in settings.gameflags:
         # rock locations can be treasures in Rocksanity (e.g. for Chronosanity)
         # use same treasure tier as other KI in same/similar location
-        assign[TID.DENADORO_ROCK].reward = rand.choice(good_gear)
-        assign[TID.GIANTS_CLAW_ROCK].reward = rand.choice(high_gear)
-        assign[TID.LARUBA_ROCK].reward = rand.choice(high_gear)
-        assign[TID.KAJAR_ROCK].reward = rand.choice(awesome_gear)
-        assign[TID.BLACK_OMEN_TERRA_ROCK].reward = rand.choice(awesome_gear)
+        assign[TID.DENADORO_ROCK].reward = rng.choice(good_gear)
+        assign[TID.GIANTS_CLAW_ROCK].reward = rng.choice(high_gear)
+        assign[TID.LARUBA_ROCK].reward = rng.choice(high_gear)
+        assign[TID.KAJAR_ROCK].reward = rng.choice(awesome_gear)
+        assign[TID.BLACK_OMEN_TERRA_ROCK].reward = rng.choice(awesome_gear)
     else:
         rock_tids = [TID.DENADORO_ROCK, TID.GIANTS_CLAW_ROCK,
                      TID.LARUBA_ROCK, TID.KAJAR_ROCK, TID.BLACK_OMEN_TERRA_ROCK]
 
         rocks = [ItemID.GOLD_ROCK, ItemID.BLUE_ROCK,
                  ItemID.SILVERROCK, ItemID.BLACK_ROCK, ItemID.WHITE_ROCK]
-        rand.shuffle(rocks)
+        rng.shuffle(rocks)
 
         for ind, tid in enumerate(rock_tids):
             assign[tid].reward = rocks[ind]
@@ -3,7 +3,7 @@ Module for modifying a standard JoT rom back into a more vanilla experience.
 '''
 from __future__ import annotations
 
-import random
+import rng
 from typing import Optional
 
 import bossassign
@@ -29,7 +29,7 @@ def add_sunstone_spot_to_config(config: cfg.RandoConfig):
     Add a treasure entry for the sunstone pickup in Sun Keep 2300.
     '''
     td = treasuredata
-    assigned_item = random.choice(td.get_item_list(td.ItemTier.HIGH_GEAR))
+    assigned_item = rng.choice(td.get_item_list(td.ItemTier.HIGH_GEAR))
 
     sunstone_spot = treasuretypes.ScriptTreasure(
         ctenums.LocID.SUN_KEEP_2300, 8, 1, assigned_item
@@ -113,7 +113,7 @@ def add_racelog_chest_to_config(config: cfg.RandoConfig):
     Add a treasure in the config for the Race Log chest.
     '''
     td = treasuredata
-    assigned_item = random.choice(td.get_item_list(td.ItemTier.HIGH_GEAR))
+    assigned_item = rng.choice(td.get_item_list(td.ItemTier.HIGH_GEAR))
     config.treasure_assign_dict[ctenums.TreasureID.LAB_32_RACE_LOG]\
           .reward = assigned_item
 
@@ -140,7 +140,7 @@ def add_check_to_ozzies_fort_in_config(config: cfg.RandoConfig):
     Add an entry in the config for the Ozzie's Fort KI.
     '''
     td = treasuredata
-    assigned_item = random.choice(td.get_item_list(td.ItemTier.HIGH_GEAR))
+    assigned_item = rng.choice(td.get_item_list(td.ItemTier.HIGH_GEAR))
 
     ozzies_fort_check = treasuretypes.ScriptTreasure(
         ctenums.LocID.OZZIES_FORT_THRONE_INCOMPETENCE,
@@ -336,7 +336,7 @@ def add_arris_food_locker_check_to_config(config: cfg.RandoConfig):
     Adds a treasure for the dead guy in Arris Dome food locker.
     '''
     td = treasuredata
-    assigned_item = random.choice(td.get_item_list(td.ItemTier.HIGH_GEAR))
+    assigned_item = rng.choice(td.get_item_list(td.ItemTier.HIGH_GEAR))
 
     food_locker_check = treasuretypes.ScriptTreasure(
         ctenums.LocID.ARRIS_DOME_FOOD_LOCKER, 0x8, 0x1, assigned_item, 0
@@ -646,7 +646,7 @@ def add_vanilla_clone_check_to_config(config: cfg.RandoConfig):
     Add a treasure to the config for checking the clone game.
     '''
     td = treasuredata
-    assigned_item = random.choice(
+    assigned_item = rng.choice(
         td.get_item_list(td.ItemTier.AWESOME_GEAR)
     )
 
@@ -699,7 +699,7 @@ def restore_cyrus_grave_check_to_config(config: cfg.RandoConfig):
     Put a TID into the config for Cyrus's Grave.
     '''
     td = treasuredata
-    assigned_item = random.choice(
+    assigned_item = rng.choice(
         td.get_item_list(td.ItemTier.AWESOME_GEAR)
     )
     cyrus_check = treasuretypes.ScriptTreasure(
@@ -1,4 +1,4 @@
-import random
+import rng
 
 import ctenums
 
@@ -11,7 +11,7 @@ def randomize_magus(settings: rset.Settings, config:cfg.RandoConfig):
     EnemyID = ctenums.EnemyID
 
     # Magus
-    magus_char = random.choice(list(CharID))
+    magus_char = rng.choice(list(CharID))
 
     magus_nukes = {
         CharID.CRONO: 0xBB,